@@ -1,32 +1,70 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.optimize import curve_fit
 import math
+from matplotlib.figure import Figure
 from matplotlib.lines import Line2D
+from matplotlib.ticker import MultipleLocator
 import dash
 from dash import dcc, html
-import base64
+import hashlib
 import io
+import os
+import threading
+import time
+from flask import Response, request
 from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
+from curvefit import fit_dataframe, polyval
+from oplookup import CurveLookup
+from resultcache import result_cache
 
-# 讀取 CSV 檔案
-file_path = 'https://raw.githubusercontent.com/HelenWei1128/Datasheetdb/refs/heads/main/750V820AIF_VF_D.csv'
+# CSV 檔案位置（第一次需要時才下載；可由環境變數改為本機檔案）
+file_path = os.environ.get('IFVF_CSV', 'https://raw.githubusercontent.com/HelenWei1128/Datasheetdb/refs/heads/main/750V820AIF_VF_D.csv')
+# 遠端 CSV 重新下載的間隔（秒）；本機檔案則在修改時間或大小改變時重新讀取
+DATA_REFRESH = int(os.environ.get('IFVF_DATA_REFRESH', 300))
 
-try:
-    data = pd.read_csv(file_path)
-except FileNotFoundError:
-    raise FileNotFoundError(f"文件未找到: {file_path}")
-except pd.errors.ParserError:
-    raise ValueError("CSV 文件格式錯誤")
+# 圖形版本號：修改 create_figure 的繪圖內容時遞增，讓瀏覽器快取失效
+RENDER_VERSION = 1
 
-# 數據清理
-data = data.replace([np.inf, -np.inf], np.nan)
-data.dropna(inplace=True)
 
-# 定義擬合函數為三次多項式
-def polynomial(Vf, a, b, c, d):
-    return a * Vf ** 3 + b * Vf ** 2 + c * Vf + d
+# 數據來源的版本：本機檔案為 (修改時間, 大小)，遠端 CSV 為目前的更新週期
+def _source_version():
+    if os.path.exists(file_path):
+        stat = os.stat(file_path)
+        return stat.st_mtime_ns, stat.st_size
+    return int(time.time() // DATA_REFRESH)
+
+
+_data = {}
+_data_lock = threading.Lock()
+
+
+# 回傳數據及其內容雜湊值；來源版本改變時才重新讀取（內容未變時雜湊與 ETag 也不變）
+def load_data():
+    version = _source_version()
+    with _data_lock:
+        if _data.get('version') == version:
+            return _data['data'], _data['hash']
+    data, data_hash = read_data()
+    with _data_lock:
+        _data.update(version=version, data=data, hash=data_hash)
+    return data, data_hash
+
+
+# 讀取並清理 CSV，回傳數據及其內容雜湊值
+def read_data():
+    try:
+        data = pd.read_csv(file_path)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"文件未找到: {file_path}")
+    except pd.errors.ParserError:
+        raise ValueError("CSV 文件格式錯誤")
+
+    # 數據清理
+    data = data.replace([np.inf, -np.inf], np.nan)
+    data.dropna(inplace=True)
+
+    data_hash = hashlib.sha256(pd.util.hash_pandas_object(data, index=True).values.tobytes()).hexdigest()
+    return data, data_hash
 
 # 選擇不同的接面溫度
 temperatures = ['25℃', '150℃', '175℃']
@@ -51,17 +89,7 @@ marked_points = {
     ]
 }
 
-# 用於存儲所有標記點的信息，以便在圖例中添加
-marked_points_info = []
-
-# 收集所有 If 數據以計算 y 軸範圍
-all_If = []
-for temp in temperatures:
-    If = data[f'If_{temp}']
-    all_If.extend(If.tolist())
-
-# 計算 y 軸的最小值和最大值，並設置一些邊距
-y_min = math.floor(min(all_If) / 100) * 100  # 向下取整到最接近的 100 的倍數
+# y 軸最大值
 y_max = 1000  # 根據標註位置調整 y_max 至至少 1000
 
 # 設置主刻度和次刻度的間隔
@@ -72,15 +100,28 @@ minor_tick_interval = 50
 marked_point_size = 50  # 調整標記點為更小的值
 
 # 繪製擬合並創建圖形的函數
-def create_figure():
-    fig, ax = plt.subplots(figsize=(12, 8))
+def create_figure(data):
+    # 使用獨立的 Figure 物件（不經過 pyplot 的全域狀態），避免伺服器端累積未關閉的圖形
+    fig = Figure(figsize=(12, 8))
+    ax = fig.subplots()
+
+    # 用於存儲所有標記點的信息，以便在圖例中添加（每次繪圖重新建立）
+    marked_points_info = []
 
-    for temp, color in zip(temperatures, colors):
+    # 計算 y 軸的最小值，向下取整到最接近的 100 的倍數
+    all_If = np.concatenate([data[f'If_{temp}'].to_numpy() for temp in temperatures])
+    y_min = math.floor(all_If.min() / 100) * 100
+
+    # 一次擬合所有溫度的三次多項式，並取得 R²、MSE、MAE
+    fits = fit_dataframe(data, [(f'Vf_{temp}', f'If_{temp}') for temp in temperatures], degree=3)
+
+    # 標記點的 VF 以插值求得，而非取最接近的量測點
+    vf_lookup = CurveLookup.from_dataframe(data, {temp: (f'If_{temp}', f'Vf_{temp}') for temp in temperatures})
+
+    for i, (temp, color) in enumerate(zip(temperatures, colors)):
         Vf = data[f'Vf_{temp}']
         If = data[f'If_{temp}']
-
-        # 擬合數據
-        popt, _ = curve_fit(polynomial, Vf, If)
+        popt = fits['coefficients'][i]
 
         # 繪製原始數據點為實線
         label_data = f'Data Tj={temp}'
@@ -88,21 +129,17 @@ def create_figure():
 
         # 繪製擬合曲線為實線
         x_fit = np.linspace(min(Vf), max(Vf), 500)  # 使用 500 個點繪製擬合曲線
-        y_fit = polynomial(x_fit, *popt)
+        y_fit = polyval(popt, x_fit)
         label_fit = f'Fit Tj={temp}'
         ax.plot(x_fit, y_fit, '-', color=color, linewidth=1, alpha=0.7)  # 使用實線繪製擬合曲線
 
-        # 標記並標註特定的 If 點
-        for point in marked_points[temp]:
-            target_If = point['If']
+        # 標記並標註特定的 If 點（同一溫度的所有標記點一次查詢）
+        marked_Vf = vf_lookup([point['If'] for point in marked_points[temp]], [temp])[0]
+        for point, actual_Vf in zip(marked_points[temp], marked_Vf):
+            actual_If = point['If']
             x_label = point['x_label']
             y_label = point['y_label']
 
-            # 在數據中找到最接近的 If 值的索引
-            closest_idx = (np.abs(If - target_If)).argmin()
-            actual_If = If.iloc[closest_idx]
-            actual_Vf = Vf.iloc[closest_idx]
-
             # 繪製紫色標記點
             ax.scatter(actual_Vf, actual_If, color='purple', marker='o', s=marked_point_size, edgecolors='none',
                        zorder=5)
@@ -127,13 +164,10 @@ def create_figure():
                 'y_label': y_label
             })
 
-        # 計算 R²、MSE 和 MAE
-        residuals = If - polynomial(Vf, *popt)
-        ss_res = np.sum(residuals ** 2)  # 殘差平方和（Residual Sum of Squares）
-        ss_tot = np.sum((If - np.mean(If)) ** 2)  # 總變異平方和（Total Sum of Squares）
-        r_squared = 1 - (ss_res / ss_tot)
-        mse = np.mean(residuals ** 2)
-        mae = np.mean(np.abs(residuals))
+        # R²、MSE 和 MAE 已在批次擬合時一併算出
+        r_squared = fits['r_squared'][i]
+        mse = fits['mse'][i]
+        mae = fits['mae'][i]
 
         # 顯示擬合參數和指標（左下角，黑色文字），每個溫度單獨標示
         ax.text(0.02, 0.05 + 0.10 * temperatures.index(temp),
@@ -146,7 +180,7 @@ def create_figure():
     major_ticks = np.arange(y_min, y_max + major_tick_interval, major_tick_interval)
     minor_ticks = np.arange(y_min, y_max + minor_tick_interval, minor_tick_interval)
     ax.set_yticks(major_ticks)
-    ax.yaxis.set_minor_locator(plt.MultipleLocator(minor_tick_interval))
+    ax.yaxis.set_minor_locator(MultipleLocator(minor_tick_interval))
 
     # 設置細緻的網格
     ax.grid(which='both', linestyle='--', linewidth=0.5, alpha=0.7)  # 主網格的樣式
@@ -186,19 +220,46 @@ def create_figure():
     return fig
 
 
+# 依數據雜湊值快取已渲染的 PNG，重複瀏覽不需重新擬合與繪圖
+# 記憶體中只保留目前版本；磁碟快取讓重新啟動或其他 worker 直接沿用
+_png_cache = {}
+_png_lock = threading.Lock()
+
+
+# 回傳 (PNG 位元組, ETag)；數據改變後的第一次請求才擬合並繪圖
+# 鎖只保護快取字典，繪圖在鎖外進行，不同請求不會互相等待
+def render_png():
+    data, data_hash = load_data()
+    etag = f'{data_hash[:32]}-v{RENDER_VERSION}'
+    with _png_lock:
+        png_bytes = _png_cache.get(etag)
+    if png_bytes is None:
+        key = result_cache.key('ifvf_png', etag)
+        png_bytes = result_cache.get(key)
+        if png_bytes is None:
+            img_io = io.BytesIO()
+            FigureCanvas(create_figure(data)).print_png(img_io)
+            png_bytes = img_io.getvalue()
+            result_cache.set(key, png_bytes)
+        with _png_lock:
+            _png_cache.clear()
+            _png_cache[etag] = png_bytes
+    return png_bytes, etag
 
 
-
-
-# 創建圖形並轉換為 base64
-fig = create_figure()
-img_io = io.BytesIO()
-FigureCanvas(fig).print_png(img_io)
-encoded_image = base64.b64encode(img_io.getvalue()).decode()
-
 # 創建 Dash 應用
 app = dash.Dash(__name__)
 
+
+# 圖片路由：支援 ETag / If-None-Match，未變更時回傳 304
+@app.server.route('/ifvf/figure.png')
+def ifvf_figure():
+    png_bytes, etag = render_png()
+    response = Response(png_bytes, mimetype='image/png')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'public, max-age=3600'
+    return response.make_conditional(request)
+
 # 定義應用佈局
 app.layout = html.Div(
     style={
@@ -211,7 +272,7 @@ app.layout = html.Div(
         html.Div(
             children=[
                 html.Img(
-                    src=f'data:image/png;base64,{encoded_image}',
+                    src='/ifvf/figure.png',
                     style={'width': '100%', 'height': 'auto'}  # 調整圖片寬度
                 ),
             ],
@@ -322,7 +383,7 @@ $$
 $$
 
 **工具**：
-- 使用程式（如 Python 的 `curve_fit`）來執行上述計算。
+- 三次多項式對係數是線性的，因此以 NumPy 的 QR 分解直接求解線性最小二乘問題（`curvefit.fit_polynomials`），所有溫度的曲線一次完成擬合。
 ''', mathjax=True)
                 ]),
 
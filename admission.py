@@ -0,0 +1,168 @@
+import functools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from resultcache import RESULT_CACHE_DIR, private_directory
+
+# 成本等級：(同時執行數, 等待佇列長度, 最長等待秒數)；None 表示不限制（例如 toggle_collapse 等介面切換）
+# 可由環境變數覆寫，例如 ADMISSION_RENDER=2,4,2
+COST_CLASSES = {
+    'ui': None,
+    'query': (4, 8, 1.0),
+    'render': (2, 4, 2.0),
+    'fit': (2, 4, 2.0),
+}
+# 名額以鎖定檔表示（同一個部署的所有 gunicorn worker 共用，程序結束時自動釋放）
+# ADMISSION_DIR 預設在快取目錄（RESULT_CACHE_DIR）下，與快取相同只允許目前使用者存取，
+# 同一台主機上的不同部署各自計算名額；要讓多個部署共用名額時設成同一個目錄
+ADMISSION_DIR = os.environ.get('ADMISSION_DIR', os.path.join(RESULT_CACHE_DIR, 'admission'))
+# 等待名額時的輪詢間隔（秒）
+POLL_INTERVAL = 0.02
+
+
+class Busy(Exception):
+    pass
+
+
+# 函數拋出 Busy 時改回傳 busy() 的結果
+# 包在快取外層、並把 limit 放在快取內層時，快取命中不需取得名額，忙碌的回應也不會寫入快取
+def on_busy(busy):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            except Busy:
+                return busy()
+        return wrapper
+    return decorator
+
+
+def _class_limits(classes):
+    limits = {}
+    for name, default in classes.items():
+        value = os.environ.get(f'ADMISSION_{name.upper()}')
+        if value:
+            concurrency, queue, timeout = value.split(',')
+            limits[name] = (int(concurrency), int(queue), float(timeout))
+        else:
+            limits[name] = default
+    return limits
+
+
+class _FileSlots:
+    # count 個鎖定檔，以非阻塞的 flock 取得其中一個
+    def __init__(self, directory, name, count):
+        private_directory(directory)
+        self.paths = [os.path.join(directory, f'{name}-{i}.lock') for i in range(count)]
+
+    def try_acquire(self):
+        for path in self.paths:
+            f = open(path, 'a')
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                continue
+            return f
+        return None
+
+    def release(self, handle):
+        fcntl.flock(handle, fcntl.LOCK_UN)
+        handle.close()
+
+
+class _ThreadSlots:
+    # 沒有 fcntl 的平台：只在同一個程序內限制
+    def __init__(self, directory, name, count):
+        self.locks = [threading.Lock() for _ in range(count)]
+
+    def try_acquire(self):
+        for lock in self.locks:
+            if lock.acquire(blocking=False):
+                return lock
+        return None
+
+    def release(self, handle):
+        handle.release()
+
+
+class AdmissionControl:
+    # 依成本等級限制同時執行的請求：有空的名額直接執行；沒有時進入等待佇列，
+    # 佇列已滿或等待逾時就立即拋出 Busy，讓呼叫端回傳「忙碌中」而不是佔住 worker 直到逾時
+    def __init__(self, classes=COST_CLASSES, directory=ADMISSION_DIR):
+        self.limits = _class_limits(classes)
+        self.directory = directory
+        self.rejected = dict.fromkeys(self.limits, 0)
+        self._slots = {}
+        self._lock = threading.Lock()
+
+    def _get_slots(self, name, count):
+        with self._lock:
+            if name not in self._slots:
+                slots = _FileSlots if fcntl is not None else _ThreadSlots
+                try:
+                    self._slots[name] = slots(self.directory, name, count)
+                except (OSError, ValueError) as e:
+                    # 名額目錄無法使用（例如屬於其他使用者）時只在本程序內限制
+                    logging.warning(f"名額目錄無法使用，改為只在本程序內限制: {e}")
+                    self._slots[name] = _ThreadSlots(self.directory, name, count)
+            return self._slots[name]
+
+    def _reject(self, cost_class):
+        self.rejected[cost_class] += 1
+        logging.warning(f"{cost_class} 類請求過多，回傳忙碌")
+        raise Busy(cost_class)
+
+    @contextmanager
+    def admit(self, cost_class):
+        if cost_class not in self.limits:
+            raise ValueError(f"未知的成本等級: {cost_class}")
+        limit = self.limits[cost_class]
+        if limit is None:
+            yield
+            return
+
+        concurrency, queue, timeout = limit
+        running = self._get_slots(f'{cost_class}-run', concurrency)
+        slot = running.try_acquire()
+        if slot is None:
+            waiting = self._get_slots(f'{cost_class}-queue', queue)
+            ticket = waiting.try_acquire() if queue > 0 else None
+            if ticket is None:
+                self._reject(cost_class)
+            try:
+                deadline = time.monotonic() + timeout
+                while slot is None:
+                    if time.monotonic() >= deadline:
+                        self._reject(cost_class)
+                    time.sleep(POLL_INTERVAL)
+                    slot = running.try_acquire()
+            finally:
+                waiting.release(ticket)
+        try:
+            yield
+        finally:
+            running.release(slot)
+
+    # 以成本等級包裝函數（Dash 回調或 Flask 路由）；忙碌時回傳 busy() 的結果，沒有 busy 時拋出 Busy
+    def limit(self, cost_class, busy=None):
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.admit(cost_class):
+                    return func(*args, **kwargs)
+            return wrapper if busy is None else on_busy(busy)(wrapper)
+        return decorator
+
+
+# 全域共用的准入控制
+admission = AdmissionControl()
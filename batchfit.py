@@ -0,0 +1,215 @@
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from curvefit import fit_polynomials, stack_series
+from foster import fit_foster, foster_zth, zth_from_dataframe, ZTH_COLUMN, ZTH_TIME_COLUMN
+from ntc import NTCThermistor, NTC_RESISTANCE_COLUMN, NTC_TEMPERATURE_COLUMN
+from packageres import CHIP_COLUMNS, MODULE_COLUMNS, chip_module_curves, extract_package_resistance
+from procpool import pool_context
+from resultcache import code_version
+
+# 以相鄰欄位配對的曲線種類：y 與 x 欄位的正規表示式，x_first 表示 x 欄位在前
+# 擬合模型：'cubic' 為 y(x) 三次多項式，'log_cubic' 為 ln y(ln x) 三次多項式（與 rgmodel 相同）
+PAIR_KINDS = {
+    'if_vf': {'y': r'If_.+', 'x': r'Vf_.+', 'x_first': False, 'model': 'cubic'},
+    'ic_vce': {'y': r'IC_Tj = .+', 'x': r'VCE_Tj = .+', 'x_first': False, 'model': 'cubic'},
+    'ic_vce_family': {'y': r'IC_\d+(?:\.\d+)?V', 'x': r'VCE_\d+(?:\.\d+)?V', 'x_first': False, 'model': 'cubic'},
+    'e_ic': {'y': r'E(?:on|off|rec)\(mJ\)_.+', 'x': r'IC\(A\)_.+', 'x_first': True, 'model': 'cubic'},
+    'e_rg': {'y': r'E(?:on|off|rec)\(mJ\)_.+', 'x': r'RG_.+', 'x_first': True, 'model': 'log_cubic'},
+}
+
+SUMMARY_COLUMNS = ['file', 'sha256', 'version', 'kind', 'curve', 'model', 'coefficients', 'r_squared', 'mse', 'mae',
+                   'n_points', 'error']
+DEFAULT_OUTPUT = 'fit_summary.csv'
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# 依欄位名稱分類：回傳種類名稱，無法辨識時回傳 None
+def classify(columns):
+    columns = [str(column) for column in columns]
+    if {ZTH_TIME_COLUMN, ZTH_COLUMN}.issubset(columns):
+        return 'zth'
+    if {NTC_TEMPERATURE_COLUMN, NTC_RESISTANCE_COLUMN}.issubset(columns):
+        return 'ntc'
+    if set(CHIP_COLUMNS + MODULE_COLUMNS).issubset(columns):
+        return 'chip_module'
+    for kind in PAIR_KINDS:
+        if column_pairs(columns, kind):
+            return kind
+    return None
+
+
+# 相鄰欄位配對：回傳 [(x 欄位, y 欄位), ...]（pandas 對重複欄位名稱加上的 .1 後綴也接受）
+def column_pairs(columns, kind):
+    spec = PAIR_KINDS[kind]
+    y_pattern = re.compile(rf"(?:{spec['y']})(?:\.\d+)?")
+    x_pattern = re.compile(rf"(?:{spec['x']})(?:\.\d+)?")
+    pairs = []
+    for first, second in zip(columns[:-1], columns[1:]):
+        x_col, y_col = (first, second) if spec['x_first'] else (second, first)
+        if x_pattern.fullmatch(x_col) and y_pattern.fullmatch(y_col):
+            pairs.append((x_col, y_col))
+    return pairs
+
+
+def _row(kind, curve, model, coefficients, r_squared=None, mse=None, mae=None, n_points=None):
+    return {
+        'kind': kind,
+        'curve': curve,
+        'model': model,
+        'coefficients': json.dumps([float(c) for c in coefficients]),
+        'r_squared': None if r_squared is None else float(r_squared),
+        'mse': None if mse is None else float(mse),
+        'mae': None if mae is None else float(mae),
+        'n_points': None if n_points is None else int(n_points),
+    }
+
+
+def _fit_pairs(df, kind):
+    spec = PAIR_KINDS[kind]
+    pairs = column_pairs(list(df.columns), kind)
+    xs, ys = [], []
+    for x_col, y_col in pairs:
+        x = pd.to_numeric(df[x_col], errors='coerce').to_numpy()
+        y = pd.to_numeric(df[y_col], errors='coerce').to_numpy()
+        if spec['model'] == 'log_cubic':
+            valid = (x > 0) & (y > 0)
+            x, y = np.log(np.where(valid, x, np.nan)), np.log(np.where(valid, y, np.nan))
+        xs.append(x)
+        ys.append(y)
+    fit = fit_polynomials(stack_series(xs), stack_series(ys), degree=3)
+    return [_row(kind, y_col, spec['model'], fit['coefficients'][i], fit['r_squared'][i], fit['mse'][i],
+                 fit['mae'][i], fit['n_points'][i])
+            for i, (_, y_col) in enumerate(pairs)]
+
+
+def _fit_zth(df):
+    t, zth = zth_from_dataframe(df)
+    network = fit_foster(t, zth, n_terms=4)
+    residual = foster_zth(t, network['R'], network['tau']) - zth
+    r_squared = 1 - np.sum(residual ** 2) / np.sum((zth - zth.mean()) ** 2)
+    return [_row('zth', ZTH_COLUMN, 'foster4', network['R'] + network['tau'], r_squared,
+                 np.mean(residual ** 2), np.mean(np.abs(residual)), len(t))]
+
+
+def _fit_ntc(df):
+    ntc = NTCThermistor.from_dataframe(df)
+    residual = ntc.temperature(ntc.r) - ntc.t
+    return [_row('ntc', NTC_RESISTANCE_COLUMN, 'steinhart_hart', ntc.coefficients, None,
+                 np.nanmean(residual ** 2), np.nanmean(np.abs(residual)), len(ntc.t))]
+
+
+def _fit_chip_module(df):
+    result = extract_package_resistance({'file': chip_module_curves(df)}).iloc[0]
+    return [_row('chip_module', 'VCE_Module - VCE_Chip', 'linear', [result['r_package'] * 1e-3, result['v_offset']],
+                 result['r_squared'])]
+
+
+FITTERS = {'zth': _fit_zth, 'ntc': _fit_ntc, 'chip_module': _fit_chip_module}
+
+
+# 擬合單一檔案（在工作程序中執行），回傳摘要列；錯誤也以一列記錄
+def fit_file(path, digest=None, version=None):
+    base = {'file': os.path.basename(path), 'sha256': digest or file_hash(path), 'version': version or code_version()}
+    try:
+        df = pd.read_csv(path, encoding='utf-8-sig')
+        df.columns = df.columns.str.strip()
+        kind = classify(df.columns)
+        if kind is None:
+            return [{**base, 'kind': None, 'error': '無法辨識的欄位'}]
+        rows = FITTERS[kind](df) if kind in FITTERS else _fit_pairs(df, kind)
+    except Exception as e:
+        return [{**base, 'kind': None, 'error': str(e)}]
+    return [{**base, **row, 'error': None} for row in rows]
+
+
+def read_summary(path):
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+    if path.endswith('.parquet'):
+        summary = pd.read_parquet(path)
+    else:
+        summary = pd.read_csv(path, encoding='utf-8', dtype={'sha256': str, 'version': str})
+    # 舊版摘要沒有 version 欄位，全部視為需要重新擬合
+    return summary.reindex(columns=SUMMARY_COLUMNS)
+
+
+# 寫出摘要（先寫暫存檔再取代）；副檔名 .parquet 時寫 Parquet，否則寫 CSV
+def write_summary(summary, path):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    if path.endswith('.parquet'):
+        summary.to_parquet(tmp_path, index=False)
+    else:
+        summary.to_csv(tmp_path, index=False, encoding='utf-8')
+    os.replace(tmp_path, path)
+
+
+# 擬合資料夾中的所有 CSV，內容雜湊與程式版本都與上一次摘要相同、且沒有錯誤的檔案沿用先前結果
+# 錯誤列（包括無法辨識的檔案）每次重新嘗試；程式修改後（code_version 改變）全部重新擬合
+# 回傳 (摘要 DataFrame, 重新擬合的檔案數)
+def run(directory, output=DEFAULT_OUTPUT, workers=None, force=False):
+    version = code_version()
+    previous = read_summary(output)
+    failed = set(previous.loc[previous['error'].notna(), 'file'])
+    current = previous[(previous['version'] == version) & ~previous['file'].isin(failed)]
+    previous_hash = dict(zip(current['file'], current['sha256']))
+
+    paths = [path for path in sorted(glob.glob(os.path.join(directory, '*.csv')))
+             if os.path.abspath(path) != os.path.abspath(output)]
+    kept, jobs = [], []
+    for path in paths:
+        name = os.path.basename(path)
+        digest = file_hash(path)
+        if not force and previous_hash.get(name) == digest:
+            kept.append(current[current['file'] == name])
+        else:
+            jobs.append((path, digest))
+
+    rows = []
+    if jobs:
+        context = pool_context()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            futures = [executor.submit(fit_file, path, digest, version) for path, digest in jobs]
+            for future in as_completed(futures):
+                rows.extend(future.result())
+
+    frames = [frame for frame in kept + [pd.DataFrame(rows, columns=SUMMARY_COLUMNS)] if not frame.empty]
+    summary = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=SUMMARY_COLUMNS)
+    summary = summary.sort_values(['file', 'curve'], na_position='first', kind='stable').reset_index(drop=True)
+    write_summary(summary, output)
+    return summary, len(jobs)
+
+
+# 命令列：python batchfit.py . --output fit_summary.parquet --workers 4
+def main():
+    parser = argparse.ArgumentParser(description="批次擬合資料夾中的所有曲線 CSV")
+    parser.add_argument('directory', nargs='?', default='.')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--force', action='store_true', help="忽略內容雜湊，全部重新擬合")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    summary, refitted = run(args.directory, args.output, args.workers, args.force)
+    fitted = summary[summary['error'].isna()]
+    print(f"{refitted} 個檔案重新擬合，{fitted['file'].nunique()} 個檔案共 {len(fitted)} 條曲線，摘要寫入 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import curve_fit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from curvefit import fit_dataframe, fit_polynomials
+
+# 比較 IFVF02 原本的 curve_fit 迴圈與批次最小二乘擬合
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '750V820AIF_VF_D.csv')
+temperatures = ['25℃', '150℃', '175℃']
+
+
+def polynomial(Vf, a, b, c, d):
+    return a * Vf ** 3 + b * Vf ** 2 + c * Vf + d
+
+
+# 原本的做法：逐溫度呼叫 curve_fit，再分別計算 R²、MSE、MAE
+def curve_fit_loop(x_series, y_series):
+    results = []
+    for Vf, If in zip(x_series, y_series):
+        popt, _ = curve_fit(polynomial, Vf, If)
+        residuals = If - polynomial(Vf, *popt)
+        ss_res = np.sum(residuals ** 2)
+        ss_tot = np.sum((If - np.mean(If)) ** 2)
+        results.append((popt, 1 - ss_res / ss_tot, np.mean(residuals ** 2), np.mean(np.abs(residuals))))
+    return results
+
+
+def timeit(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    data = pd.read_csv(DATA_PATH).replace([np.inf, -np.inf], np.nan).dropna()
+    x_series = [data[f'Vf_{temp}'].to_numpy() for temp in temperatures]
+    y_series = [data[f'If_{temp}'].to_numpy() for temp in temperatures]
+    pairs = [(f'Vf_{temp}', f'If_{temp}') for temp in temperatures]
+
+    loop_time = timeit(lambda: curve_fit_loop(x_series, y_series), 50)
+    batch_time = timeit(lambda: fit_dataframe(data, pairs), 50)
+    print(f"750V820AIF_VF_D.csv (3 條曲線): curve_fit 迴圈 {loop_time * 1e3:.3f} ms, "
+          f"批次擬合 {batch_time * 1e3:.3f} ms, 加速 {loop_time / batch_time:.1f}x")
+
+    # 合成資料：大量曲線（例如整個產品目錄）
+    rng = np.random.default_rng(0)
+    for n_curves, n_points in [(100, 500), (1000, 500)]:
+        x = np.sort(rng.uniform(0, 2.5, (n_curves, n_points)), axis=1)
+        coefficients = rng.uniform(-50, 50, (n_curves, 4))
+        y = sum(coefficients[:, [k]] * x ** (3 - k) for k in range(4)) + rng.normal(0, 1, x.shape)
+
+        loop_time = timeit(lambda: curve_fit_loop(list(x), list(y)), 3)
+        batch_time = timeit(lambda: fit_polynomials(x, y), 3)
+        print(f"合成資料 {n_curves} 條 × {n_points} 點: curve_fit 迴圈 {loop_time * 1e3:.1f} ms, "
+              f"批次擬合 {batch_time * 1e3:.1f} ms, 加速 {loop_time / batch_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ntc import NTCThermistor, steinhart_hart_temperature
+
+# NTC 讀值轉溫度：查表與直接計算 Steinhart–Hart 的速度與一致性
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'HPDIGBT_750V820ALT24.csv')
+
+
+def main():
+    ntc = NTCThermistor.from_catalog(CATALOG_PATH)
+    rng = np.random.default_rng(0)
+    for n in [10 ** 5, 10 ** 6, 10 ** 7]:
+        # 模擬記錄的讀值：溫度緩慢漂移，電阻在 5 kΩ 附近
+        r = np.clip(5000 * np.exp(np.cumsum(rng.normal(0, 1e-3, n))), 300, 90000)
+        out = np.empty_like(r)
+
+        start = time.perf_counter()
+        ntc.temperature(r, out)
+        table_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        reference = steinhart_hart_temperature(r, ntc.coefficients)
+        direct_time = time.perf_counter() - start
+
+        error = np.nanmax(np.abs(out - reference))
+        print(f"{n:>9} 筆: 查表 {table_time:.3f} s, 直接計算 {direct_time:.3f} s, 最大差異 {error:.2e} K")
+
+
+if __name__ == '__main__':
+    main()
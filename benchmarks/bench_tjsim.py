@@ -0,0 +1,37 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from tjsim import simulate, simulate_fft
+
+# 任務曲線 Tj 模擬：遞迴式（分區塊）與 FFT 捲積的速度與一致性
+NETWORKS = {
+    'IGBT': {'R': [0.0160, 0.0454, 0.0477, 0.0112], 'tau': [0.00019, 0.00129, 0.01317, 0.21485]},
+    'Diode': {'R': [0.0200, 0.0500, 0.0600, 0.0300], 'tau': [0.0002, 0.0015, 0.0200, 0.4000]},
+}
+DT = 1e-4
+
+
+def main():
+    rng = np.random.default_rng(0)
+    for n in [10 ** 5, 10 ** 6, 10 ** 7]:
+        power = {device: np.abs(rng.normal(100, 50, n)) for device in NETWORKS}
+
+        start = time.perf_counter()
+        tj = simulate(NETWORKS, power, DT)
+        recursive_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        reference = {device: simulate_fft(NETWORKS[device], power[device], DT) for device in NETWORKS}
+        fft_time = time.perf_counter() - start
+
+        error = max(np.abs(tj[device] - reference[device]).max() for device in NETWORKS)
+        print(f"{n:>9} 點 × {len(NETWORKS)} 元件: 遞迴 {recursive_time:.3f} s, FFT {fft_time:.3f} s, 最大差異 {error:.2e} K")
+
+
+if __name__ == '__main__':
+    main()
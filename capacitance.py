@@ -0,0 +1,98 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from scipy.integrate import cumulative_simpson
+
+from curvedata import read_curve_csv
+
+# 電容曲線的欄位（與 update_graph_g 相同），電容單位 nF
+CAPACITANCE_COLUMNS = ['Cies', 'Coes', 'Cres']
+VOLTAGE_COLUMN = 'VCE'
+
+# 積分用的密集電壓網格點數（Simpson 法需要等間距網格）
+DENSE_POINTS = 2049
+
+
+# 從 DataFrame 取出 VCE 與各電容曲線，依 VCE 排序並去除缺值與非正的電容
+def capacitance_curves(df):
+    missing = [column for column in [VOLTAGE_COLUMN] + CAPACITANCE_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"缺少電容欄位: {', '.join(missing)}")
+    vce = pd.to_numeric(df[VOLTAGE_COLUMN], errors='coerce').to_numpy()
+    curves = {}
+    for column in CAPACITANCE_COLUMNS:
+        c = pd.to_numeric(df[column], errors='coerce').to_numpy()
+        valid = np.isfinite(vce) & np.isfinite(c) & (c > 0) & (vce >= 0)
+        order = np.argsort(vce[valid])
+        curves[column] = (vce[valid][order], c[valid][order])
+    return curves
+
+
+class CapacitanceCurves:
+    # curves: {電容名稱: (VCE 陣列 (V), 電容陣列 (nF))}
+    # 電容在數據點之間以 ln C 線性插值（規格書曲線畫在對數座標上），第一個點以下取定值到 0 V
+    # 所有曲線重新取樣到同一個等間距網格後，一次以累積 Simpson 法積分：
+    #   Q(V) = ∫₀ⱽ C dv (nC)、E(V) = ∫₀ⱽ C·v dv (nJ)
+    def __init__(self, curves, points=DENSE_POINTS):
+        for name, (v, c) in curves.items():
+            if len(v) < 2:
+                raise ValueError(f"{name} 的數據點不足")
+        self.names = list(curves)
+        self.v_max = min(float(v[-1]) for v, _ in curves.values())
+        self.v = np.linspace(0.0, self.v_max, points)
+        self.c = np.array([np.exp(np.interp(self.v, v, np.log(c))) for v, c in curves.values()])
+        self.charge = cumulative_simpson(self.c, x=self.v, axis=-1, initial=0)
+        self.energy = cumulative_simpson(self.c * self.v, x=self.v, axis=-1, initial=0)
+
+    @classmethod
+    def from_dataframe(cls, df, **options):
+        return cls(capacitance_curves(df), **options)
+
+    def _lookup(self, table, name, v):
+        v = np.asarray(v, dtype=float)
+        values = np.interp(v, self.v, table[self.names.index(name)])
+        return np.where((v < 0) | (v > self.v_max), np.nan, values)
+
+    # 以下各函數的 v 為 VCE (V)，可為陣列；超出曲線範圍為 NaN
+    # Qoss (nC)
+    def qoss(self, v):
+        return self._lookup(self.charge, 'Coes', v)
+
+    # Eoss (μJ)
+    def eoss(self, v):
+        return self._lookup(self.energy, 'Coes', v) * 1e-3
+
+    # 時間等效電容 Co(tr) = Qoss/V (nF)：以定電流充電到 V 所需時間相同
+    def co_tr(self, v):
+        v = np.asarray(v, dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(v > 0, self.qoss(v) / v, np.nan)
+
+    # 能量等效電容 Co(er) = 2·Eoss/V² (nF)：儲存能量相同
+    def co_er(self, v):
+        v = np.asarray(v, dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(v > 0, 2 * self.eoss(v) * 1e3 / v ** 2, np.nan)
+
+    # Miller 電荷 QGC = ∫ Cres dv (nC)
+    def qgc(self, v):
+        return self._lookup(self.charge, 'Cres', v)
+
+    # 顯示與 API 用的表格
+    def table(self, v):
+        v = np.asarray(v, dtype=float)
+        return pd.DataFrame({
+            'VCE': v,
+            'Qoss(nC)': self.qoss(v),
+            'Eoss(μJ)': self.eoss(v),
+            'Co(tr)(nF)': self.co_tr(v),
+            'Co(er)(nF)': self.co_er(v),
+            'QGC(nC)': self.qgc(v),
+        })
+
+
+# 產品的電容分析（快取）：曲線檔 <產品>Capacitance_G.csv
+@lru_cache(maxsize=16)
+def get_capacitance(product):
+    return CapacitanceCurves.from_dataframe(read_curve_csv(f'{product}Capacitance_G.csv'))
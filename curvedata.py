@@ -0,0 +1,120 @@
+import glob
+import os
+from functools import lru_cache
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+# 曲線 CSV 的來源：本地檔案優先，否則從 GitHub 下載（與 main.py 使用相同的儲存庫）
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_URL = 'https://raw.githubusercontent.com/HelenWei1128/Datasheetdb/main/'
+
+# 各種曲線的檔案與欄位對應：{接面溫度: (電流欄位, 電壓欄位)}
+CURVE_SPECS = {
+    'if_vf': {
+        'file': '750V820AIF_VF_D.csv',
+        'columns': {
+            25: ('If_25℃', 'Vf_25℃'),
+            150: ('If_150℃', 'Vf_150℃'),
+            175: ('If_175℃', 'Vf_175℃'),
+        },
+    },
+    'ic_vce': {
+        'file': '750V820AIC_VCE_A.csv',
+        'columns': {
+            25: ('IC_Tj = 25℃', 'VCE_Tj = 25℃'),
+            150: ('IC_Tj = 150℃', 'VCE_Tj = 150℃'),
+            175: ('IC_Tj = 175℃', 'VCE_Tj = 175℃'),
+        },
+    },
+}
+
+
+# 讀取曲線 CSV（結果會被快取，呼叫端請勿直接修改回傳的 DataFrame）
+@lru_cache(maxsize=32)
+def read_curve_csv(filename):
+    local_path = os.path.join(DATA_DIR, filename)
+    if os.path.exists(local_path):
+        df = pd.read_csv(local_path, encoding='utf-8-sig')
+    else:
+        df = pd.read_csv(DATA_URL + quote(filename), encoding='utf-8-sig')
+    df.columns = df.columns.str.strip()
+    return df
+
+
+# 取出單調遞增的曲線段：去除缺值，並丟棄 x 沒有超過先前最大值的點（數位化時的回折雜訊）
+def monotonic_segment(x, y):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    valid = np.isfinite(x) & np.isfinite(y)
+    x = x[valid]
+    y = y[valid]
+    if len(x) == 0:
+        return x, y
+
+    previous_max = np.maximum.accumulate(np.concatenate(([-np.inf], x[:-1])))
+    keep = x > previous_max
+    return x[keep], y[keep]
+
+
+# 依欄位對應取出各溫度的 (電流, 電壓) 陣列
+def curve_arrays(df, columns):
+    curves = {}
+    for tj, (current_col, voltage_col) in columns.items():
+        if current_col in df.columns and voltage_col in df.columns:
+            curves[tj] = (pd.to_numeric(df[current_col], errors='coerce').to_numpy(),
+                          pd.to_numeric(df[voltage_col], errors='coerce').to_numpy())
+    return curves
+
+
+# 讀取指定種類的曲線集合（例如 'if_vf'、'ic_vce'）
+def load_curves(kind):
+    if kind not in CURVE_SPECS:
+        raise ValueError(f"未知的曲線種類: {kind}")
+    spec = CURVE_SPECS[kind]
+    return curve_arrays(read_curve_csv(spec['file']), spec['columns'])
+
+
+# 產品目錄 CSV 的第一個欄位，用來辨識資料夾中哪些檔案是產品目錄
+CATALOG_HEADER = 'Main_Values'
+
+
+# 資料夾中的產品目錄檔名（依資料夾的修改時間快取，新增或刪除檔案後重新掃描）
+@lru_cache(maxsize=1)
+def _catalog_files(directory_mtime):
+    names = []
+    for path in sorted(glob.glob(os.path.join(DATA_DIR, '*.csv'))):
+        with open(path, 'rb') as f:
+            header = f.readline().decode('utf-8', errors='replace').lstrip('\ufeff')
+        if header.split(',')[0].strip() == CATALOG_HEADER:
+            names.append(os.path.basename(path))
+    return tuple(names)
+
+
+def catalog_files():
+    return _catalog_files(os.stat(DATA_DIR).st_mtime_ns)
+
+
+# 將外部輸入（API 參數）的目錄檔名轉成本地路徑：只接受資料夾中的產品目錄檔名（不含路徑），否則拋出 FileNotFoundError
+def catalog_path(name):
+    name = str(name)
+    if os.path.basename(name) != name or name not in catalog_files():
+        raise FileNotFoundError(f"找不到產品目錄 {name}")
+    return os.path.join(DATA_DIR, name)
+
+
+# 讀取產品目錄 CSV（Main_Values, Paramater, Conditions, Symbol, ..., Typ, ...），檔案中含非 UTF-8 字元時以替代字元讀入
+@lru_cache(maxsize=32)
+def read_catalog(path):
+    df = pd.read_csv(path, encoding='utf-8', encoding_errors='replace')
+    df.columns = df.columns.str.strip()
+    return df
+
+
+# 取出目錄中某個符號的典型值，回傳 [(區段名稱, 數值), ...]（依檔案順序，略過非數值）
+def catalog_values(path, symbol, column='Typ'):
+    df = read_catalog(path)
+    rows = df[df['Symbol'].astype(str).str.replace(' ', '') == symbol.replace(' ', '')]
+    values = pd.to_numeric(rows[column], errors='coerce')
+    return [(str(section), float(value)) for section, value in zip(rows['Main_Values'], values) if np.isfinite(value)]
@@ -0,0 +1,101 @@
+import numpy as np
+
+
+# 將長度不同的多條曲線排成 (條數, 最大長度) 的陣列，不足的部分以 NaN 補齊
+def stack_series(series):
+    series = [np.asarray(s, dtype=float).ravel() for s in series]
+    length = max((len(s) for s in series), default=0)
+    stacked = np.full((len(series), length), np.nan)
+    for i, s in enumerate(series):
+        stacked[i, :len(s)] = s
+    return stacked
+
+
+# 以 Horner 法批次計算多項式，coefficients 為 (條數, 階數+1)，由最高次項排到常數項
+def polyval(coefficients, x):
+    coefficients = np.asarray(coefficients, dtype=float)
+    x = np.asarray(x, dtype=float)
+    if coefficients.ndim == 1:
+        result = np.zeros_like(x)
+        for c in coefficients:
+            result = result * x + c
+        return result
+
+    # 多條曲線：x 可以是共用的一維陣列，或每條曲線各自一列
+    if x.ndim == 1:
+        x = np.broadcast_to(x, (coefficients.shape[0], x.shape[0]))
+    result = np.zeros(x.shape)
+    for k in range(coefficients.shape[1]):
+        result = result * x + coefficients[:, k:k + 1]
+    return result
+
+
+# 多項式一階導數的係數（批次）
+def polyder(coefficients):
+    coefficients = np.asarray(coefficients, dtype=float)
+    degree = coefficients.shape[-1] - 1
+    powers = np.arange(degree, 0, -1)
+    return coefficients[..., :-1] * powers
+
+
+# 多項式基底（由最高次項排到常數項，與 polyval 的係數順序一致）
+def polynomial_basis(degree):
+    def basis(x):
+        return x[..., None] ** np.arange(degree, -1, -1)
+    return basis
+
+
+# 一次求解所有曲線的多項式最小二乘擬合，並同時計算 R²、MSE、MAE
+# x、y 為 (條數, 點數) 陣列，NaN 視為缺值
+def fit_polynomials(x, y, degree=3):
+    return fit_basis(x, y, polynomial_basis(degree))
+
+
+# 任意線性基底的批次最小二乘擬合：basis(x) 回傳 (..., 基底數) 的設計矩陣
+def fit_basis(x, y, basis):
+    x = np.atleast_2d(np.asarray(x, dtype=float))
+    y = np.atleast_2d(np.asarray(y, dtype=float))
+    if x.shape != y.shape:
+        raise ValueError(f"x 與 y 形狀不一致: {x.shape} != {y.shape}")
+
+    mask = np.isfinite(x) & np.isfinite(y)
+    n_points = mask.sum(axis=1)
+    xz = np.where(mask, x, 0.0)
+    yz = np.where(mask, y, 0.0)
+
+    # 設計矩陣（缺值列設為 0，不影響最小二乘解）
+    vander = basis(xz) * mask[..., None]
+    n_terms = vander.shape[-1]
+    if np.any(n_points < n_terms):
+        raise ValueError(f"每條曲線至少需要 {n_terms} 個有效數據點")
+
+    # 欄位正規化後用 QR 分解求解，避免正規方程式的條件數平方問題
+    column_norm = np.sqrt((vander ** 2).sum(axis=1))
+    column_norm[column_norm == 0] = 1.0
+    q, r = np.linalg.qr(vander / column_norm[:, None, :])
+    qty = np.einsum('snk,sn->sk', q, yz)
+    coefficients = np.linalg.solve(r, qty[..., None])[..., 0] / column_norm
+
+    # 一次計算所有評估指標
+    residuals = (yz - np.einsum('snk,sk->sn', vander, coefficients)) * mask
+    ss_res = (residuals ** 2).sum(axis=1)
+    mean_y = yz.sum(axis=1) / n_points
+    ss_tot = (((yz - mean_y[:, None]) * mask) ** 2).sum(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r_squared = 1 - ss_res / ss_tot
+
+    return {
+        'coefficients': coefficients,
+        'r_squared': r_squared,
+        'mse': ss_res / n_points,
+        'mae': np.abs(residuals).sum(axis=1) / n_points,
+        'n_points': n_points,
+    }
+
+
+# 從 DataFrame 依 (x 欄位, y 欄位) 配對一次擬合多條曲線
+def fit_dataframe(df, column_pairs, degree=3):
+    x = stack_series([df[x_col].to_numpy(dtype=float) for x_col, _ in column_pairs])
+    y = stack_series([df[y_col].to_numpy(dtype=float) for _, y_col in column_pairs])
+    return fit_polynomials(x, y, degree)
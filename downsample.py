@@ -0,0 +1,180 @@
+import contextvars
+from contextlib import contextmanager
+
+import numpy as np
+import plotly.graph_objects as go
+
+# 每條曲線送到瀏覽器的最大點數（超過才進行 LTTB 降採樣）
+MAX_POINTS_PER_TRACE = 2000
+
+# 原始點數超過此門檻時改用 WebGL (Scattergl) 繪製
+WEBGL_THRESHOLD = 20000
+
+# 目前要重新取樣的可視範圍（由 relayout 回調設定）
+_view_range = contextvars.ContextVar('view_range', default=None)
+
+
+# Largest-Triangle-Three-Buckets：回傳要保留的點索引
+def lttb_indices(x, y, n_out):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # 第一點與最後一點固定保留，中間切成 n_out - 2 個桶
+    every = (n - 2) / (n_out - 2)
+    edges = (np.arange(n_out - 1) * every).astype(np.int64) + 1
+    edges[-1] = n - 1
+
+    # 以前綴和計算每個桶的平均值，避免重複加總
+    cx = np.concatenate(([0.0], np.cumsum(x)))
+    cy = np.concatenate(([0.0], np.cumsum(y)))
+
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_stop = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_stop = n - 1, n
+        count = next_stop - next_start
+        avg_x = (cx[next_stop] - cx[next_start]) / count
+        avg_y = (cy[next_stop] - cy[next_start]) / count
+
+        # 與前一個選取點及下一桶平均點構成的三角形面積（省略 1/2）
+        bx = x[start:stop]
+        by = y[start:stop]
+        areas = np.abs((x[a] - avg_x) * (by - y[a]) - (x[a] - bx) * (avg_y - y[a]))
+        a = start + int(np.argmax(areas))
+        indices[i + 1] = a
+
+    return indices
+
+
+# 對單一曲線降採樣；log 軸在 log10 空間計算面積，避免小數值區段被犧牲
+def lttb(x, y, n_out, x_log=False, y_log=False):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    valid = np.isfinite(x) & np.isfinite(y)
+    if x_log:
+        valid &= x > 0
+    if y_log:
+        valid &= y > 0
+    x = x[valid]
+    y = y[valid]
+
+    tx = np.log10(x) if x_log else x
+    ty = np.log10(y) if y_log else y
+    idx = lttb_indices(tx, ty, n_out)
+    return x[idx], y[idx]
+
+
+# 從 relayoutData 取出使用者縮放後的 x/y 範圍（軸座標），無相關資訊時回傳 None
+def relayout_ranges(relayout_data):
+    if not relayout_data:
+        return None
+    if relayout_data.get('xaxis.autorange'):
+        return {'x': None, 'y': None}
+
+    ranges = {}
+    for axis in ('x', 'y'):
+        if f'{axis}axis.range[0]' in relayout_data:
+            ranges[axis] = (relayout_data[f'{axis}axis.range[0]'], relayout_data[f'{axis}axis.range[1]'])
+        elif f'{axis}axis.range' in relayout_data:
+            ranges[axis] = tuple(relayout_data[f'{axis}axis.range'])
+    if not ranges:
+        return None
+    ranges.setdefault('x', None)
+    ranges.setdefault('y', None)
+    return ranges
+
+
+# 在指定的可視範圍內重建圖表（供 relayout 回調以完整解析度重新取樣）
+@contextmanager
+def view_range(ranges):
+    token = _view_range.set(ranges)
+    try:
+        yield
+    finally:
+        _view_range.reset(token)
+
+
+# 目前的可視範圍（沒有設定時為 None），供快取鍵使用
+def current_view_range():
+    return _view_range.get()
+
+
+def _axis_is_log(fig, axis):
+    axis_layout = fig.layout.xaxis if axis == 'x' else fig.layout.yaxis
+    return axis_layout.type == 'log'
+
+
+# 圖表輸出前的渲染階段：依點數預算降採樣，點數過多時改用 Scattergl
+def decimate_figure(fig, max_points=MAX_POINTS_PER_TRACE, webgl_threshold=WEBGL_THRESHOLD):
+    ranges = _view_range.get()
+    x_log = _axis_is_log(fig, 'x')
+    y_log = _axis_is_log(fig, 'y')
+
+    # relayout 的範圍在 log 軸上是 log10 值，換回資料座標
+    x_range = ranges.get('x') if ranges else None
+    if x_range is not None:
+        x_range = sorted(10 ** np.asarray(x_range, dtype=float) if x_log else np.asarray(x_range, dtype=float))
+
+    if not ranges and not any(
+            isinstance(trace, (go.Scatter, go.Scattergl)) and trace.x is not None and len(trace.x) > max_points
+            for trace in fig.data):
+        return fig
+
+    traces = []
+    for trace in fig.data:
+        if not isinstance(trace, (go.Scatter, go.Scattergl)) or trace.x is None or trace.y is None:
+            traces.append(trace)
+            continue
+
+        try:
+            x = np.asarray(trace.x, dtype=float)
+            y = np.asarray(trace.y, dtype=float)
+        except (TypeError, ValueError):
+            # 非數值資料（例如類別軸）不處理
+            traces.append(trace)
+            continue
+        raw_points = len(x)
+
+        # 只保留可視範圍內的點，並多留左右各一點讓線條延伸到邊界
+        if x_range is not None:
+            core = (x >= x_range[0]) & (x <= x_range[1])
+            inside = core.copy()
+            inside[:-1] |= core[1:]
+            inside[1:] |= core[:-1]
+            x = x[inside]
+            y = y[inside]
+
+        if len(x) > max_points:
+            x, y = lttb(x, y, max_points, x_log=x_log, y_log=y_log)
+
+        props = trace.to_plotly_json()
+        props.pop('type', None)
+        props['x'] = x
+        props['y'] = y
+        if raw_points > webgl_threshold:
+            try:
+                traces.append(go.Scattergl(props))
+                continue
+            except ValueError:
+                pass
+        traces.append(go.Scatter(props) if isinstance(trace, go.Scatter) else go.Scattergl(props))
+
+    new_fig = go.Figure(data=traces, layout=fig.layout)
+
+    # 保持使用者目前的縮放範圍
+    if ranges:
+        if ranges.get('x') is not None:
+            new_fig.update_xaxes(range=list(ranges['x']))
+        if ranges.get('y') is not None:
+            new_fig.update_yaxes(range=list(ranges['y']))
+    return new_fig
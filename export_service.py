@@ -0,0 +1,204 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import plotly.graph_objects as go
+from plotly.utils import PlotlyJSONEncoder
+
+from procpool import pool_context
+from resultcache import result_cache
+
+# 常駐 kaleido 渲染進程數量與記憶體快取大小（可由環境變數調整）
+EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', 2))
+EXPORT_CACHE_SIZE = int(os.environ.get('EXPORT_CACHE_SIZE', 128))
+
+# 支援的輸出格式
+EXPORT_FORMATS = ('png', 'svg', 'pdf')
+
+
+# 渲染進程啟動時先畫一張空圖，讓 kaleido 的 chromium 常駐待命
+def _warm_up():
+    try:
+        go.Figure().to_image(format='png')
+    except Exception as e:
+        logging.error(f"kaleido 預熱失敗: {e}")
+
+
+# 在渲染進程中執行：將圖表 JSON 轉成圖片位元組
+def _render(figure_json, fmt, width, height, scale):
+    return go.Figure(json.loads(figure_json)).to_image(format=fmt, width=width, height=height, scale=scale)
+
+
+# 圖表內容與輸出參數的雜湊值，作為快取鍵
+def figure_key(figure_json, fmt, width=None, height=None, scale=None):
+    digest = hashlib.sha256(figure_json.encode('utf-8'))
+    digest.update(f'|{fmt}|{width}|{height}|{scale}'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def figure_to_json(figure):
+    if isinstance(figure, go.Figure):
+        figure = figure.to_plotly_json()
+    return json.dumps(figure, cls=PlotlyJSONEncoder, sort_keys=True)
+
+
+# 將 (名稱, 位元組) 依序寫入 zip
+def build_zip(rendered, fmt):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in rendered:
+            archive.writestr(f'{name}.{fmt}', data)
+    return buffer.getvalue()
+
+
+# 將 PNG 頁面合併成多頁 PDF，順序依 named_figures
+def build_pdf(named_figures, rendered, scale):
+    from PIL import Image
+
+    pages = {}
+    for name, data in rendered:
+        pages[name] = Image.open(io.BytesIO(data)).convert('RGB')
+    ordered = [pages[name] for name in named_figures if name in pages]
+    if not ordered:
+        raise ValueError("沒有可輸出的圖表")
+
+    buffer = io.BytesIO()
+    ordered[0].save(buffer, format='PDF', save_all=True, append_images=ordered[1:],
+                    resolution=72 * scale)
+    return buffer.getvalue()
+
+
+# 批次匯出的圖片格式與放大倍率：PDF 由放大的 PNG 頁面組成，zip 以原始大小輸出
+def batch_options(batch_format, fmt='png', scale=2):
+    if batch_format == 'pdf':
+        return 'png', scale
+    if batch_format != 'zip':
+        raise ValueError(f"不支援的批次格式: {batch_format}")
+    return fmt, None
+
+
+class RenderPool:
+    def __init__(self, workers=EXPORT_WORKERS, cache_size=EXPORT_CACHE_SIZE):
+        self.workers = workers
+        self.cache_size = cache_size
+        self._executor = None
+        self._cache = OrderedDict()
+        self._pending = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+
+    # 進程池在第一次使用時才建立，避免 gunicorn 主進程在 fork 前就啟動渲染器
+    def _get_executor(self):
+        if self._executor is None:
+            context = pool_context()
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                                 initializer=_warm_up)
+        return self._executor
+
+    def _store(self, key, data):
+        self._cache[key] = data
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    # 渲染完成：存入記憶體快取，並寫入磁碟快取讓重新啟動或其他 worker 沿用
+    def _on_done(self, key, future):
+        with self._lock:
+            self._pending.pop(key, None)
+            try:
+                data = future.result()
+            except Exception as e:
+                logging.error(f"圖片渲染失敗: {e}")
+                self._errors[key] = e
+                return
+            self._store(key, data)
+        result_cache.set(result_cache.key('export', key), data)
+
+    # 送出渲染工作並回傳快取鍵；相同圖表與格式的工作只會渲染一次
+    def submit(self, figure, fmt='png', width=None, height=None, scale=None):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"不支援的輸出格式: {fmt}")
+        figure_json = figure_to_json(figure)
+        key = figure_key(figure_json, fmt, width, height, scale)
+        with self._lock:
+            if key in self._cache or key in self._pending:
+                return key
+            # 先前（或其他 worker）已渲染過的圖片直接從磁碟快取取回
+            data = result_cache.get(result_cache.key('export', key))
+            if data is not None:
+                self._store(key, data)
+                return key
+            future = self._get_executor().submit(_render, figure_json, fmt, width, height, scale)
+            self._pending[key] = future
+        future.add_done_callback(lambda f: self._on_done(key, f))
+        return key
+
+    # 取得已完成的渲染結果；尚未完成時回傳 None，渲染失敗時拋出原本的例外
+    # 此 worker 沒有進行中的工作時改查磁碟快取（由其他 worker 送出的渲染完成後寫入）
+    def result(self, key):
+        with self._lock:
+            if key in self._errors:
+                raise self._errors.pop(key)
+            data = self._cache.get(key)
+            if data is not None:
+                self._cache.move_to_end(key)
+                return data
+            if key in self._pending:
+                return None
+        data = result_cache.get(result_cache.key('export', key))
+        if data is not None:
+            with self._lock:
+                self._store(key, data)
+        return data
+
+    # 送出（或沿用）工作並回傳目前結果，供輪詢使用
+    def poll(self, figure, fmt='png', width=None, height=None, scale=None):
+        return self.result(self.submit(figure, fmt, width, height, scale))
+
+    def future(self, key):
+        with self._lock:
+            return self._pending.get(key)
+
+    # 同步渲染（會等待渲染進程完成），供批次或離線使用
+    def render(self, figure, fmt='png', width=None, height=None, scale=None, timeout=None):
+        key = self.submit(figure, fmt, width, height, scale)
+        future = self.future(key)
+        if future is not None:
+            future.result(timeout=timeout)
+        data = self.result(key)
+        if data is None:
+            # done callback 可能尚未執行完畢，直接從 future 取結果
+            data = future.result(timeout=timeout)
+        return data
+
+    # 批次匯出：每張圖表各自送入渲染池平行渲染，回傳 {名稱: 快取鍵}（順序與輸入相同）
+    def submit_batch(self, named_figures, batch_format='zip', fmt='png', scale=2):
+        fmt, scale = batch_options(batch_format, fmt, scale)
+        return {name: self.submit(figure, fmt, scale=scale) for name, figure in named_figures.items()}
+
+    # 收集批次渲染結果，回傳 (完成比例, 檔案位元組)；尚有未完成的圖表時位元組為 None
+    # 任一張渲染失敗時拋出原本的例外；結果經磁碟快取共用，可在任何 worker 輪詢
+    def collect_batch(self, keys, batch_format='zip', fmt='png', scale=2):
+        fmt, scale = batch_options(batch_format, fmt, scale)
+        rendered = [(name, self.result(key)) for name, key in keys.items()]
+        done = sum(data is not None for _, data in rendered)
+        if done < len(rendered):
+            return done / len(rendered), None
+        if batch_format == 'pdf':
+            return 1.0, build_pdf(keys, rendered, scale)
+        return 1.0, build_zip(rendered, fmt)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# 全域共用的渲染池
+render_pool = RenderPool()
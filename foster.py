@@ -0,0 +1,257 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import least_squares, nnls
+
+from procpool import pool_context
+
+# 每個產品的熱網路參數存放位置（每個產品一個 JSON 檔，內含各元件的 Foster 與 Cauer 參數）
+THERMAL_MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'thermal_models')
+
+# Zth 檔案的欄位（與 update_graph_m / update_graph_n 相同）
+ZTH_TIME_COLUMN = 't [s]'
+ZTH_COLUMN = 'Zth (t)'
+
+
+# Foster 網路的暫態熱阻：Zth(t) = Σ R_i·(1 − exp(−t/τ_i))，t 可為任意形狀
+def foster_zth(t, r, tau):
+    t = np.asarray(t, dtype=float)[..., None]
+    return (np.asarray(r) * -np.expm1(-t / np.asarray(tau))).sum(axis=-1)
+
+
+# 從 DataFrame 取出有效的 (t, Zth) 數據
+def zth_from_dataframe(df, time_column=ZTH_TIME_COLUMN, zth_column=ZTH_COLUMN):
+    t = pd.to_numeric(df[time_column], errors='coerce').to_numpy()
+    zth = pd.to_numeric(df[zth_column], errors='coerce').to_numpy()
+    valid = np.isfinite(t) & np.isfinite(zth) & (t > 0) & (zth > 0)
+    order = np.argsort(t[valid], kind='stable')
+    return t[valid][order], zth[valid][order]
+
+
+# 在 log-log 空間重新取樣到對數等距的時間軸，使每個十倍頻的權重相同
+def log_resample(t, zth, points_per_decade=20):
+    t, unique = np.unique(t, return_index=True)
+    zth = zth[unique]
+    decades = np.log10(t[-1] / t[0])
+    grid = np.logspace(np.log10(t[0]), np.log10(t[-1]), max(int(decades * points_per_decade), 2) + 1)
+    return grid, np.exp(np.interp(np.log(grid), np.log(t), np.log(zth)))
+
+
+# 將 NNLS 得到的時間常數頻譜依累積熱阻平均分成 n_terms 組，作為非線性擬合的初始值
+def _initial_terms(taus, spectrum, n_terms):
+    active = spectrum > 0
+    taus = taus[active]
+    spectrum = spectrum[active]
+    if len(spectrum) <= n_terms:
+        # 頻譜項數不足時補上極小的項
+        extra = n_terms - len(spectrum)
+        filler = np.logspace(np.log10(taus.min() if len(taus) else 1e-3), np.log10(taus.max() if len(taus) else 1), extra + 2)[1:-1]
+        r = np.concatenate([spectrum, np.full(extra, max(spectrum.sum(), 1e-3) * 1e-3)])
+        return r, np.concatenate([taus, filler])
+
+    cumulative = np.cumsum(spectrum) / spectrum.sum()
+    group = np.minimum((cumulative * n_terms - 1e-9).astype(int), n_terms - 1)
+    r = np.bincount(group, weights=spectrum, minlength=n_terms)
+    log_tau = np.bincount(group, weights=spectrum * np.log(taus), minlength=n_terms) / np.maximum(r, 1e-300)
+    # 空的組別以相鄰組別的時間常數補齊
+    empty = r == 0
+    if np.any(empty):
+        log_tau[empty] = np.interp(np.flatnonzero(empty), np.flatnonzero(~empty), log_tau[~empty])
+        r[empty] = r.sum() * 1e-3
+    return r, np.exp(log_tau)
+
+
+# 擷取 N 階 Foster 網路
+# 1) 在對數等距的 τ 網格上以 NNLS 求非負的時間常數頻譜（線性問題，條件良好）
+# 2) 以頻譜分組結果為初值，在 log(R)、log(τ) 上做非線性最小二乘精修
+# 誤差以絕對值（K/W）計算，與 Zth 試算表的 error / root mean square 欄位一致；
+# 量測初期（數 µs 內）的 Zth 上升速度超過任何 Foster 網路能表示的範圍，不適合用相對誤差加權
+def fit_foster(t, zth, n_terms=4, points_per_decade=20):
+    t = np.asarray(t, dtype=float)
+    zth = np.asarray(zth, dtype=float)
+    if len(t) < 2 * n_terms:
+        raise ValueError(f"數據點不足以擬合 {n_terms} 階 Foster 網路")
+
+    grid, z_grid = log_resample(t, zth, points_per_decade)
+
+    taus = np.logspace(np.log10(grid[0]) - 1, np.log10(grid[-1]) + 1,
+                       int(np.log10(grid[-1] / grid[0]) + 2) * 10)
+    design = -np.expm1(-grid[:, None] / taus[None, :])
+    spectrum, _ = nnls(design, z_grid)
+    r0, tau0 = _initial_terms(taus, spectrum, n_terms)
+
+    def residuals(p):
+        r, tau = np.exp(p[:n_terms]), np.exp(p[n_terms:])
+        return foster_zth(grid, r, tau) - z_grid
+
+    def jacobian(p):
+        r, tau = np.exp(p[:n_terms]), np.exp(p[n_terms:])
+        decay = np.exp(-grid[:, None] / tau)
+        d_log_r = r * (1 - decay)
+        d_log_tau = -r * decay * grid[:, None] / tau
+        return np.hstack([d_log_r, d_log_tau])
+
+    # τ 限制在 NNLS 網格範圍內，避免精修時發散
+    lower = np.concatenate([np.full(n_terms, -50.0), np.full(n_terms, np.log(taus[0]))])
+    upper = np.concatenate([np.full(n_terms, 10.0), np.full(n_terms, np.log(taus[-1]))])
+    p0 = np.clip(np.log(np.concatenate([r0, tau0])), lower + 1e-9, upper - 1e-9)
+    solution = least_squares(residuals, p0, jac=jacobian, bounds=(lower, upper), method='trf')
+    r = np.exp(solution.x[:n_terms])
+    tau = np.exp(solution.x[n_terms:])
+    order = np.argsort(tau)
+    r, tau = r[order], tau[order]
+
+    # 在原始量測點上評估擬合誤差
+    error = foster_zth(t, r, tau) - zth
+    r_cauer, c_cauer = foster_to_cauer(r, tau)
+    return {
+        'n_terms': n_terms,
+        'R': r.tolist(),
+        'tau': tau.tolist(),
+        'C': (tau / r).tolist(),
+        'Rth': float(r.sum()),
+        'rms_error': float(np.sqrt(np.mean(error ** 2))),
+        'max_error': float(np.abs(error).max()),
+        'cauer': {'R': r_cauer.tolist(), 'C': c_cauer.tolist()},
+    }
+
+
+# Foster → Cauer 轉換：將 Z(s) = N(s)/D(s) 以連分式展開（從接面端依序取出 C、R）
+# 時間常數先以幾何平均正規化，降低多項式係數的數量級差異
+def foster_to_cauer(r, tau):
+    r = np.asarray(r, dtype=float)
+    tau = np.asarray(tau, dtype=float)
+    scale = np.exp(np.mean(np.log(tau)))
+    tau_n = tau / scale
+
+    # D(s) = Π(1 + s·τ_i)，N(s) = Σ R_i·Π_{j≠i}(1 + s·τ_j)（係數由低次到高次）
+    P = np.polynomial.polynomial
+    denominator = np.array([1.0])
+    for tau_i in tau_n:
+        denominator = P.polymul(denominator, [1.0, tau_i])
+    numerator = np.zeros(len(tau_n))
+    for i, r_i in enumerate(r):
+        term = np.array([r_i])
+        for j, tau_j in enumerate(tau_n):
+            if j != i:
+                term = P.polymul(term, [1.0, tau_j])
+        numerator[:len(term)] += term
+
+    r_cauer, c_cauer = [], []
+    for _ in range(len(r)):
+        # Y = D/N：取出並聯電容 C = lead(D)/lead(N)，餘式 D' = D − C·s·N（最高次項抵消）
+        c_k = denominator[-1] / numerator[-1]
+        denominator = denominator.copy()
+        denominator[1:] -= c_k * numerator
+        denominator = denominator[:-1]
+        # Z = N/D'：取出串聯電阻 R = lead(N)/lead(D')，餘式 N' = N − R·D'
+        r_k = numerator[-1] / denominator[-1]
+        numerator = (numerator - r_k * denominator)[:-1]
+        c_cauer.append(c_k * scale)
+        r_cauer.append(r_k)
+        if len(numerator) == 0:
+            break
+    return np.array(r_cauer), np.array(c_cauer)
+
+
+# 依檔名推斷產品與元件，例：750V820AZthtrialIGBT_M.csv → ('750V820A', 'IGBT')
+def product_from_filename(path):
+    name = os.path.basename(path)
+    match = re.match(r'^(.*?\d+V\d+A)', name)
+    product = match.group(1) if match else os.path.splitext(name)[0]
+    device = 'Diode' if re.search(r'diode', name, re.IGNORECASE) else 'IGBT'
+    return product, device
+
+
+def _model_path(product, directory):
+    return os.path.join(directory, f'{product}.json')
+
+
+def load_networks(product, directory=THERMAL_MODEL_DIR):
+    path = _model_path(product, directory)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+# 儲存某產品某元件的熱網路參數（先寫暫存檔再取代，避免寫到一半的檔案被讀取）
+def save_network(product, device, network, directory=THERMAL_MODEL_DIR):
+    os.makedirs(directory, exist_ok=True)
+    networks = load_networks(product, directory)
+    networks[device] = network
+    path = _model_path(product, directory)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(networks, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _fit_file(path, n_terms):
+    df = pd.read_csv(path, encoding='utf-8-sig')
+    t, zth = zth_from_dataframe(df)
+    return fit_foster(t, zth, n_terms)
+
+
+# 平行重新擬合整個目錄的 Zth 檔案，並依產品儲存結果
+# jobs: [(產品, 元件, CSV 路徑), ...]，回傳 {(產品, 元件): 參數或錯誤訊息}
+def fit_catalog(jobs, n_terms=4, workers=None, directory=THERMAL_MODEL_DIR):
+    context = pool_context()
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = {(product, device): executor.submit(_fit_file, path, n_terms) for product, device, path in jobs}
+        for (product, device), future in futures.items():
+            try:
+                network = future.result()
+            except Exception as e:
+                logging.error(f"Foster 擬合失敗 {product} {device}: {e}")
+                results[(product, device)] = {'error': str(e)}
+                continue
+            save_network(product, device, network, directory)
+            results[(product, device)] = network
+    return results
+
+
+# 資料夾中的 Zth 檔案（欄位含 t [s] 與 Zth (t)），回傳 fit_catalog 的工作列表 [(產品, 元件, CSV 路徑), ...]
+def zth_jobs(directory):
+    jobs = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.csv'))):
+        try:
+            columns = pd.read_csv(path, encoding='utf-8-sig', nrows=0).columns.str.strip()
+        except (UnicodeDecodeError, pd.errors.ParserError):
+            continue
+        if {ZTH_TIME_COLUMN, ZTH_COLUMN}.issubset(columns):
+            jobs.append((*product_from_filename(path), path))
+    return jobs
+
+
+# 命令列：python foster.py . --terms 4 --workers 4（結果寫入 thermal_models，供 sweep 與 tjsim 使用）
+def main():
+    parser = argparse.ArgumentParser(description="平行擬合資料夾中所有 Zth 檔案的 Foster 網路，並依產品儲存")
+    parser.add_argument('directory', nargs='?', default='.')
+    parser.add_argument('--terms', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default=THERMAL_MODEL_DIR)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    jobs = zth_jobs(args.directory)
+    results = fit_catalog(jobs, args.terms, args.workers, args.output)
+    for (product, device), network in sorted(results.items()):
+        if 'error' in network:
+            print(f"{product} {device}: 擬合失敗 {network['error']}")
+        else:
+            print(f"{product} {device}: Rth = {network['Rth']:.4f} K/W，RMS = {network['rms_error']:.2e} K/W")
+    print(f"{len(jobs)} 個 Zth 檔案，結果寫入 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from curvedata import catalog_values, read_curve_csv
+
+# Gate charge 檔案可能的欄位組合：(QG 欄位 (μC), VGE 欄位 (V))
+GATE_CHARGE_COLUMNS = [('QG', 'VG'), ('QG(μC)_25℃', 'VGE(V)_25℃')]
+
+# 規格書的驅動電壓（與 Diagrams1 卡片上的條件相同）
+DEFAULT_V_OFF = -8.0
+DEFAULT_V_ON = 15.0
+# 目錄中沒有 RG,int 時使用的內部閘極電阻 (Ω)
+DEFAULT_RG_INT = 0.0
+
+# 平滑時的 QG 分箱數
+CHARGE_BINS = 120
+# Miller 平台判定：dV/dQ 低於平台外斜率中位數的此比例
+PLATEAU_SLOPE_RATIO = 0.25
+
+
+# 從 DataFrame 取出 (QG (μC), VGE (V))，依量測順序保留
+def gate_charge_curve(df):
+    for q_col, v_col in GATE_CHARGE_COLUMNS:
+        if q_col in df.columns and v_col in df.columns:
+            q = pd.to_numeric(df[q_col], errors='coerce').to_numpy()
+            v = pd.to_numeric(df[v_col], errors='coerce').to_numpy()
+            valid = np.isfinite(q) & np.isfinite(v)
+            return q[valid], v[valid]
+    raise ValueError(f"缺少 Gate charge 欄位，可接受的欄位: {GATE_CHARGE_COLUMNS}")
+
+
+class GateCharge:
+    # q: 閘極電荷 (μC)，v: VGE (V)，示波器量測的原始點（含雜訊與重複點）
+    # 先依 QG 分箱取中位數得到 V(Q)，再取累積最大值得到單調的 V(Q) 包絡
+    def __init__(self, q, v, rg_int=DEFAULT_RG_INT, bins=CHARGE_BINS):
+        q = np.asarray(q, dtype=float)
+        v = np.asarray(v, dtype=float)
+        if len(q) < 10:
+            raise ValueError("Gate charge 數據點不足")
+        self.rg_int = rg_int
+
+        edges = np.linspace(q.min(), q.max(), bins + 1)
+        index = np.clip(np.searchsorted(edges, q, side='right') - 1, 0, bins - 1)
+        order = np.argsort(index, kind='stable')
+        groups = np.split(v[order], np.flatnonzero(np.diff(index[order])) + 1)
+        filled = np.unique(index)
+        self.q = 0.5 * (edges[filled] + edges[filled + 1])
+        self.v = np.maximum.accumulate(np.array([np.median(group) for group in groups]))
+        # 以最低電壓處的電荷為零點；q_offset 為零點在原始數據中的電荷（第一個區間的中心）
+        self.q_offset = self.q[0]
+        self.q = self.q - self.q_offset
+
+    @classmethod
+    def from_dataframe(cls, df, rg_int=DEFAULT_RG_INT):
+        return cls(*gate_charge_curve(df), rg_int=rg_int)
+
+    # 電壓 v 對應的電荷（第一次到達 v 的位置），範圍外以兩端的等效電容線性外插
+    def charge_at(self, v):
+        v = np.asarray(v, dtype=float)
+        index = np.clip(np.searchsorted(self.v, v, side='left'), 1, len(self.v) - 1)
+        v0 = self.v[index - 1]
+        v1 = self.v[index]
+        step = np.where(v1 > v0, v1 - v0, np.inf)
+        q = self.q[index - 1] + (v - v0) / step * (self.q[index] - self.q[index - 1])
+
+        low_slope = (self.q[1] - self.q[0]) / max(self.v[1] - self.v[0], 1e-9)
+        high_slope = (self.q[-1] - self.q[-2]) / max(self.v[-1] - self.v[-2], 1e-9)
+        q = np.where(v < self.v[0], self.q[0] + (v - self.v[0]) * low_slope, q)
+        return np.where(v > self.v[-1], self.q[-1] + (v - self.v[-1]) * high_slope, q)
+
+    # 驅動電壓擺幅 v_off → v_on 所需的總閘極電荷 (μC)
+    def total_charge(self, v_off=DEFAULT_V_OFF, v_on=DEFAULT_V_ON):
+        if v_on <= v_off:
+            raise ValueError("v_on 必須大於 v_off")
+        return float(self.charge_at(v_on) - self.charge_at(v_off))
+
+    # Miller 平台：dV/dQ 明顯低於其餘區段的最長連續區間
+    # 回傳平台電壓、起訖電荷與 Miller 電荷 QGC，找不到時回傳 None
+    def miller_plateau(self):
+        slope = np.gradient(self.v, self.q)
+        reference = np.median(slope[slope > 0]) if np.any(slope > 0) else 0.0
+        flat = slope < PLATEAU_SLOPE_RATIO * reference
+        # 只在曲線中段找平台，排除負壓與飽和段的平坦部分
+        span = self.v[-1] - self.v[0]
+        flat &= (self.v > self.v[0] + 0.1 * span) & (self.v < self.v[-1] - 0.1 * span)
+        if not np.any(flat):
+            return None
+
+        edges = np.diff(np.concatenate(([0], flat.astype(int), [0])))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        longest = np.argmax(self.q[ends - 1] - self.q[starts])
+        start, end = starts[longest], ends[longest] - 1
+        return {
+            'v_plateau': float(np.median(self.v[start:end + 1])),
+            'q_start': float(self.q[start]),
+            'q_end': float(self.q[end]),
+            'q_gc': float(self.q[end] - self.q[start]),
+        }
+
+    # 閘極驅動器需求（向量化）：fsw (Hz) 與 rg（外部閘極電阻，Ω）依 NumPy 規則廣播
+    # P_driver = QG·ΔV·fsw，其中外部電阻上的功率依 RG,ext/(RG,ext + RG,int) 分配
+    # 峰值電流以 ΔV/(RG,ext + RG,int) 估算（忽略驅動器內阻與雜散電感）
+    def driver(self, fsw, rg, v_off=DEFAULT_V_OFF, v_on=DEFAULT_V_ON):
+        fsw, rg = np.broadcast_arrays(np.asarray(fsw, dtype=float), np.asarray(rg, dtype=float))
+        swing = v_on - v_off
+        charge = self.total_charge(v_off, v_on) * 1e-6
+        power = charge * swing * fsw
+        total_rg = rg + self.rg_int
+        if np.any(total_rg <= 0):
+            raise ValueError("閘極電阻必須大於 0")
+        return {
+            'power': power,
+            'power_rg_ext': power * rg / total_rg,
+            'peak_current': swing / total_rg,
+            'average_current': charge * fsw,
+        }
+
+    # 顯示用的摘要
+    def summary(self, v_off=DEFAULT_V_OFF, v_on=DEFAULT_V_ON, fsw=10e3, rg=2.5):
+        plateau = self.miller_plateau()
+        driver = self.driver(fsw, rg, v_off, v_on)
+        return {
+            'v_off': v_off,
+            'v_on': v_on,
+            'qg': self.total_charge(v_off, v_on),
+            'v_plateau': plateau['v_plateau'] if plateau else None,
+            'q_gc': plateau['q_gc'] if plateau else None,
+            'rg_int': self.rg_int,
+            'fsw': fsw,
+            'rg': rg,
+            'power': float(driver['power']),
+            'peak_current': float(driver['peak_current']),
+        }
+
+
+# 產品的 Gate charge 分析（快取）：曲線檔 <產品>Gatecharge_L.csv，RG,int 取自目錄 CSV（若有）
+@lru_cache(maxsize=16)
+def get_gate_charge(product, catalog_file=None):
+    rg_int = DEFAULT_RG_INT
+    if catalog_file is not None:
+        values = catalog_values(catalog_file, 'RG,int')
+        if values:
+            rg_int = values[0][1]
+    return GateCharge.from_dataframe(read_curve_csv(f'{product}Gatecharge_L.csv'), rg_int=rg_int)
@@ -0,0 +1,244 @@
+import inspect
+import logging
+import multiprocessing
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from procpool import pool_context
+from resultcache import content_hash, result_cache
+
+# 背景工作的程序數、完成後保留結果的時間（秒）與數量（可由環境變數調整）
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+JOB_RETENTION = float(os.environ.get('JOB_RETENTION', 600))
+JOB_MAX_RETAINED = int(os.environ.get('JOB_MAX_RETAINED', 64))
+# 進度回報的最短間隔（秒），避免每個小步驟都經過程序間通訊
+PROGRESS_INTERVAL = 0.2
+
+
+class JobCancelled(Exception):
+    pass
+
+
+# 工作程序共用的進度與取消標記（由 Manager 提供，工作程序啟動時經 initializer 傳入）
+_shared = None
+
+
+def _init_worker(progress, cancelled):
+    global _shared
+    _shared = (progress, cancelled)
+
+
+class Progress:
+    # 傳給工作函數的進度回報：progress(完成比例, 說明)；工作被取消時在下一次回報拋出 JobCancelled
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self._last = 0.0
+
+    def __call__(self, fraction, message=''):
+        progress, cancelled = _shared
+        if cancelled.get(self.job_id):
+            raise JobCancelled(f"工作 {self.job_id} 已取消")
+        now = time.monotonic()
+        if fraction >= 1 or now - self._last >= PROGRESS_INTERVAL:
+            progress[self.job_id] = (float(fraction), str(message))
+            self._last = now
+
+
+# pid 是否仍是以 command 啟動的程序（pid 可能已被其他程序重複使用）；沒有 /proc 的平台只檢查程序是否存在
+def _is_running(pid, command):
+    if not os.path.isdir('/proc'):
+        try:
+            os.kill(pid, 0)
+        except OSError:
+            return False
+        return True
+    try:
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            cmdline = f.read().decode('utf-8', errors='replace').split('\0')[:-1]
+    except OSError:
+        return False
+    return [os.path.basename(arg) for arg in cmdline[1:]] == [os.path.basename(arg) for arg in command[1:]]
+
+
+# 在工作程序中執行；函數有 progress 參數時才傳入進度回報
+def _run(job_id, func, args, kwargs):
+    progress, _ = _shared
+    progress[job_id] = (0.0, '')
+    if 'progress' in inspect.signature(func).parameters:
+        kwargs = {**kwargs, 'progress': Progress(job_id)}
+    return func(*args, **kwargs)
+
+
+class JobManager:
+    # 以程序池執行耗時的工作（擬合、匯出、掃描），Dash 回調與 API 只送出工作並輪詢狀態
+    # 相同函數與參數的工作共用同一個 ID：執行中或保留期間內重複送出時直接沿用
+    # 完成的結果也寫入共用的結果快取，其他 worker 或重新啟動後仍可取回
+    def __init__(self, workers=JOB_WORKERS, retention=JOB_RETENTION, max_retained=JOB_MAX_RETAINED):
+        self.workers = workers
+        self.retention = retention
+        self.max_retained = max_retained
+        self._executor = None
+        self._manager = None
+        self._progress = None
+        self._cancelled = None
+        self._jobs = {}
+        self._processes = {}
+        self._lock = threading.Lock()
+
+    # 程序池在第一次使用時才建立；工作程序異常結束（例如記憶體不足）後重新建立
+    def _get_executor(self):
+        if self._executor is None or getattr(self._executor, '_broken', False):
+            context = pool_context()
+            if self._manager is None:
+                self._manager = (context or multiprocessing).Manager()
+                self._progress = self._manager.dict()
+                self._cancelled = self._manager.dict()
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                                 initializer=_init_worker, initargs=(self._progress, self._cancelled))
+        return self._executor
+
+    # 移除超過保留時間或數量的已結束工作
+    def _prune(self):
+        now = time.time()
+        finished = sorted((job['finished'], job_id) for job_id, job in self._jobs.items() if job['finished'])
+        for index, (finished_at, job_id) in enumerate(finished):
+            if now - finished_at > self.retention or len(finished) - index > self.max_retained:
+                del self._jobs[job_id]
+
+    def _record(self, job_id, name, state='queued', future=None, result=None):
+        job = {'id': job_id, 'name': name, 'state': state, 'future': future, 'result': result,
+               'error': None, 'submitted': time.time(), 'finished': time.time() if state == 'done' else None}
+        self._jobs[job_id] = job
+        return job
+
+    # 送出工作並回傳工作 ID；func 必須是模組層級的函數（由工作程序以名稱載入）
+    def submit(self, func, *args, name=None, **kwargs):
+        name = name or f'{func.__module__}.{func.__qualname__}'
+        job_id = content_hash(name, args, kwargs)[:32]
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(job_id)
+            if job is not None and job['state'] not in ('failed', 'cancelled'):
+                return job_id
+            retained = result_cache.get(result_cache.key('job', job_id))
+            if retained is not None:
+                self._record(job_id, name, 'done', result=retained)
+                return job_id
+            executor = self._get_executor()
+            self._cancelled.pop(job_id, None)
+            future = executor.submit(_run, job_id, func, args, kwargs)
+            self._record(job_id, name, future=future)
+        future.add_done_callback(lambda f: self._on_done(job_id, f))
+        return job_id
+
+    def _on_done(self, job_id, future):
+        try:
+            result = future.result()
+        except (CancelledError, JobCancelled):
+            state, result, error = 'cancelled', None, None
+        except Exception as e:
+            logging.error(f"背景工作 {job_id} 失敗: {e}")
+            state, result, error = 'failed', None, str(e)
+        else:
+            state, error = 'done', None
+            result_cache.set(result_cache.key('job', job_id), result)
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job['future'] is future:
+                job.update(state=state, result=result, error=error, finished=time.time(), future=None)
+            if self._cancelled is not None:
+                self._cancelled.pop(job_id, None)
+                self._progress.pop(job_id, None)
+
+    # 工作狀態：{'id', 'name', 'state', 'progress', 'message', 'error', 'submitted', 'finished'}，查無此工作時回傳 None
+    def status(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                retained = result_cache.get(result_cache.key('job', job_id))
+                if retained is None:
+                    return None
+                job = self._record(job_id, None, 'done', result=retained)
+            state = job['state']
+            future = job['future']
+            if state == 'queued' and future is not None and future.running():
+                state = 'running'
+            fraction, message = self._progress.get(job_id, (0.0, '')) if future is not None else \
+                (1.0 if state == 'done' else 0.0, '')
+            return {
+                'id': job_id,
+                'name': job['name'],
+                'state': state,
+                'progress': fraction,
+                'message': message,
+                'error': job['error'],
+                'submitted': job['submitted'],
+                'finished': job['finished'],
+            }
+
+    # 已完成工作的結果；尚未完成時回傳 None，失敗時拋出 ValueError
+    def result(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return result_cache.get(result_cache.key('job', job_id))
+        if job['state'] == 'failed':
+            raise ValueError(job['error'])
+        return job['result'] if job['state'] == 'done' else None
+
+    # 取消工作：尚未開始的直接取消，執行中的在下一次進度回報時停止；回傳是否有可取消的工作
+    def cancel(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['future'] is None:
+                return False
+            if job['future'].cancel():
+                return True
+            self._cancelled[job_id] = True
+            return True
+
+    # 確保外部程序只執行一份，回傳 (pid, 是否新啟動)
+    # 檢查與啟動都在 pid 檔的 flock 之內，多個 worker 同時呼叫時只有一個會啟動程序
+    def ensure_process(self, name, command):
+        pid_path = os.path.join(tempfile.gettempdir(), f'datasheetdb-{name}.pid')
+        with self._lock, open(pid_path, 'a+') as pid_file:
+            if fcntl is not None:
+                fcntl.flock(pid_file, fcntl.LOCK_EX)
+            process = self._processes.get(name)
+            if process is not None and process.poll() is None:
+                return process.pid, False
+            pid_file.seek(0)
+            try:
+                pid = int(pid_file.read().strip())
+            except ValueError:
+                pid = None
+            if pid is not None and _is_running(pid, command):
+                return pid, False
+            process = subprocess.Popen(command)
+            self._processes[name] = process
+            pid_file.seek(0)
+            pid_file.truncate()
+            pid_file.write(str(process.pid))
+            pid_file.flush()
+            return process.pid, True
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+
+# 全域共用的工作管理器
+job_manager = JobManager()
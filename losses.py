@@ -0,0 +1,88 @@
+from functools import lru_cache
+
+import numpy as np
+
+from rgmodel import get_switching_model
+from tjmodel import get_tj_model
+
+# 規格書的量測條件：Eon/Eoff、Erec 量測電壓 (V)
+TEST_VOLTAGE = 400.0
+
+# 開關能量對電壓的指數（E ∝ (V/Vref)^Kv），常用的應用手冊數值
+KV_IGBT = 1.35
+KV_DIODE = 0.6
+
+# 基本波半週期（電流為正）的 Gauss–Legendre 積分點數
+PHASE_POINTS = 32
+
+
+class LossModel:
+    # 半橋 SPWM 逆變器單一開關位置（一個 IGBT 與一個反並聯二極體）的損耗
+    # 導通壓降使用溫度連續模型 VCE(IC, Tj)、VF(IF, Tj)；開關能量使用 E(IC, RG, Tj) 模型並依電壓換算
+    def __init__(self, test_voltage=TEST_VOLTAGE, phase_points=PHASE_POINTS):
+        self.test_voltage = test_voltage
+        self.vce_model = get_tj_model('ic_vce')
+        self.vf_model = get_tj_model('if_vf')
+        self.switching = get_switching_model()
+        # 相位 θ ∈ (0, π)，電流 i = Î·sin θ 為正；半週期平均 = Σ w·f
+        nodes, weights = np.polynomial.legendre.leggauss(phase_points)
+        self.theta = (nodes + 1) * np.pi / 2
+        self.weights = weights / 2
+
+    # 向量化計算：所有參數依 NumPy 規則廣播，回傳各損耗分量 (W)，形狀為廣播後的形狀
+    # vdc (V)、irms (A)、fsw (Hz)、m 調變指數、cos_phi 功率因數、rg (Ω)、tj (℃)
+    def __call__(self, vdc, irms, fsw, m, cos_phi, rg, tj, tj_diode=None):
+        tj_diode = tj if tj_diode is None else tj_diode
+        vdc, irms, fsw, m, cos_phi, rg, tj, tj_diode = np.broadcast_arrays(
+            *[np.asarray(v, dtype=float) for v in (vdc, irms, fsw, m, cos_phi, rg, tj, tj_diode)])
+        if np.any(m < 0) or np.any(m > 1.0 + 1e-9):
+            raise ValueError("調變指數 m 必須介於 0 與 1 之間（不含過調變）")
+        if np.any(np.abs(cos_phi) > 1):
+            raise ValueError("cosφ 必須介於 -1 與 1 之間")
+
+        # 相位軸放在最後一維：(..., 相位點數)
+        sin_theta = np.sin(self.theta)
+        cos_theta = np.cos(self.theta)
+        current = (np.sqrt(2) * irms)[..., None] * sin_theta
+        sin_phi = np.sqrt(1 - cos_phi ** 2)
+        # 上臂責任比 d(θ) = (1 + m·sin(θ + φ)) / 2，二極體導通 1 − d
+        duty = 0.5 * (1 + m[..., None] * (sin_theta * cos_phi[..., None] + cos_theta * sin_phi[..., None]))
+        tj_t = tj[..., None]
+        tj_d = tj_diode[..., None]
+
+        # 導通損耗：半週期平均再除以 2（另一半週期電流流經另一組開關）
+        conduction_igbt = (duty * self.vce_model(current, tj_t) * current) @ self.weights / 2
+        conduction_diode = ((1 - duty) * self.vf_model(current, tj_d) * current) @ self.weights / 2
+
+        # 開關損耗：每個開關週期一次導通與一次關斷，電壓依 Kv 指數換算
+        voltage_igbt = (vdc / self.test_voltage) ** KV_IGBT
+        voltage_diode = (vdc / self.test_voltage) ** KV_DIODE
+        rg_t = rg[..., None]
+        eon = self.switching.eon(current, rg_t, tj_t)
+        eoff = self.switching.eoff(current, rg_t, tj_t)
+        erec = self.switching.erec(current, rg_t, tj_d)
+
+        # 能量單位 mJ → J
+        switching_igbt = fsw * voltage_igbt * ((eon + eoff) @ self.weights) / 2 * 1e-3
+        switching_diode = fsw * voltage_diode * (erec @ self.weights) / 2 * 1e-3
+
+        return {
+            'conduction_igbt': conduction_igbt,
+            'switching_igbt': switching_igbt,
+            'conduction_diode': conduction_diode,
+            'switching_diode': switching_diode,
+            'igbt': conduction_igbt + switching_igbt,
+            'diode': conduction_diode + switching_diode,
+            'total': conduction_igbt + switching_igbt + conduction_diode + switching_diode,
+        }
+
+
+# 損耗模型（快取，數據與擬合只在第一次使用時載入）
+@lru_cache(maxsize=1)
+def get_loss_model():
+    return LossModel()
+
+
+# 例：calculate_losses(vdc=400, irms=np.arange(50, 601, 50), fsw=10e3, m=0.9, cos_phi=0.85, rg=2.5, tj=150)
+def calculate_losses(vdc, irms, fsw, m, cos_phi, rg, tj, tj_diode=None):
+    return get_loss_model()(vdc, irms, fsw, m, cos_phi, rg, tj, tj_diode)
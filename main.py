@@ -1,4 +1,4 @@
-import subprocess
+import sys
 import dash
 import dash_ag_grid as dag
 import dash_bootstrap_components as dbc
@@ -7,14 +7,39 @@ import plotly.graph_objects as go
 from dash import Dash, html, dcc, Input, Output, callback, State, ALL
 import ssl
 import pandas as pd
+import numpy as np
 import re
 import os
 import base64
 import io
+import functools
 import json
+import time
 from dash.exceptions import PreventUpdate
 import logging
 import requests
+from downsample import current_view_range, decimate_figure, relayout_ranges, view_range
+from export_service import EXPORT_FORMATS, render_pool
+from jobs import job_manager
+from admission import admission, on_busy
+from resultcache import content_hash, result_cache
+from curvedata import catalog_files, catalog_path, catalog_values
+from curvefit import fit_dataframe, polyval
+from oplookup import LOOKUP_METHODS, get_lookup
+from tjmodel import get_tj_model
+from losses import calculate_losses
+from sweep import SWEEP_AXES, catalog_rth, list_sweeps, open_sweep, product_thermal, run_sweep
+from gatecharge import GateCharge, gate_charge_curve, get_gate_charge
+from rgmodel import RGScaling, switching_energy
+from outputchar import get_output_characteristic
+from ntc import NTCThermistor, beta_temperature, get_ntc
+from capacitance import CapacitanceCurves, get_capacitance
+from packageres import derived_catalog_rows, fit_chip_module, package_resistance_table
+from paralleling import simulate_paralleling, vcesat_limits
+from montecarlo import run_study
+from foster import fit_foster, foster_zth, zth_from_dataframe
+from flask import jsonify, request
+from urllib.error import HTTPError, URLError
 
 # 設置日誌記錄
 logging.basicConfig(level=logging.INFO)
@@ -58,6 +83,14 @@ else:
     print("錯誤：找不到 'TimeStamp' 欄位。")
     exit(1)
 
+# 加入由 Chip/Module 曲線擬合的衍生參數（封裝電阻 RCC'+EE'）
+package_rows = derived_catalog_rows(df, package_resistance_table())
+if not package_rows.empty:
+    df = pd.concat([df, package_rows], ignore_index=True)
+
+# 主要資料的內容雜湊，作為表格查詢快取鍵的一部分（資料更新後舊的查詢結果自動失效）
+catalog_hash = content_hash(df)
+
 # 獲取唯一的 Power 名稱，排除 NaN 並確保為字串，並進行排序
 unique_powers = ['All'] + sorted(
     df["Power"].dropna().astype(str).unique(),
@@ -165,6 +198,15 @@ navbar = html.Div(
                     style={'margin': '0 10px', 'cursor': 'pointer'},
                     nav=True,
                 ),
+                dcc.Link(
+                    "Losses", href='/losses',
+                    style={
+                        'margin': '0 10px',
+                        'textDecoration': 'none',
+                        'color': '#495057',
+                        'fontSize': '16px'
+                    }
+                ),
                 dcc.Link(
                     "Contact", href='/contact',
                     style={
@@ -600,7 +642,8 @@ benchmark_columns = [
     {"name": "Competitor C", "id": "Competitor C"}
 ]
 
-# 定義解析上傳文件的函數
+# 定義解析上傳文件的函數（依上傳內容快取，重新啟動後仍可沿用）
+@result_cache.memoize()
 def parse_contents(contents, filename):
     if contents is None:
         return None
@@ -615,6 +658,41 @@ def parse_contents(contents, filename):
         print(f"Error parsing {filename}: {e}")
         return None
 
+# Diagrams1 圖表的快取：鍵包含上傳內容與目前的可視範圍，以 plotly JSON（dict）儲存，命中時不需重建 go.Figure
+cache_figure = result_cache.memoize(context=current_view_range, transform=go.Figure.to_plotly_json)
+
+# 准入控制忙碌時的回應（見 admission.py 的成本等級）
+BUSY_MESSAGE = "伺服器忙碌中，請稍後再試"
+
+
+def prevent_update():
+    raise PreventUpdate
+
+
+# 忙碌時的圖表：上傳時顯示提示；縮放重新取樣時保留目前的圖表
+def busy_figure():
+    if current_view_range() is not None:
+        raise PreventUpdate
+    fig = go.Figure()
+    fig.add_annotation(text=BUSY_MESSAGE, showarrow=False, xref='paper', yref='paper', x=0.5, y=0.5)
+    return fig
+
+
+def busy_response():
+    return jsonify({'error': BUSY_MESSAGE}), 503, {'Retry-After': '1'}
+
+
+# Diagrams1 圖表的建構函數：未上傳時直接回傳空圖，快取命中不佔名額，只有未快取的計算需要 fit 名額
+def figure_builder(func):
+    cached = on_busy(busy_figure)(cache_figure(admission.limit('fit')(func)))
+
+    @functools.wraps(func)
+    def wrapper(contents, filename):
+        if contents is None:
+            return go.Figure()
+        return cached(contents, filename)
+    return wrapper
+
 # 定義回調函數：當公司下拉選單改變時更新公司 PDF 和下載按鈕
 def callbacks_diagrams3(app):
     # 回調函數：當公司下拉選單改變時更新公司 PDF 和下載按鈕
@@ -859,6 +937,27 @@ def create_flet_like_buttons(graph_id):
 diagrams1_layout = html.Div([
     dbc.Row([
         dbc.Col([
+            # 圖片輸出格式（Save Picture 使用）
+            dbc.Row([
+                dbc.Col(dbc.Label("Picture format", html_for="export-format"), width="auto"),
+                dbc.Col(dbc.RadioItems(
+                    id='export-format',
+                    options=[{'label': fmt.upper(), 'value': fmt} for fmt in EXPORT_FORMATS],
+                    value='png',
+                    inline=True,
+                ), width="auto"),
+                # 一次匯出所有已上傳的圖表
+                dbc.Col(dbc.RadioItems(
+                    id='export-all-format',
+                    options=[{'label': 'ZIP', 'value': 'zip'}, {'label': 'Multi-page PDF', 'value': 'pdf'}],
+                    value='zip',
+                    inline=True,
+                ), width="auto"),
+                dbc.Col(dbc.Button("Export All", id='export-all-btn', color="primary", size="sm", n_clicks=0),
+                        width="auto"),
+                # 批次匯出的背景工作進度
+                dbc.Col(html.Small(id='batch-status', className="text-muted"), width="auto"),
+            ], justify="end", className="mb-2"),
             dbc.Row([
                 dbc.Col(create_upload_card("IGBT, Output characteristics", "VGE = 15V, IC = f(VCE)", "upload-tj25",
                                            "graph-tj25"), md=6),
@@ -896,9 +995,13 @@ diagrams1_layout = html.Div([
                 dbc.Col(create_upload_card("Reverse bias safe operating area (RBSOA)",
                                            "VGE = -8V / + 15V, RG,off = 5.0 Ω, Tj = 175°C", "upload-extra4",
                                            "graph-extra4"), md=6),
-                dbc.Col(create_upload_card("IGBT Total Gate Charge characteristic",
-                                           "VCE = 400 V, IC = 300A, Tj = 25°C, VGE = f(QG)", "upload-extra5",
-                                           "graph-extra5"), md=6),
+                dbc.Col([
+                    create_upload_card("IGBT Total Gate Charge characteristic",
+                                       "VCE = 400 V, IC = 300A, Tj = 25°C, VGE = f(QG)", "upload-extra5",
+                                       "graph-extra5"),
+                    # Gate charge 分析結果（QG、Miller 平台、驅動功率與峰值電流）
+                    html.Div(id='gatecharge-summary'),
+                ], md=6),
             ], justify="center", className="mb-4"),
             dbc.Row([
                 dbc.Col(create_upload_card("IGBT Transient thermal impedance",
@@ -926,7 +1029,13 @@ diagrams1_layout = html.Div([
     ),
     # 新增下載組件和儲存組件
     dcc.Download(id='download-image'),
+    dcc.Download(id='download-batch'),
     dcc.Store(id='download-store'),
+    # 輪詢背景渲染結果
+    dcc.Interval(id='download-poll', interval=500, disabled=True),
+    # 批次匯出的背景工作與輪詢
+    dcc.Store(id='batch-job'),
+    dcc.Interval(id='batch-poll', interval=1000, disabled=True),
 ])
 
 # 定義 Contact 頁面的佈局
@@ -938,6 +1047,176 @@ contact_layout = dbc.Container(
     fluid=True,
 )
 
+# 損耗計算頁面的輸入欄位：(id, 標籤, 預設值, 間距)
+loss_inputs = [
+    ('loss-vdc', 'VDC (V)', 400, 10),
+    ('loss-irms', 'Irms (A)', 300, 10),
+    ('loss-fsw', 'fsw (kHz)', 10, 1),
+    ('loss-m', 'm', 0.9, 0.05),
+    ('loss-cosphi', 'cosφ', 0.85, 0.05),
+    ('loss-rg', 'RG (Ω)', 2.5, 0.5),
+    ('loss-tj', 'Tj (℃)', 150, 5),
+]
+
+# 定義 Losses 頁面的佈局：SPWM 逆變器 IGBT / 二極體損耗
+losses_layout = dbc.Container([
+    html.H2("Inverter Losses (SPWM)", className="mt-4"),
+    html.P("單一開關位置（IGBT + 反並聯二極體）的導通與開關損耗", className="text-muted"),
+    dbc.Row([
+        dbc.Col([
+            dbc.Label(label, html_for=input_id),
+            dbc.Input(id=input_id, type='number', value=value, step=step, debounce=True),
+        ], md=True)
+        for input_id, label, value, step in loss_inputs
+    ], className="mb-4"),
+    dbc.Row([
+        dbc.Col(dcc.Graph(id='losses-graph'), md=8),
+        dbc.Col(html.Div(id='losses-table'), md=4),
+    ]),
+    html.Hr(),
+    # 設計空間掃描結果（由 sweep.py 預先計算，這裡只做切片）
+    html.H3("Design Sweep"),
+    dbc.Row([
+        dbc.Col([dbc.Label("Sweep"), dcc.Dropdown(id='sweep-name', placeholder="Select sweep")], md=3),
+        dbc.Col([dbc.Label("Product"), dcc.Dropdown(id='sweep-product')], md=3),
+        dbc.Col([dbc.Label("Quantity"), dcc.Dropdown(id='sweep-quantity')], md=2),
+        dbc.Col([dbc.Label("X axis"), dcc.Dropdown(id='sweep-x', options=SWEEP_AXES, value='irms', clearable=False)], md=2),
+        dbc.Col([dbc.Label("Y axis"), dcc.Dropdown(id='sweep-y', options=SWEEP_AXES, value='fsw', clearable=False)], md=2),
+    ], className="mb-2"),
+    dbc.Row([
+        dbc.Col([dbc.Label(axis), dcc.Dropdown(id=f'sweep-fixed-{axis}', clearable=False)], md=True)
+        for axis in SWEEP_AXES
+    ], className="mb-2"),
+    dbc.Row([
+        dbc.Col(dcc.Graph(id='sweep-heatmap'), md=7),
+        dbc.Col(dcc.Graph(id='sweep-compare'), md=5),
+    ]),
+], fluid=True)
+
+# 定義回調函數：進入 Losses 頁面時更新可用的掃描清單
+@app.callback(
+    Output('sweep-name', 'options'),
+    Input('url', 'pathname')
+)
+def update_sweep_list(pathname):
+    if pathname != '/losses':
+        raise PreventUpdate
+    return list_sweeps()
+
+# 定義回調函數：選擇掃描後更新產品、輸出量與各軸的固定值選項
+@app.callback(
+    [Output('sweep-product', 'options'), Output('sweep-product', 'value'),
+     Output('sweep-quantity', 'options'), Output('sweep-quantity', 'value')]
+    + [Output(f'sweep-fixed-{axis}', prop) for axis in SWEEP_AXES for prop in ('options', 'value')],
+    Input('sweep-name', 'value')
+)
+def update_sweep_options(name):
+    if not name:
+        raise PreventUpdate
+    cube = open_sweep(name)
+    outputs = [cube.products, cube.products[0], cube.quantities, cube.quantities[0]]
+    for axis in SWEEP_AXES:
+        values = cube.axes[axis].tolist()
+        outputs += [[{'label': f'{v:g}', 'value': v} for v in values], values[len(values) // 2]]
+    return outputs
+
+# 定義回調函數：從記憶體映射的結果立方體取出 2-D 切片並畫成熱圖，
+# 並在 Y 軸固定值（該軸的下拉選單）處比較所有產品
+@app.callback(
+    [Output('sweep-heatmap', 'figure'),
+     Output('sweep-compare', 'figure')],
+    [Input('sweep-name', 'value'), Input('sweep-product', 'value'), Input('sweep-quantity', 'value'),
+     Input('sweep-x', 'value'), Input('sweep-y', 'value')]
+    + [Input(f'sweep-fixed-{axis}', 'value') for axis in SWEEP_AXES]
+)
+@admission.limit('query', busy=prevent_update)
+def update_sweep_heatmap(name, product, quantity, x_axis, y_axis, *fixed_values):
+    if not name or not product or not quantity:
+        return go.Figure(), go.Figure()
+    try:
+        cube = open_sweep(name)
+        fixed = {axis: value for axis, value in zip(SWEEP_AXES, fixed_values) if value is not None}
+        values = cube.slice(product, quantity, x_axis, y_axis, fixed)
+    except ValueError as e:
+        print(f"❌ 掃描切片失敗: {e}")
+        return go.Figure(), go.Figure()
+
+    fig = go.Figure(go.Heatmap(
+        x=cube.axes[x_axis], y=cube.axes[y_axis], z=values,
+        colorscale='Viridis', colorbar=dict(title=quantity)
+    ))
+    fixed_text = ", ".join(f"{axis} = {cube.axes[axis][cube.index(axis, fixed.get(axis, cube.axes[axis][0]))]:g}"
+                           for axis in SWEEP_AXES if axis not in (x_axis, y_axis))
+    fig.update_layout(
+        title=f"{product}: {quantity} ({fixed_text})",
+        xaxis_title=x_axis,
+        yaxis_title=y_axis,
+        margin=dict(l=40, r=20, t=40, b=40),
+    )
+
+    y_index = cube.index(y_axis, fixed.get(y_axis, cube.axes[y_axis][0]))
+    compare = go.Figure()
+    for other in cube.products:
+        compare.add_trace(go.Scatter(
+            x=cube.axes[x_axis], y=cube.slice(other, quantity, x_axis, y_axis, fixed)[y_index],
+            mode='lines+markers', name=other
+        ))
+    compare.update_layout(
+        title=f"{quantity} @ {y_axis} = {cube.axes[y_axis][y_index]:g}",
+        xaxis_title=x_axis,
+        yaxis_title=quantity,
+        margin=dict(l=40, r=20, t=40, b=40),
+        plot_bgcolor="white",
+    )
+    compare.update_xaxes(showgrid=True, gridcolor="lightgray")
+    compare.update_yaxes(showgrid=True, gridcolor="lightgray")
+    return fig, compare
+
+# 定義回調函數：計算損耗並畫出對 Irms 的掃描（一次向量化呼叫完成整條曲線）
+@app.callback(
+    [Output('losses-graph', 'figure'),
+     Output('losses-table', 'children')],
+    [Input(input_id, 'value') for input_id, _, _, _ in loss_inputs]
+)
+@admission.limit('fit', busy=prevent_update)
+def update_losses(vdc, irms, fsw, m, cos_phi, rg, tj):
+    if None in (vdc, irms, fsw, m, cos_phi, rg, tj):
+        return dash.no_update, dash.no_update
+    try:
+        sweep = np.linspace(0, 1.5 * irms, 61)[1:]
+        currents = np.append(sweep, irms)
+        result = calculate_losses(vdc, currents, fsw * 1e3, m, cos_phi, rg, tj)
+    except ValueError as e:
+        return go.Figure(), dbc.Alert(str(e), color="danger")
+
+    fig = go.Figure()
+    components = [
+        ('conduction_igbt', 'IGBT conduction'),
+        ('switching_igbt', 'IGBT switching'),
+        ('conduction_diode', 'Diode conduction'),
+        ('switching_diode', 'Diode recovery'),
+    ]
+    for key, name in components:
+        fig.add_trace(go.Scatter(x=sweep, y=result[key][:-1], mode='lines', stackgroup='losses', name=name))
+    fig.add_vline(x=irms, line=dict(color='black', dash='dot'))
+    fig.update_layout(
+        title="Losses vs Irms",
+        xaxis_title="I<sub>rms</sub> (A)",
+        yaxis_title="P (W)",
+        margin=dict(l=40, r=20, t=40, b=40),
+        legend=dict(x=0.01, y=0.99, bgcolor="white", bordercolor="black", borderwidth=1),
+        plot_bgcolor="white",
+    )
+    fig.update_xaxes(showgrid=True, gridcolor="lightgray")
+    fig.update_yaxes(showgrid=True, gridcolor="lightgray")
+
+    rows = components + [('igbt', 'IGBT total'), ('diode', 'Diode total'), ('total', 'Total')]
+    table = dbc.Table.from_dataframe(
+        pd.DataFrame({'Component': [name for _, name in rows],
+                      'P (W)': [f"{result[key][-1]:.1f}" for key, _ in rows]}),
+        striped=True, bordered=True, hover=True, size="sm")
+    return fig, table
+
 # 定義 Diagrams3 頁面的佈局（整合 diagrams3 的內容）
 # 定義回調函數：Diagrams3 的功能
 callbacks_diagrams3(app)
@@ -964,6 +1243,8 @@ def display_page(pathname):
         return diagrams2_layout
     elif pathname == '/diagrams3':
         return diagrams3_layout  # 顯示 Diagrams3 頁面
+    elif pathname == '/losses':
+        return losses_layout
     elif pathname == '/contact':
         return contact_layout
     else:
@@ -978,6 +1259,9 @@ def display_page(pathname):
     Input("year-radio", "value"),
     Input("power-dropdown", "value"),
 )
+@on_busy(lambda: (dash.no_update, dash.no_update, BUSY_MESSAGE))
+@result_cache.memoize(context=lambda: catalog_hash)
+@admission.limit('query')
 def update_grid(selected_module, selected_year, selected_power):
     print(f"選擇的模組: {selected_module}, 年份: {selected_year}, Power: {selected_power}")
 
@@ -1146,6 +1430,7 @@ def toggle_collapse(n_datasets, n_visualization, n_diagrams, n_benchmarking,
     Input('upload-tj25', 'contents'),
     State('upload-tj25', 'filename')
 )
+@figure_builder
 def update_graph_a(contents, filename):
     if contents is None:
         return go.Figure()
@@ -1214,7 +1499,7 @@ def update_graph_a(contents, filename):
         ),
     )
 
-    return fig
+    return decimate_figure(fig)
 
 
 
@@ -1224,6 +1509,7 @@ def update_graph_a(contents, filename):
     Input('upload-tj150', 'contents'),
     State('upload-tj150', 'filename')
 )
+@figure_builder
 def update_graph_b(contents, filename):
     if contents is None:
         return go.Figure()
@@ -1295,7 +1581,7 @@ def update_graph_b(contents, filename):
         ),
     )
 
-    return fig
+    return decimate_figure(fig)
 
 
 
@@ -1305,6 +1591,7 @@ def update_graph_b(contents, filename):
     Input('upload-tj175', 'contents'),
     State('upload-tj175', 'filename')
 )
+@figure_builder
 def update_graph_c(contents, filename):
     if contents is None:
         return go.Figure()
@@ -1376,7 +1663,7 @@ def update_graph_c(contents, filename):
         ),
     )
 
-    return fig
+    return decimate_figure(fig)
 
 
 
@@ -1386,6 +1673,7 @@ def update_graph_c(contents, filename):
     Input('upload-tjD', 'contents'),
     State('upload-tjD', 'filename')
 )
+@figure_builder
 def update_graph_d(contents, filename):
     if contents is None:
         return go.Figure()
@@ -1415,6 +1703,25 @@ def update_graph_d(contents, filename):
                 line=dict(color='black', dash=params['dash'])  # 設定線型
             ))
 
+    # 三次多項式擬合（所有溫度一次求解），預設隱藏，可由圖例開啟
+    fitted = [(condition, params) for condition, params in conditions.items()
+              if params['if_col'] in df.columns and params['vf_col'] in df.columns]
+    if fitted:
+        try:
+            fits = fit_dataframe(df, [(params['vf_col'], params['if_col']) for _, params in fitted], degree=3)
+            for i, (condition, params) in enumerate(fitted):
+                vf = df[params['vf_col']].dropna()
+                x_fit = np.linspace(vf.min(), vf.max(), 200)
+                fig.add_trace(go.Scatter(
+                    x=x_fit, y=polyval(fits['coefficients'][i], x_fit),
+                    mode='lines',
+                    name=f"Fit {condition} (R²={fits['r_squared'][i]:.4f})",
+                    line=dict(color='gray', width=1, dash=params['dash']),
+                    visible='legendonly'
+                ))
+        except ValueError as e:
+            print(f"❌ 擬合失敗: {e}")
+
     # 設定圖例位置到左上角
     fig.update_layout(
         title="Static",
@@ -1451,7 +1758,7 @@ def update_graph_d(contents, filename):
         ),
     )
 
-    return fig
+    return decimate_figure(fig)
 
 
 
@@ -1461,6 +1768,7 @@ def update_graph_d(contents, filename):
     Input('upload-tjE', 'contents'),
     State('upload-tjE', 'filename')
 )
+@figure_builder
 def update_graph_e(contents, filename):
     if contents is None:
         return go.Figure()
@@ -1529,15 +1837,33 @@ def update_graph_e(contents, filename):
         shapes=zero_line_shapes  # 加入 0 軸線
     )
 
-    return fig
+    return decimate_figure(fig)
 
 
+# 在圖表中加入 E(RG) 的擬合曲線（update_graph_f、update_graph_j 共用）
+def add_rg_fit_trace(fig, df, rg_col, e_col, name, dash):
+    try:
+        scaling = RGScaling({0: (pd.to_numeric(df[rg_col], errors='coerce').to_numpy(),
+                                 pd.to_numeric(df[e_col], errors='coerce').to_numpy())})
+    except ValueError as e:
+        print(f"❌ 擬合失敗 {name}: {e}")
+        return
+    rg_fit = np.geomspace(*scaling.rg_range, 200)
+    fig.add_trace(go.Scatter(
+        x=rg_fit, y=scaling(rg_fit, 0),
+        mode='lines',
+        name=f"Fit {name} (R²={scaling.r_squared[0]:.4f})",
+        line=dict(color='gray', width=1, dash=dash),
+        visible='legendonly'
+    ))
+
 # F 卡片的回調函數
 @app.callback(
     Output('graph-tjF', 'figure'),
     Input('upload-tjF', 'contents'),
     State('upload-tjF', 'filename')
 )
+@figure_builder
 def update_graph_f(contents, filename):
     if contents is None:
         return go.Figure()
@@ -1571,6 +1897,11 @@ def update_graph_f(contents, filename):
                 line=dict(color='black', dash=params['dash'])
             ))
 
+    # 擬合的 RG 縮放函數（ln E 對 ln RG 的三次多項式，預設隱藏，可從圖例開啟）
+    for name, params in line_styles.items():
+        if params['rg_col'] in df.columns and params['e_col'] in df.columns:
+            add_rg_fit_trace(fig, df, params['rg_col'], params['e_col'], name, params['dash'])
+
     # 加入 X 軸與 Y 軸的 0 軸線
     zero_line_shapes = [
         dict(type='line', x0=0, x1=0, y0=0, y1=1, xref='x', yref='paper', line=dict(color='black', width=1)),
@@ -1606,7 +1937,7 @@ def update_graph_f(contents, filename):
         shapes=zero_line_shapes  # 加入 0 軸線
     )
 
-    return fig
+    return decimate_figure(fig)
 
 # 回調函數：G 卡片
 @app.callback(
@@ -1614,6 +1945,7 @@ def update_graph_f(contents, filename):
     Input('upload-tjG', 'contents'),
     State('upload-tjG', 'filename')
 )
+@figure_builder
 def update_graph_g(contents, filename):
     if contents is None:
         return go.Figure()
@@ -1643,6 +1975,26 @@ def update_graph_g(contents, filename):
         line=dict(color='black', width=2, dash='dashdot')  # 點畫線
     ))
 
+    # 由 Coes 積分得到的等效輸出電容 Co(tr)、Co(er)（預設隱藏，可從圖例開啟）
+    try:
+        capacitance = CapacitanceCurves.from_dataframe(df)
+        v_max = capacitance.v_max
+        v_fit = np.linspace(0, v_max, 200)[1:]
+        derived = [
+            (f"Co(tr) (Qoss={capacitance.qoss(v_max):.0f} nC @ {v_max:.0f} V)", capacitance.co_tr(v_fit), 'dot'),
+            (f"Co(er) (Eoss={capacitance.eoss(v_max):.1f} μJ @ {v_max:.0f} V)", capacitance.co_er(v_fit), 'longdash'),
+        ]
+        for name, values, dash in derived:
+            fig.add_trace(go.Scatter(
+                x=v_fit, y=values,
+                mode='lines',
+                name=name,
+                line=dict(color='gray', width=1, dash=dash),
+                visible='legendonly'
+            ))
+    except ValueError as e:
+        print(f"❌ 電容積分失敗: {e}")
+
     # 設定圖表格式，確保與圖片一致
     fig.update_layout(
         title="Dynamic Capacitance Characteristics",
@@ -1670,7 +2022,7 @@ def update_graph_g(contents, filename):
         legend=dict(bordercolor="black", borderwidth=1),
     )
 
-    return fig
+    return decimate_figure(fig)
 
 
 # 回調函數：H 卡片
@@ -1679,6 +2031,7 @@ def update_graph_g(contents, filename):
     Input('upload-extra1', 'contents'),
     State('upload-extra1', 'filename')
 )
+@figure_builder
 def update_graph_h(contents, filename):
     if contents is None:
         return go.Figure()
@@ -1706,6 +2059,29 @@ def update_graph_h(contents, filename):
         line=dict(color='black', width=2)  # 黑色實線，寬度 2
     ))
 
+    # Beta 與 Steinhart–Hart 擬合（預設隱藏，可從圖例開啟），圖例顯示最大溫度誤差
+    try:
+        ntc = NTCThermistor.from_dataframe(df)
+        error = ntc.error()
+        t_fit = np.linspace(ntc.t.min(), ntc.t.max(), 200)
+        r_fit = ntc.resistance(t_fit)
+        fig.add_trace(go.Scatter(
+            x=beta_temperature(r_fit, ntc.beta['r_ref'], ntc.beta['beta']), y=r_fit,
+            mode='lines',
+            name=f"Fit β={ntc.beta['beta']:.0f} K (max {error['beta']['max']:.2f} K)",
+            line=dict(color='gray', width=1, dash='dot'),
+            visible='legendonly'
+        ))
+        fig.add_trace(go.Scatter(
+            x=t_fit, y=r_fit,
+            mode='lines',
+            name=f"Fit Steinhart–Hart (max {error['steinhart_hart']['max']:.2f} K)",
+            line=dict(color='gray', width=1, dash='dash'),
+            visible='legendonly'
+        ))
+    except ValueError as e:
+        print(f"❌ NTC 擬合失敗: {e}")
+
     # 設定圖表樣式和軸刻度
     fig.update_layout(
         title="NTC-Thermistor Temperature Characteristics",
@@ -1779,7 +2155,7 @@ def update_graph_h(contents, filename):
         ]
     )
 
-    return fig
+    return decimate_figure(fig)
 
 
 
@@ -1790,6 +2166,7 @@ def update_graph_h(contents, filename):
     Input('upload-extra2', 'contents'),
     State('upload-extra2', 'filename')
 )
+@figure_builder
 def update_graph_i(contents, filename):
     if contents is None:
         return go.Figure()
@@ -1857,7 +2234,7 @@ def update_graph_i(contents, filename):
         shapes=zero_line_shapes
     )
 
-    return fig
+    return decimate_figure(fig)
 
 
 # 回調函數：J 卡片
@@ -1866,6 +2243,7 @@ def update_graph_i(contents, filename):
     Input('upload-extra3', 'contents'),
     State('upload-extra3', 'filename')
 )
+@figure_builder
 def update_graph_j(contents, filename):
     if contents is None:
         return go.Figure()
@@ -1899,6 +2277,10 @@ def update_graph_j(contents, filename):
             line=dict(color='black', dash=params['dash'])
         ))
 
+    # 擬合的 RG 縮放函數（預設隱藏，可從圖例開啟）
+    for set_name, params in line_styles.items():
+        add_rg_fit_trace(fig, df, params['rg_col'], params['erec_col'], set_name, params['dash'])
+
     # 加入 X 軸與 Y 軸的 0 軸線 (黑色框線)
     zero_line_shapes = [
         dict(type='line', x0=0, x1=0, y0=0, y1=1, xref='x', yref='paper', line=dict(color='black', width=1)),
@@ -1933,7 +2315,7 @@ def update_graph_j(contents, filename):
         shapes=zero_line_shapes
     )
 
-    return fig
+    return decimate_figure(fig)
 
 
 
@@ -1943,6 +2325,7 @@ def update_graph_j(contents, filename):
     Input('upload-extra4', 'contents'),
     State('upload-extra4', 'filename')
 )
+@figure_builder
 def update_graph_k(contents, filename):
     if contents is None:
         return go.Figure()
@@ -1971,6 +2354,18 @@ def update_graph_k(contents, filename):
         line=dict(color='black', dash='dash')  # 虛線
     ))
 
+    # 封裝電阻擬合：VCE_Chip + R·IC + V0（預設隱藏，可從圖例開啟）
+    try:
+        result, ic_fit, vce_fit = fit_chip_module(df)
+        fig.add_trace(go.Scatter(
+            x=vce_fit, y=ic_fit,
+            mode='lines',
+            name=f"Fit Chip + R={result['r_package']:.3f} mΩ (R²={result['r_squared']:.4f})",
+            line=dict(color='gray', width=1, dash='dot'),
+            visible='legendonly'
+        ))
+    except ValueError as e:
+        print(f"❌ 封裝電阻擬合失敗: {e}")
 
     # 更新圖表佈局
     fig.update_layout(
@@ -2006,7 +2401,7 @@ def update_graph_k(contents, filename):
         )
     )
 
-    return fig
+    return decimate_figure(fig)
 
 
 # 回調函數：L 卡片
@@ -2015,6 +2410,7 @@ def update_graph_k(contents, filename):
     Input('upload-extra5', 'contents'),
     State('upload-extra5', 'filename')
 )
+@figure_builder
 def update_graph_l(contents, filename):
     if contents is None:
         return go.Figure()
@@ -2022,10 +2418,13 @@ def update_graph_l(contents, filename):
     # 解析上傳的數據
     df = parse_contents(contents, filename)
 
-    # 確保數據包含必要的欄位
-    required_columns = ['QG(μC)_25℃', 'VGE(V)_25℃']
-    if df is None or not all(col in df.columns for col in required_columns):
-        print("缺少必要的欄位:", required_columns)
+    # 確保數據包含必要的欄位（QG/VG 或 QG(μC)_25℃/VGE(V)_25℃）
+    if df is None:
+        return go.Figure()
+    try:
+        qg, vge = gate_charge_curve(df)
+    except ValueError as e:
+        print(e)
         return go.Figure()
 
     # 創建圖表
@@ -2033,13 +2432,31 @@ def update_graph_l(contents, filename):
 
     # 添加曲線
     fig.add_trace(go.Scatter(
-        x=df['Q<sub>G</sub>(μC)_25℃'],
-        y=df['V<sub>GE</sub>(V)_25℃'],
+        x=qg,
+        y=vge,
         mode='lines',
         name='Gate Charge(QG)',  # 設置曲線名稱
         line=dict(color='black', width=2)  # 黑色實線
     ))
 
+    # 標示 Miller 平台
+    try:
+        gate_charge = GateCharge(qg, vge)
+        plateau = gate_charge.miller_plateau()
+    except ValueError as e:
+        print(f"❌ Gate charge 分析失敗: {e}")
+        plateau = None
+    if plateau:
+        # 平台位置相對於 GateCharge 的零點，加回零點的原始電荷後與量測曲線對齊
+        q_offset = gate_charge.q_offset
+        fig.add_trace(go.Scatter(
+            x=[plateau['q_start'] + q_offset, plateau['q_end'] + q_offset],
+            y=[plateau['v_plateau'], plateau['v_plateau']],
+            mode='lines',
+            name=f"Miller plateau {plateau['v_plateau']:.1f} V",
+            line=dict(color='red', width=3, dash='dot')
+        ))
+
     # 更新圖表樣式
     fig.update_layout(
         title="",  # 移除標題
@@ -2076,9 +2493,61 @@ def update_graph_l(contents, filename):
         showlegend=True  # 確保顯示圖例
     )
 
-    return fig
+    return decimate_figure(fig)
 
+# Gate charge 摘要表的驅動頻率與外部閘極電阻網格
+gatecharge_fsw_grid = np.array([5e3, 10e3, 20e3, 40e3])
+gatecharge_rg_grid = np.array([1.0, 2.5, 5.0, 10.0])
 
+# 定義回調函數：Gate charge 分析摘要，顯示在圖表旁
+# 上傳的檔名可對應到產品時使用快取的產品分析（含目錄中的 RG,int），否則直接分析上傳的數據
+@app.callback(
+    Output('gatecharge-summary', 'children'),
+    Input('upload-extra5', 'contents'),
+    State('upload-extra5', 'filename')
+)
+@admission.limit('fit', busy=prevent_update)
+def update_gatecharge_summary(contents, filename):
+    if contents is None:
+        return None
+    df = parse_contents(contents, filename)
+    if df is None:
+        return None
+    try:
+        gate_charge = GateCharge.from_dataframe(df)
+        # 檔名中的產品型號對應的產品目錄（依資料夾解析，與工作目錄無關）提供 RG,int
+        product = re.match(r'^(.*?\d+V\d+A)', filename or '')
+        if product:
+            try:
+                rg_int = catalog_values(catalog_path(f'HPDIGBT_{product.group(1)}LT24.csv'), 'RG,int')
+            except FileNotFoundError:
+                rg_int = []
+            if rg_int:
+                gate_charge.rg_int = rg_int[0][1]
+        summary = gate_charge.summary()
+        driver = gate_charge.driver(gatecharge_fsw_grid[:, None], gatecharge_rg_grid[None, :])
+    except ValueError as e:
+        return dbc.Alert(str(e), color="danger")
+
+    overview = pd.DataFrame({
+        'Item': ['QG (VGE = -8V / +15V)', 'Miller plateau VGE,pl', 'Miller charge QGC', 'RG,int'],
+        'Value': [
+            f"{summary['qg']:.3f} μC",
+            f"{summary['v_plateau']:.2f} V" if summary['v_plateau'] is not None else '-',
+            f"{summary['q_gc']:.3f} μC" if summary['q_gc'] is not None else '-',
+            f"{summary['rg_int']:g} Ω",
+        ],
+    })
+    grid = pd.DataFrame(
+        [[f"{driver['power'][i, j]:.2f} W / {driver['peak_current'][i, j]:.1f} A"
+          for j in range(len(gatecharge_rg_grid))] for i in range(len(gatecharge_fsw_grid))],
+        columns=[f"RG = {rg:g} Ω" for rg in gatecharge_rg_grid],
+        index=[f"{fsw / 1e3:g} kHz" for fsw in gatecharge_fsw_grid],
+    ).rename_axis('P driver / Ipk').reset_index()
+    return html.Div([
+        dbc.Table.from_dataframe(overview, striped=True, bordered=True, hover=True, size="sm"),
+        dbc.Table.from_dataframe(grid, striped=True, bordered=True, hover=True, size="sm"),
+    ], className="mb-4")
 
 
 # M 卡片的回調函數
@@ -2087,6 +2556,7 @@ def update_graph_l(contents, filename):
     Input('upload-extra6', 'contents'),
     State('upload-extra6', 'filename')
 )
+@figure_builder
 def update_graph_m(contents, filename):
     if contents is None:
         return go.Figure()
@@ -2111,6 +2581,22 @@ def update_graph_m(contents, filename):
         line=dict(color='black', width=2)  # 設定線條顏色與寬度
     ))
 
+    # 4 階 Foster 網路擬合（預設隱藏，可從圖例開啟）
+    try:
+        t, zth = zth_from_dataframe(df)
+        network = fit_foster(t, zth, n_terms=4)
+        t_fit = np.logspace(np.log10(t[0]), np.log10(t[-1]), 200)
+        fig.add_trace(go.Scatter(
+            x=t_fit, y=foster_zth(t_fit, network['R'], network['tau']),
+            mode='lines',
+            name=f"Foster 4 階 (RMS={network['rms_error']:.2e} K/W)",
+            line=dict(color='gray', width=1, dash='dash'),
+            visible='legendonly'
+        ))
+    except (ValueError, KeyError, RuntimeError, np.linalg.LinAlgError) as e:
+        # 只略過選用的擬合曲線，量測的 Zth 曲線照常顯示
+        print(f"❌ Foster 擬合失敗: {e}")
+
     # 更新 x 軸與 y 軸的設定，使用對數刻度
     fig.update_xaxes(
         type="log",  # 設置對數刻度
@@ -2141,7 +2627,7 @@ def update_graph_m(contents, filename):
         yaxis=dict(showgrid=True, gridcolor='lightgray'),  # y 軸網格線
     )
 
-    return fig
+    return decimate_figure(fig)
 
 
 # N卡片的回調函數
@@ -2150,6 +2636,7 @@ def update_graph_m(contents, filename):
     Input('upload-extra7', 'contents'),
     State('upload-extra7', 'filename')
 )
+@figure_builder
 def update_graph_n(contents, filename):
     if contents is None:
         return go.Figure()
@@ -2204,7 +2691,59 @@ def update_graph_n(contents, filename):
         yaxis=dict(showgrid=True, gridcolor='lightgray'),  # y 軸網格線
     )
 
-    return fig
+    return decimate_figure(fig)
+
+# 每張 Diagrams1 圖表對應的上傳元件與繪圖函數
+diagram_graphs = {
+    'graph-tj25': ('upload-tj25', update_graph_a),
+    'graph-tj150': ('upload-tj150', update_graph_b),
+    'graph-tj175': ('upload-tj175', update_graph_c),
+    'graph-tjD': ('upload-tjD', update_graph_d),
+    'graph-tjE': ('upload-tjE', update_graph_e),
+    'graph-tjF': ('upload-tjF', update_graph_f),
+    'graph-tjG': ('upload-tjG', update_graph_g),
+    'graph-extra1': ('upload-extra1', update_graph_h),
+    'graph-extra2': ('upload-extra2', update_graph_i),
+    'graph-extra3': ('upload-extra3', update_graph_j),
+    'graph-extra4': ('upload-extra4', update_graph_k),
+    'graph-extra5': ('upload-extra5', update_graph_l),
+    'graph-extra6': ('upload-extra6', update_graph_m),
+    'graph-extra7': ('upload-extra7', update_graph_n),
+}
+
+# 定義回調函數：縮放或平移時，以完整解析度重新取樣可視範圍內的曲線
+def register_relayout_callback(graph_id, upload_id, builder):
+    @app.callback(
+        Output(graph_id, 'figure', allow_duplicate=True),
+        Input(graph_id, 'relayoutData'),
+        State(upload_id, 'contents'),
+        State(upload_id, 'filename'),
+        prevent_initial_call=True
+    )
+    def refine_graph(relayout_data, contents, filename):
+        ranges = relayout_ranges(relayout_data)
+        if ranges is None or contents is None:
+            raise PreventUpdate
+        with view_range(ranges):
+            return builder(contents, filename)
+
+
+for graph_id, (upload_id, builder) in diagram_graphs.items():
+    register_relayout_callback(graph_id, upload_id, builder)
+
+# 模態窗口的數據表格（依上傳內容快取）
+@on_busy(lambda: html.P(BUSY_MESSAGE))
+@result_cache.memoize()
+@admission.limit('query')
+def data_table(contents, filename):
+    df_modal = parse_contents(contents, filename)
+    if df_modal is None:
+        return None
+    # 移除全為空的欄位和列
+    df_clean = df_modal.dropna(axis=1, how='all').dropna(axis=0, how='all')
+
+    # 將清理後的 DataFrame 轉換為表格
+    return dbc.Table.from_dataframe(df_clean, striped=True, bordered=True, hover=True, size="sm")
 
 # 回調函數：處理 CSV Data 模態窗口
 @app.callback(
@@ -2295,13 +2834,8 @@ def toggle_modal(Data_n_clicks, close_n_clicks,
 
             contents, filename = contents_map.get(index, (None, None))
             if contents is not None:
-                df_modal = parse_contents(contents, filename)
-                if df_modal is not None:
-                    # 移除全為空的欄位和列
-                    df_clean = df_modal.dropna(axis=1, how='all').dropna(axis=0, how='all')
-
-                    # 將清理後的 DataFrame 轉換為表格
-                    table = dbc.Table.from_dataframe(df_clean, striped=True, bordered=True, hover=True, size="sm")
+                table = data_table(contents, filename)
+                if table is not None:
                     return True, table
             return False, ""
         else:
@@ -2309,7 +2843,11 @@ def toggle_modal(Data_n_clicks, close_n_clicks,
 
 # 定義回調函數：下載圖表圖片
 @app.callback(
-    Output('download-image', 'data'),
+    [
+        Output('download-image', 'data'),
+        Output('download-store', 'data'),
+        Output('download-poll', 'disabled'),
+    ],
     [
         Input({'type': 'button2', 'graph_id': 'graph-tj25'}, 'n_clicks'),
         Input({'type': 'button2', 'graph_id': 'graph-tj150'}, 'n_clicks'),
@@ -2341,13 +2879,16 @@ def toggle_modal(Data_n_clicks, close_n_clicks,
         State('graph-extra5', 'figure'),
         State('graph-extra6', 'figure'),
         State('graph-extra7', 'figure'),
+        State('export-format', 'value'),
     ],
     prevent_initial_call=True
 )
+@admission.limit('render', busy=prevent_update)
 def download_graph(*args):
     # 分離 Inputs 和 States
     input_n_clicks = args[:14]
-    states = args[14:]
+    states = args[14:28]
+    export_format = args[28] or 'png'
 
     # 使用 callback_context 來確定哪個按鈕被點擊
     ctx = dash.callback_context
@@ -2383,13 +2924,106 @@ def download_graph(*args):
 
             figure = graph_map.get(graph_id)
             if figure:
-                # 使用 Plotly 的 to_image 生成 PNG 圖片
-                img_bytes = go.Figure(figure).to_image(format="png")
-                # 傳送圖片進行下載
-                return dcc.send_bytes(img_bytes, filename=f"{graph_id}.png")
+                # 交給常駐的 kaleido 渲染池，已渲染過的圖片直接從快取下載
+                key = render_pool.submit(figure, export_format)
+                img_bytes = render_pool.result(key)
+                if img_bytes is not None:
+                    return dcc.send_bytes(img_bytes, filename=f"{graph_id}.{export_format}"), None, True
+                # 尚未完成時只記錄快取鍵，由 poll_download 輪詢結果（不必每次上傳圖表）
+                pending = {'key': key, 'graph_id': graph_id, 'format': export_format, 'submitted': time.time()}
+                return dash.no_update, pending, False
 
     raise PreventUpdate
 
+# 等待單張圖片渲染的最長時間（秒），超過後停止輪詢（例如送出工作的 worker 已重新啟動）
+DOWNLOAD_POLL_TIMEOUT = 60
+
+# 定義回調函數：以快取鍵輪詢背景渲染結果，完成後觸發下載
+@app.callback(
+    Output('download-image', 'data', allow_duplicate=True),
+    Output('download-poll', 'disabled', allow_duplicate=True),
+    Input('download-poll', 'n_intervals'),
+    State('download-store', 'data'),
+    prevent_initial_call=True
+)
+def poll_download(n_intervals, pending):
+    if not pending or 'key' not in pending:
+        return dash.no_update, True
+
+    try:
+        # 其他 worker 送出的工作完成後會寫入磁碟快取，在此 worker 同樣查得到
+        img_bytes = render_pool.result(pending['key'])
+    except Exception as e:
+        logging.error(f"圖片渲染失敗: {e}")
+        return dash.no_update, True
+
+    if img_bytes is None:
+        if time.time() - pending.get('submitted', 0) > DOWNLOAD_POLL_TIMEOUT:
+            logging.error(f"圖片渲染逾時: {pending['graph_id']}")
+            return dash.no_update, True
+        raise PreventUpdate
+    return dcc.send_bytes(img_bytes, filename=f"{pending['graph_id']}.{pending['format']}"), True
+
+# 等待批次匯出的最長時間（秒），超過後停止輪詢
+BATCH_POLL_TIMEOUT = 300
+
+# 定義回調函數：批次匯出所有已上傳的圖表（zip 或多頁 PDF），每張圖表各自送入渲染池平行渲染後立即返回
+@app.callback(
+    Output('batch-job', 'data'),
+    Output('batch-poll', 'disabled'),
+    Output('batch-status', 'children'),
+    Input('export-all-btn', 'n_clicks'),
+    State('export-all-format', 'value'),
+    State('export-format', 'value'),
+    *[State(graph_id, 'figure') for graph_id in diagram_graphs],
+    prevent_initial_call=True
+)
+@admission.limit('render', busy=lambda: (dash.no_update, True, BUSY_MESSAGE))
+def download_all_graphs(n_clicks, batch_format, export_format, *figures):
+    # 只匯出有資料的圖表，未上傳的卡片略過
+    named_figures = {
+        graph_id: figure for graph_id, figure in zip(diagram_graphs, figures)
+        if figure and figure.get('data')
+    }
+    if not n_clicks or not named_figures:
+        raise PreventUpdate
+
+    batch_format = 'pdf' if batch_format == 'pdf' else 'zip'
+    export_format = export_format or 'png'
+    try:
+        # 相同的圖表與格式會沿用進行中（或已快取）的渲染
+        keys = render_pool.submit_batch(named_figures, batch_format, export_format)
+    except Exception as e:
+        logging.error(f"批次匯出失敗: {e}")
+        return dash.no_update, True, "匯出失敗"
+    batch = {'keys': keys, 'batch_format': batch_format, 'format': export_format,
+             'filename': f"diagrams.{batch_format}", 'submitted': time.time()}
+    return batch, False, "匯出中…"
+
+# 定義回調函數：輪詢批次匯出的渲染結果，顯示進度，全部完成後打包並觸發下載
+@app.callback(
+    Output('download-batch', 'data'),
+    Output('batch-poll', 'disabled', allow_duplicate=True),
+    Output('batch-status', 'children', allow_duplicate=True),
+    Input('batch-poll', 'n_intervals'),
+    State('batch-job', 'data'),
+    prevent_initial_call=True
+)
+def poll_batch_export(n_intervals, batch):
+    if not batch or 'keys' not in batch:
+        return dash.no_update, True, ""
+    try:
+        fraction, data = render_pool.collect_batch(batch['keys'], batch['batch_format'], batch['format'])
+    except Exception as e:
+        logging.error(f"批次匯出失敗: {e}")
+        return dash.no_update, True, f"匯出失敗: {e}"
+    if data is not None:
+        return dcc.send_bytes(data, filename=batch['filename']), True, ""
+    if time.time() - batch.get('submitted', 0) > BATCH_POLL_TIMEOUT:
+        logging.error("批次匯出逾時")
+        return dash.no_update, True, "匯出逾時，請重新匯出"
+    return dash.no_update, False, f"匯出中… {fraction:.0%}"
+
 # ================== Diagrams1 的整合結束 ==================
 
 # 定義回調函數：啟動 subprocess（Diagrams2 頁面）
@@ -2401,15 +3035,371 @@ def download_graph(*args):
 def run_subprocess(pathname):
     if pathname == '/diagrams2':
         try:
-            # 檢查是否已經有該子進程在運行
-            # 您可以使用更複雜的機制來管理子進程，例如儲存進程 ID
-            subprocess.Popen(["python", "hh4any.py"])
+            # 由工作管理器確保只啟動一份（所有 worker 共用 pid 檔），重複瀏覽不會再開新的進程
+            pid, started = job_manager.ensure_process('hh4any', [sys.executable, "hh4any.py"])
+            if not started:
+                return f"hh4any.py 已在後台執行中 (pid={pid})，請另開瀏覽器視窗查看。"
             return "hh4any.py 已經在後台啟動 (port=8051?) ，請另開瀏覽器視窗查看。"
         except Exception as e:
             logging.error(f"啟動 hh4any.py 失敗: {e}")
             return f"啟動 hh4any.py 失敗: {e}"
     return ""
 
+# API 參數中的產品型號只接受主要資料中的 Power（例如 750V820A），其他值視為找不到
+def check_product(product):
+    if product not in unique_powers[1:]:
+        raise FileNotFoundError(f"找不到產品 {product}")
+    return product
+
+# 將查詢參數（JSON 陣列或以逗號分隔的字串）轉為數值列表
+def parse_number_list(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return [float(v) for v in value.split(',') if v.strip()]
+    if isinstance(value, (int, float)):
+        return [float(value)]
+    return [float(v) for v in value]
+
+# 定義 API：工作點查詢（IF→VF、IC→VCE），各溫度一次批次插值
+# 例：/api/operating-point?curve=if_vf&x=100,450,820&tj=25,150,175&method=pchip
+@server.route('/api/operating-point', methods=['GET', 'POST'])
+@admission.limit('query', busy=busy_response)
+def api_operating_point():
+    params = request.get_json(silent=True) or request.args
+    try:
+        curve = params.get('curve', 'if_vf')
+        method = params.get('method', 'linear')
+        if method not in LOOKUP_METHODS:
+            raise ValueError(f"不支援的插值方法: {method}")
+        invert = str(params.get('invert', 'false')).lower() in ('1', 'true', 'yes')
+        x = parse_number_list(params.get('x'))
+        if not x:
+            raise ValueError("缺少查詢點 x")
+        table = get_lookup(curve, method, invert)
+        temperatures = parse_number_list(params.get('tj'))
+        if temperatures is None:
+            temperatures = table.temperatures
+        else:
+            temperatures = [int(tj) if float(tj).is_integer() else tj for tj in temperatures]
+        values = table(x, temperatures)
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'curve': curve,
+        'method': method,
+        'invert': invert,
+        'x': x,
+        'results': {str(tj): [None if np.isnan(v) else float(v) for v in row]
+                    for tj, row in zip(temperatures, values)},
+    })
+
+# 定義 API：溫度連續模型，可在任意接面溫度下求值 VF(IF, Tj)、VCE(IC, Tj)，invert=true 時為 IF(VF, Tj)
+# 例：/api/device-model?curve=ic_vce&x=300,820&tj=100,125
+@server.route('/api/device-model', methods=['GET', 'POST'])
+@admission.limit('query', busy=busy_response)
+def api_device_model():
+    params = request.get_json(silent=True) or request.args
+    try:
+        curve = params.get('curve', 'if_vf')
+        invert = str(params.get('invert', 'false')).lower() in ('1', 'true', 'yes')
+        x = parse_number_list(params.get('x'))
+        temperatures = parse_number_list(params.get('tj'))
+        if not x or not temperatures:
+            raise ValueError("缺少 x 或 tj")
+        model = get_tj_model(curve, invert)
+        values = model(np.asarray(x)[None, :], np.asarray(temperatures)[:, None])
+        in_range = model.in_range(np.asarray(x)[None, :], np.asarray(temperatures)[:, None])
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'curve': curve,
+        'invert': invert,
+        'x': x,
+        'results': {f'{tj:g}': [float(v) for v in row] for tj, row in zip(temperatures, values)},
+        # false 表示查詢點在量測範圍外，結果為外插值
+        'in_range': {f'{tj:g}': [bool(v) for v in row] for tj, row in zip(temperatures, in_range)},
+        'r_squared': {f'{tj:g}': float(r2) for tj, r2 in zip(model.temperatures, model.r_squared)},
+    })
+
+# 定義 API：SPWM 逆變器損耗，各參數可為單一數值或等長的列表（依 NumPy 規則廣播）
+# 例：/api/losses?vdc=400&irms=100,200,300&fsw=10000&m=0.9&cos_phi=0.85&rg=2.5&tj=150
+@server.route('/api/losses', methods=['GET', 'POST'])
+@admission.limit('fit', busy=busy_response)
+def api_losses():
+    params = request.get_json(silent=True) or request.args
+    names = ['vdc', 'irms', 'fsw', 'm', 'cos_phi', 'rg', 'tj']
+    try:
+        values = {name: parse_number_list(params.get(name)) for name in names}
+        missing = [name for name, value in values.items() if not value]
+        if missing:
+            raise ValueError(f"缺少參數: {', '.join(missing)}")
+        tj_diode = parse_number_list(params.get('tj_diode'))
+        result = calculate_losses(*[np.asarray(values[name]) for name in names],
+                                  tj_diode=np.asarray(tj_diode) if tj_diode else None)
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({key: np.atleast_1d(value).tolist() for key, value in result.items()})
+
+# 定義 API：Gate charge 分析與驅動器需求，fsw 與 rg 可為列表（結果為 fsw × rg 網格）
+# 例：/api/gate-charge?product=750V820A&fsw=5000,10000,20000&rg=1,2.5,5&v_off=-8&v_on=15
+@server.route('/api/gate-charge', methods=['GET', 'POST'])
+@admission.limit('query', busy=busy_response)
+def api_gate_charge():
+    params = request.get_json(silent=True) or request.args
+    try:
+        product = check_product(params.get('product', '750V820A'))
+        # 指定的目錄必須是已知的產品目錄；未指定且預設目錄不存在時使用預設的 RG,int
+        if params.get('catalog'):
+            catalog_file = catalog_path(params.get('catalog'))
+        else:
+            default_catalog = f'HPDIGBT_{product}LT24.csv'
+            catalog_file = catalog_path(default_catalog) if default_catalog in catalog_files() else None
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    try:
+        v_off = float(params.get('v_off', -8))
+        v_on = float(params.get('v_on', 15))
+        fsw = parse_number_list(params.get('fsw')) or [10e3]
+        rg = parse_number_list(params.get('rg')) or [2.5]
+        gate_charge = get_gate_charge(product, catalog_file)
+        driver = gate_charge.driver(np.asarray(fsw)[:, None], np.asarray(rg)[None, :], v_off, v_on)
+        summary = gate_charge.summary(v_off, v_on)
+    except (FileNotFoundError, HTTPError):
+        return jsonify({'error': f"找不到 {params.get('product', '750V820A')} 的 Gate charge 數據"}), 404
+    except URLError:
+        return jsonify({'error': "無法連線到數據來源，請稍後再試"}), 503, {'Retry-After': '30'}
+    except (ValueError, TypeError, KeyError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'product': product,
+        'qg': summary['qg'],
+        'v_plateau': summary['v_plateau'],
+        'q_gc': summary['q_gc'],
+        'rg_int': summary['rg_int'],
+        'fsw': fsw,
+        'rg': rg,
+        **{key: value.tolist() for key, value in driver.items()},
+    })
+
+# 定義 API：開關能量 E(IC, RG, Tj)，結果為 ic × rg 網格（mJ），用於閘極電阻最佳化
+# 例：/api/switching-energy?ic=100,300,600&rg=1,2.5,5,10&tj=150
+@server.route('/api/switching-energy', methods=['GET', 'POST'])
+@admission.limit('query', busy=busy_response)
+def api_switching_energy():
+    params = request.get_json(silent=True) or request.args
+    try:
+        ic = parse_number_list(params.get('ic'))
+        rg = parse_number_list(params.get('rg'))
+        tj = float(params.get('tj', 150))
+        if not ic or not rg:
+            raise ValueError("缺少 ic 或 rg")
+        if min(rg) <= 0:
+            raise ValueError("rg 必須大於 0")
+        energy = switching_energy(np.asarray(ic)[:, None], np.asarray(rg)[None, :], tj)
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({'ic': ic, 'rg': rg, 'tj': tj, **{key: value.tolist() for key, value in energy.items()}})
+
+# 並聯均流研究的案例數上限（每個請求）
+MAX_PARALLEL_CASES = 1_000_000
+
+# 定義 API：並聯模組的均流容差研究，VCE,sat 限值取自主要資料的型號，或直接以 typ/min/max 指定
+# Tj 包含導通與開關損耗（fsw=0 時只計導通損耗）
+# 例：/api/paralleling?type_name=AEP550B08TFLTMM&n=4&cases=100000&i_total=1600&t_coolant=65&t_spread=3&fsw=10000
+@server.route('/api/paralleling', methods=['GET', 'POST'])
+@admission.limit('fit', busy=busy_response)
+def api_paralleling():
+    params = request.get_json(silent=True) or request.args
+    try:
+        if params.get('type_name'):
+            limits = vcesat_limits(df, params.get('type_name'))
+        else:
+            limits = {key: float(params[key]) if params.get(key) not in (None, '') else None
+                      for key in ('typ', 'min', 'max')}
+        cases = int(params.get('cases', 10000))
+        if not 0 < cases <= MAX_PARALLEL_CASES:
+            raise ValueError(f"cases 必須介於 1 與 {MAX_PARALLEL_CASES}")
+        # n 與 案例數 × n 的上限由 simulate_paralleling 檢查（MAX_PARALLEL_DEVICES、MAX_DEVICE_CASES）
+        n_devices = int(params.get('n', 2))
+        catalog_file = catalog_path(params.get('catalog', 'HPDIGBT_750V820ALT24.csv'))
+        rth = float(params['rth']) if params.get('rth') else catalog_rth(catalog_file)['IGBT']
+        statistics = simulate_paralleling(
+            n_devices, cases,
+            i_total=float(params.get('i_total', 1600)),
+            typ=limits['typ'], minimum=limits.get('min'), maximum=limits.get('max'),
+            t_coolant=float(params.get('t_coolant', 65)),
+            t_spread=float(params.get('t_spread', 0)),
+            rth=rth,
+            r_ext=float(params.get('r_ext', 0)),
+            duty=float(params.get('duty', 0.5)),
+            seed=int(params.get('seed', 0)),
+            fsw=float(params.get('fsw', 10e3)),
+            vdc=float(params.get('vdc', 400)),
+            rg=float(params.get('rg', 2.5)),
+        )
+    except (ValueError, TypeError, KeyError, FileNotFoundError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({'vcesat': limits, 'rth': rth, **statistics})
+
+# 在請求中直接執行的 Monte Carlo 研究上限（樣本數 × 工作點數），更大的研究須以 background=true 送出背景工作
+MAX_SYNC_SAMPLE_POINTS = 1_000_000
+
+# 定義 API：Monte Carlo 容差研究，VCE,sat、VF 與 Rth 依產品目錄的 Min/Typ/Max 取樣，回傳損耗與 Tj 的百分位帶
+# irms 可為多個數值（掃描），例：/api/montecarlo?catalog=HPDIGBT_750V820ALT24.csv&irms=100,300,500&samples=1000000
+@server.route('/api/montecarlo', methods=['GET', 'POST'])
+@admission.limit('fit', busy=busy_response)
+def api_montecarlo():
+    params = request.get_json(silent=True) or request.args
+    try:
+        catalog_file = catalog_path(params.get('catalog', 'HPDIGBT_750V820ALT24.csv'))
+        options = dict(
+            vdc=float(params.get('vdc', 400)),
+            irms=parse_number_list(params.get('irms')) or [300.0],
+            fsw=float(params.get('fsw', 10e3)),
+            m=float(params.get('m', 0.9)),
+            cos_phi=float(params.get('cos_phi', 0.85)),
+            rg=float(params.get('rg', 2.5)),
+            t_coolant=float(params.get('t_coolant', 65)),
+            samples=int(params.get('samples', 100_000)),
+            seed=int(params.get('seed', 0)),
+        )
+        # background=true 時送出背景工作，以 /api/jobs/<id> 查詢進度與結果
+        if str(params.get('background', 'false')).lower() in ('1', 'true', 'yes'):
+            return jsonify({'job': job_manager.submit(run_study, catalog_file, **options)}), 202
+        if options['samples'] * len(options['irms']) > MAX_SYNC_SAMPLE_POINTS:
+            raise ValueError(f"樣本數 × 工作點數超過 {MAX_SYNC_SAMPLE_POINTS} 時請加上 background=true 以背景工作執行")
+        # 小型研究直接在請求中以單一程序計算，不在 worker 執行緒中建立程序池
+        result = run_study(catalog_file, workers=1, **options)
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify(result)
+
+# 定義 API：由電容曲線積分的 Qoss (nC)、Eoss (μJ)、Co(tr)、Co(er) (nF) 與 QGC (nC)
+# 例：/api/capacitance?product=750V820A&v=100,200,400
+@server.route('/api/capacitance', methods=['GET', 'POST'])
+@admission.limit('query', busy=busy_response)
+def api_capacitance():
+    params = request.get_json(silent=True) or request.args
+    try:
+        product = check_product(params.get('product', '750V820A'))
+        capacitance = get_capacitance(product)
+        v = parse_number_list(params.get('v')) or [400.0]
+        table = capacitance.table(v)
+    except (FileNotFoundError, HTTPError):
+        return jsonify({'error': f"找不到 {params.get('product', '750V820A')} 的電容數據"}), 404
+    except URLError:
+        return jsonify({'error': "無法連線到數據來源，請稍後再試"}), 503, {'Retry-After': '30'}
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'product': product,
+        'v_max': capacitance.v_max,
+        'results': {column: [None if np.isnan(value) else float(value) for value in table[column]]
+                    for column in table.columns},
+    })
+
+# 定義 API：NTC 讀值 R (Ω) 轉換成溫度 (℃)，模型由產品目錄的 R25 與 B 值建立
+# 例：/api/ntc?catalog=HPDIGBT_750V820ALT24.csv&r=5000,1000,493
+@server.route('/api/ntc', methods=['GET', 'POST'])
+@admission.limit('query', busy=busy_response)
+def api_ntc():
+    params = request.get_json(silent=True) or request.args
+    try:
+        ntc = get_ntc(catalog_path(params.get('catalog', 'HPDIGBT_750V820ALT24.csv')))
+        r = parse_number_list(params.get('r'))
+        temperature = ntc.temperature(np.asarray(r))
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    except (ValueError, TypeError, KeyError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        **ntc.summary(),
+        'r': r,
+        'temperature': [None if np.isnan(value) else float(value) for value in temperature],
+    })
+
+# 定義 API：輸出特性曲面 IC(VCE, VGE)，invert=true 時反查 VCE(IC, VGE)；結果為 vge × x 網格
+# 例：/api/output-characteristic?tj=150&vge=11,13,15&x=100,300,600&invert=true
+@server.route('/api/output-characteristic', methods=['GET', 'POST'])
+@admission.limit('query', busy=busy_response)
+def api_output_characteristic():
+    params = request.get_json(silent=True) or request.args
+    try:
+        tj = int(float(params.get('tj', 25)))
+        invert = str(params.get('invert', 'false')).lower() in ('1', 'true', 'yes')
+        vge = parse_number_list(params.get('vge'))
+        x = parse_number_list(params.get('x'))
+        if not vge or not x:
+            raise ValueError("缺少 vge 或 x")
+        model = get_output_characteristic(tj)
+        evaluate = model.voltage if invert else model.current
+        values = evaluate(np.asarray(x)[None, :], np.asarray(vge)[:, None])
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    # NaN（量測範圍外）以 null 回傳
+    return jsonify({
+        'tj': tj,
+        'invert': invert,
+        'x': x,
+        'results': {f'{v:g}': [None if np.isnan(value) else float(value) for value in row]
+                    for v, row in zip(vge, values)},
+    })
+
+# 定義 API：在背景執行設計空間掃描（結果寫入 sweeps/<name>，可由 Sweeps 頁面查看）
+# 例：POST /api/sweeps {"name": "750V820A", "product": "750V820A", "catalog": "HPDIGBT_750V820ALT24.csv"}
+@server.route('/api/sweeps', methods=['POST'])
+@admission.limit('fit', busy=busy_response)
+def api_sweeps():
+    params = request.get_json(silent=True) or request.args
+    try:
+        name = str(params.get('name', '750V820A'))
+        product = str(params.get('product', name))
+        if not re.fullmatch(r'[\w.-]+', name):
+            raise ValueError("掃描名稱只能包含英數字、底線、點與連字號")
+        catalog_file = catalog_path(params.get('catalog', 'HPDIGBT_750V820ALT24.csv'))
+        products = {product: product_thermal(product, catalog_file)}
+    except (FileNotFoundError, HTTPError) as e:
+        return jsonify({'error': str(e)}), 404
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'job': job_manager.submit(run_sweep, name, products)}), 202
+
+# 定義 API：背景工作的狀態與結果（GET），或取消工作（DELETE）
+@server.route('/api/jobs/<job_id>', methods=['GET', 'DELETE'])
+def api_job(job_id):
+    if request.method == 'DELETE':
+        if not job_manager.cancel(job_id):
+            return jsonify({'error': f"沒有可取消的工作 {job_id}"}), 404
+        return jsonify(job_manager.status(job_id))
+
+    status = job_manager.status(job_id)
+    if status is None:
+        return jsonify({'error': f"找不到工作 {job_id}"}), 404
+    # 檔案類的結果（例如批次匯出）不放入 JSON
+    if status['state'] == 'done':
+        result = job_manager.result(job_id)
+        if not isinstance(result, bytes):
+            status['result'] = result
+    return jsonify(status)
+
+# 定義 API：結果快取的狀態（後端、本 worker 的命中率、總大小）
+@server.route('/api/cache', methods=['GET'])
+def api_cache():
+    return jsonify(result_cache.stats())
+
 # 定義應用的整體佈局
 app.layout = html.Div([
     dcc.Location(id='url', refresh=False),
@@ -0,0 +1,173 @@
+import logging
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from curvedata import read_catalog
+from losses import get_loss_model
+from paralleling import spread_from_limits
+from procpool import pool_context
+from sweep import SWEEP_QUANTITIES, catalog_rth
+
+# 取樣的參數與目錄中的對應：(區段關鍵字, 符號, 條件的正規表示式)，取第一個含 Min 或 Max 的列
+# 部分目錄檔把 VCE,sat 誤植為 VGE,th，因此以條件 VGE = 15V 辨識
+TOLERANCE_SPECS = {
+    'vce_sat': ('IGBT', ['VCE,sat', 'VGE,th'], r'VGE\s*=\s*15\s*V.*Tj\s*=\s*25'),
+    'vf': ('DIODE', ['VF'], r'Tj\s*=\s*25'),
+    'rth_igbt': ('IGBT', ['Rth,JF'], None),
+    'rth_diode': ('DIODE', ['Rth,JF'], None),
+}
+
+# 損耗對 Tj 的查表：每個工作點先在 Tj 網格上計算一次損耗分量，取樣時只做內插
+# Tj 超過 TJ_TABLE_MAX 的樣本以表格端點的損耗計算（不外插），結果中以 out_of_table 回報其比例
+TJ_TABLE_POINTS = 64
+TJ_TABLE_MAX = 250.0
+# 電熱耦合的迭代次數
+THERMAL_ITERATIONS = 6
+
+# 每批的樣本數；每批有各自的亂數流（由種子衍生），結果與工作程序數無關
+BATCH_SIZE = 1 << 17
+PERCENTILES = (1, 5, 50, 95, 99)
+# 每次研究的 樣本數 × 工作點數 上限（結果以 float32 暫存）
+MAX_SAMPLE_POINTS = 20_000_000
+
+
+# 從產品目錄讀取各參數的 Min/Typ/Max：{參數: {'typ', 'min', 'max'}}，缺少的參數不列出（固定為典型值）
+def catalog_tolerances(path):
+    df = read_catalog(path)
+    symbols = df['Symbol'].astype(str).str.replace(' ', '')
+    sections = df['Main_Values'].astype(str).str.upper()
+    conditions = df['Conditions'].astype(str)
+    tolerances = {}
+    for name, (section, symbol_options, pattern) in TOLERANCE_SPECS.items():
+        rows = df[symbols.isin(symbol_options) & sections.str.contains(section)
+                  & (df['Min'].notna() | df['Max'].notna()) & df['Typ'].notna()]
+        if pattern is not None:
+            rows = rows[conditions[rows.index].str.contains(pattern, flags=re.IGNORECASE)]
+        if rows.empty:
+            continue
+        row = rows.iloc[0]
+        tolerances[name] = {key: float(row[column]) if np.isfinite(row[column]) else None
+                            for key, column in [('typ', 'Typ'), ('min', 'Min'), ('max', 'Max')]}
+    return tolerances
+
+
+# 各參數的相對分布 {參數: (σ, 下限, 上限)}，以典型值為 1
+def relative_spreads(tolerances):
+    return {name: spread_from_limits(limits['typ'], limits['min'], limits['max'])
+            for name, limits in tolerances.items()}
+
+
+# 每個工作點的損耗分量對 Tj 的表格：{分量: (工作點數, TJ_TABLE_POINTS)}
+# points 為 dict，各鍵（vdc、irms、fsw、m、cos_phi、rg）為純量或等長的一維陣列
+def loss_tables(points, tj_grid):
+    columns = {key: np.atleast_1d(np.asarray(value, dtype=float))[:, None] for key, value in points.items()}
+    result = get_loss_model()(columns['vdc'], columns['irms'], columns['fsw'], columns['m'], columns['cos_phi'],
+                              columns['rg'], tj_grid[None, :])
+    return {key: result[key] for key in ('conduction_igbt', 'switching_igbt', 'conduction_diode', 'switching_diode')}
+
+
+# 一批樣本：取樣 → 電熱耦合迭代，回傳 (工作點數, 樣本數, 輸出量數) 的 float32 陣列
+def _run_batch(seed, size, spreads, tables, tj_grid, t_coolant, rth_igbt, rth_diode):
+    rng = np.random.default_rng(seed)
+    scale = {}
+    for name in TOLERANCE_SPECS:
+        if name in spreads:
+            sigma, low, high = spreads[name]
+            scale[name] = np.clip(rng.normal(1.0, sigma, size), low, high)
+        else:
+            scale[name] = np.ones(size)
+    rth_i = rth_igbt * scale['rth_igbt']
+    rth_d = rth_diode * scale['rth_diode']
+
+    n_points = tables['conduction_igbt'].shape[0]
+    out = np.empty((n_points, size, len(SWEEP_QUANTITIES)), dtype=np.float32)
+    for p in range(n_points):
+        tj_igbt = np.full(size, float(t_coolant))
+        tj_diode = np.full(size, float(t_coolant))
+        for _ in range(THERMAL_ITERATIONS):
+            p_igbt = scale['vce_sat'] * np.interp(tj_igbt, tj_grid, tables['conduction_igbt'][p]) \
+                + np.interp(tj_igbt, tj_grid, tables['switching_igbt'][p])
+            p_diode = scale['vf'] * np.interp(tj_diode, tj_grid, tables['conduction_diode'][p]) \
+                + np.interp(tj_diode, tj_grid, tables['switching_diode'][p])
+            tj_igbt = t_coolant + p_igbt * rth_i
+            tj_diode = t_coolant + p_diode * rth_d
+        out[p, :, 0] = p_igbt
+        out[p, :, 1] = p_diode
+        out[p, :, 2] = p_igbt + p_diode
+        out[p, :, 3] = tj_igbt
+        out[p, :, 4] = tj_diode
+    return out
+
+
+# Monte Carlo 容差研究：依目錄的 Min/Typ/Max 取樣 VCE,sat、VF 與 Rth，計算損耗與 Tj 的百分位帶
+# 工作點參數可為純量或一維陣列（例如 irms 掃描），所有工作點共用同一組樣本（共同亂數）
+# 回傳 {'points': 工作點, 'samples': 樣本數, 'tolerances': 目錄限值, 'bands': {輸出量: {百分位: [...]}}, 'mean': ...,
+#       'out_of_table': 各工作點 Tj 超出損耗表的樣本比例}
+# progress(完成比例, 說明) 在每批完成後呼叫（背景工作用）
+def run_study(catalog_file, vdc=400.0, irms=300.0, fsw=10e3, m=0.9, cos_phi=0.85, rg=2.5, t_coolant=65.0,
+              samples=1_000_000, seed=0, workers=None, percentiles=PERCENTILES, progress=None):
+    points = {'vdc': vdc, 'irms': irms, 'fsw': fsw, 'm': m, 'cos_phi': cos_phi, 'rg': rg}
+    lengths = {len(np.atleast_1d(value)) for value in points.values()} - {1}
+    if len(lengths) > 1:
+        raise ValueError("工作點參數的陣列長度必須一致")
+    n_points = lengths.pop() if lengths else 1
+    points = {key: np.broadcast_to(np.atleast_1d(np.asarray(value, dtype=float)), (n_points,))
+              for key, value in points.items()}
+    if samples * n_points > MAX_SAMPLE_POINTS:
+        raise ValueError(f"樣本數 × 工作點數不可超過 {MAX_SAMPLE_POINTS}")
+    if t_coolant >= TJ_TABLE_MAX:
+        raise ValueError(f"冷卻液溫度必須低於 {TJ_TABLE_MAX:g}℃")
+
+    tolerances = catalog_tolerances(catalog_file)
+    spreads = relative_spreads(tolerances)
+    rth = catalog_rth(catalog_file)
+    if set(rth) != {'IGBT', 'Diode'}:
+        raise ValueError(f"{catalog_file} 缺少 IGBT 或 Diode 的 Rth,JF")
+
+    tj_grid = np.linspace(t_coolant, TJ_TABLE_MAX, TJ_TABLE_POINTS)
+    tables = loss_tables(points, tj_grid)
+
+    sizes = [min(BATCH_SIZE, samples - start) for start in range(0, samples, BATCH_SIZE)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    arguments = [(seed_sequence, size, spreads, tables, tj_grid, t_coolant, rth['IGBT'], rth['Diode'])
+                 for seed_sequence, size in zip(seeds, sizes)]
+
+    batches = []
+    if workers == 1 or len(sizes) == 1:
+        for args in arguments:
+            batches.append(_run_batch(*args))
+            if progress:
+                progress(len(batches) / len(arguments), f"{len(batches)}/{len(arguments)} 批")
+    else:
+        context = pool_context()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            futures = [executor.submit(_run_batch, *args) for args in arguments]
+            try:
+                for future in futures:
+                    batches.append(future.result())
+                    if progress:
+                        progress(len(batches) / len(arguments), f"{len(batches)}/{len(arguments)} 批")
+            except BaseException:
+                # 取消（或失敗）時不再執行剩下的批次，只等待執行中的批次結束
+                executor.shutdown(cancel_futures=True)
+                raise
+    results = np.concatenate(batches, axis=1)
+    tj_columns = [SWEEP_QUANTITIES.index('Tj_igbt'), SWEEP_QUANTITIES.index('Tj_diode')]
+    out_of_table = (results[:, :, tj_columns] > TJ_TABLE_MAX).any(axis=2).mean(axis=1)
+    if out_of_table.any():
+        logging.warning(f"{out_of_table.max():.1%} 的樣本 Tj 超過 {TJ_TABLE_MAX:g}℃，損耗以表格端點計算")
+
+    bands = np.percentile(results, percentiles, axis=1)
+    return {
+        'points': {key: value.tolist() for key, value in points.items()},
+        'samples': samples,
+        'tolerances': tolerances,
+        'bands': {quantity: {str(p): bands[i, :, q].tolist() for i, p in enumerate(percentiles)}
+                  for q, quantity in enumerate(SWEEP_QUANTITIES)},
+        'mean': {quantity: results[:, :, q].mean(axis=1, dtype=np.float64).tolist()
+                 for q, quantity in enumerate(SWEEP_QUANTITIES)},
+        'tj_table_max': TJ_TABLE_MAX,
+        'out_of_table': out_of_table.tolist(),
+    }
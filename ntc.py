@@ -0,0 +1,199 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from curvedata import read_catalog
+
+KELVIN = 273.15
+
+# NTC 曲線的欄位（與 update_graph_h 相同）
+NTC_TEMPERATURE_COLUMN = 'TNTC(℃)'
+NTC_RESISTANCE_COLUMN = 'R(Ω)'
+
+# 規格書的參考溫度（R25、B25/xx）
+T_REFERENCE = 25.0
+
+# 查表：R 的均勻網格（不需要對每筆讀值取對數），涵蓋的溫度範圍與點數
+TABLE_RANGE = (-40.0, 175.0)
+TABLE_POINTS = 1 << 18
+# 陣列轉換時每次處理的筆數（暫存陣列留在快取內）
+BLOCK_SIZE = 1 << 16
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+
+# 從 DataFrame 取出 (溫度 (℃), 電阻 (Ω))，去除缺值與非正的電阻
+def ntc_curve(df):
+    if NTC_TEMPERATURE_COLUMN not in df.columns or NTC_RESISTANCE_COLUMN not in df.columns:
+        raise ValueError(f"缺少 NTC 欄位: {NTC_TEMPERATURE_COLUMN}, {NTC_RESISTANCE_COLUMN}")
+    t = pd.to_numeric(df[NTC_TEMPERATURE_COLUMN], errors='coerce').to_numpy()
+    r = pd.to_numeric(df[NTC_RESISTANCE_COLUMN], errors='coerce').to_numpy()
+    valid = np.isfinite(t) & np.isfinite(r) & (r > 0)
+    return t[valid], r[valid]
+
+
+# Beta 模型：R = R_ref·exp(B·(1/T − 1/T_ref))，ln R 對 1/T 的線性最小二乘
+def fit_beta(t, r, t_ref=T_REFERENCE):
+    x = 1 / (np.asarray(t, dtype=float) + KELVIN) - 1 / (t_ref + KELVIN)
+    slope, intercept = np.polyfit(x, np.log(r), 1)
+    return {'r_ref': float(np.exp(intercept)), 'beta': float(slope), 't_ref': t_ref}
+
+
+def beta_temperature(r, r_ref, beta, t_ref=T_REFERENCE):
+    return 1 / (1 / (t_ref + KELVIN) + np.log(np.asarray(r, dtype=float) / r_ref) / beta) - KELVIN
+
+
+# Steinhart–Hart 模型：1/T = a + b·ln R + c·(ln R)³，線性最小二乘
+def fit_steinhart_hart(t, r):
+    if len(t) < 3:
+        raise ValueError("Steinhart–Hart 擬合至少需要三個數據點")
+    log_r = np.log(np.asarray(r, dtype=float))
+    design = np.column_stack([np.ones_like(log_r), log_r, log_r ** 3])
+    coefficients, *_ = np.linalg.lstsq(design, 1 / (np.asarray(t, dtype=float) + KELVIN), rcond=None)
+    return coefficients
+
+
+def steinhart_hart_temperature(r, coefficients):
+    a, b, c = coefficients
+    log_r = np.log(np.asarray(r, dtype=float))
+    return 1 / (a + b * log_r + c * log_r ** 3) - KELVIN
+
+
+# Steinhart–Hart 的反函數 R(T)（三次方程式的實根）
+def steinhart_hart_resistance(t, coefficients):
+    a, b, c = coefficients
+    if c == 0:
+        return np.exp((1 / (np.asarray(t, dtype=float) + KELVIN) - a) / b)
+    y = (a - 1 / (np.asarray(t, dtype=float) + KELVIN)) / (2 * c)
+    x = np.sqrt((b / (3 * c)) ** 3 + y ** 2)
+    return np.exp(np.cbrt(x - y) - np.cbrt(x + y))
+
+
+class NTCThermistor:
+    # t: 溫度 (℃)，r: 電阻 (Ω)
+    # 同時擬合 Beta 與 Steinhart–Hart 模型，並以 Steinhart–Hart 預先計算 T(R) 查表
+    # 查表使用 R 的均勻網格：索引直接由 (R − R0)/ΔR 算出，不需要二分搜尋或對數
+    def __init__(self, t, r, table_range=TABLE_RANGE, table_points=TABLE_POINTS):
+        t = np.asarray(t, dtype=float)
+        r = np.asarray(r, dtype=float)
+        self.t = t
+        self.r = r
+        self.beta = fit_beta(t, r)
+        self.coefficients = fit_steinhart_hart(t, r)
+
+        # 溫度越高電阻越低：網格由 R(T_max) 到 R(T_min)
+        r_low, r_high = steinhart_hart_resistance(np.array(table_range[::-1]), self.coefficients)
+        self.r_grid = np.linspace(r_low, r_high, table_points)
+        self.t_table = steinhart_hart_temperature(self.r_grid, self.coefficients)
+        self.t_slope = np.append(np.diff(self.t_table), 0.0)
+        self._r0 = r_low
+        self._scale = (table_points - 1) / (r_high - r_low)
+
+    @classmethod
+    def from_dataframe(cls, df, **options):
+        return cls(*ntc_curve(df), **options)
+
+    # 從產品目錄的 R25 與 B25/xx 建立模型：每個 B 值對應一個 (xx ℃, R) 點
+    @classmethod
+    def from_catalog(cls, path, **options):
+        df = read_catalog(path)
+        symbols = df['Symbol'].astype(str).str.replace(' ', '')
+        typ = pd.to_numeric(df['Typ'], errors='coerce')
+        r25_rows = df[(symbols == 'R25') & typ.notna()]
+        if r25_rows.empty:
+            raise ValueError(f"{path} 沒有 NTC 的 R25")
+        r25 = float(typ[r25_rows.index[0]])
+        if str(r25_rows['Unit'].iloc[0]).strip().lower().startswith('k'):
+            r25 *= 1e3
+
+        points = {T_REFERENCE: r25}
+        for index in df.index[symbols.str.fullmatch(r'B25/\d+') & typ.notna()]:
+            t2 = float(re.fullmatch(r'B25/(\d+)', symbols[index]).group(1))
+            points.setdefault(t2, r25 * np.exp(typ[index] * (1 / (t2 + KELVIN) - 1 / (T_REFERENCE + KELVIN))))
+        if len(points) < 3:
+            raise ValueError(f"{path} 的 B 值不足以擬合 Steinhart–Hart 模型")
+        t = np.array(sorted(points))
+        return cls(t, np.array([points[value] for value in t]), **options)
+
+    # 查表轉換：R (Ω) → 溫度 (℃)，超出查表範圍或缺值為 NaN；out 可傳入預先配置的陣列
+    # 每個區塊重複使用同一組暫存陣列（原地運算），速度受限於記憶體頻寬
+    def temperature(self, r, out=None):
+        r = np.asarray(r, dtype=float)
+        flat = r.reshape(-1)
+        if out is None:
+            out = np.empty(r.shape)
+        result = out.reshape(-1)
+        last = len(self.r_grid) - 1
+        size = min(BLOCK_SIZE, len(flat))
+        position = np.empty(size)
+        index = np.empty(size, dtype=np.intp)
+        outside = np.empty(size, dtype=bool)
+        for start in range(0, len(flat), BLOCK_SIZE):
+            block = flat[start:start + BLOCK_SIZE]
+            n = len(block)
+            p, i, bad, value = position[:n], index[:n], outside[:n], result[start:start + n]
+            np.subtract(block, self._r0, out=p)
+            p *= self._scale
+            # NaN 的比較結果為 False，因此缺值也會被標記為範圍外
+            np.logical_not((p >= 0) & (p <= last), out=bad)
+            p[bad] = 0.0
+            np.copyto(i, p, casting='unsafe')
+            p -= i
+            np.take(self.t_slope, i, out=value)
+            value *= p
+            value += self.t_table[i]
+            value[bad] = np.nan
+        return out
+
+    def resistance(self, t):
+        return steinhart_hart_resistance(t, self.coefficients)
+
+    # 模型誤差 (K)：兩種擬合與查表在數據點上的最大與 RMS 溫度誤差
+    def error(self):
+        predictions = {
+            'beta': beta_temperature(self.r, self.beta['r_ref'], self.beta['beta'], self.beta['t_ref']),
+            'steinhart_hart': steinhart_hart_temperature(self.r, self.coefficients),
+            'table': self.temperature(self.r),
+        }
+        report = {}
+        for name, predicted in predictions.items():
+            residual = predicted - self.t
+            report[name] = {
+                'max': float(np.nanmax(np.abs(residual))),
+                'rms': float(np.sqrt(np.nanmean(residual ** 2))),
+            }
+        return report
+
+    def summary(self):
+        return {
+            'r25': float(self.resistance(T_REFERENCE)),
+            'beta': self.beta['beta'],
+            'steinhart_hart': [float(c) for c in self.coefficients],
+            'error': self.error(),
+        }
+
+
+# 產品目錄的 NTC 模型（快取）
+@lru_cache(maxsize=32)
+def get_ntc(catalog_file):
+    return NTCThermistor.from_catalog(catalog_file)
+
+
+# 從 CSV 串流讀取 NTC 讀值並轉換成溫度，每個區塊回傳一個 DataFrame
+def convert_csv(path, ntc, resistance_column=NTC_RESISTANCE_COLUMN, temperature_column=NTC_TEMPERATURE_COLUMN,
+                chunk_size=DEFAULT_CHUNK_SIZE):
+    for frame in pd.read_csv(path, chunksize=chunk_size, encoding='utf-8-sig'):
+        frame.columns = frame.columns.str.strip()
+        resistance = pd.to_numeric(frame[resistance_column], errors='coerce').to_numpy()
+        frame[temperature_column] = ntc.temperature(resistance)
+        yield frame
+
+
+# 轉換整個 CSV 並寫出（逐區塊附加，不把整個檔案讀進記憶體）
+def convert_csv_file(path, output_path, ntc, **options):
+    rows = 0
+    for i, frame in enumerate(convert_csv(path, ntc, **options)):
+        frame.to_csv(output_path, mode='w' if i == 0 else 'a', header=(i == 0), index=False, encoding='utf-8')
+        rows += len(frame)
+    return rows
@@ -0,0 +1,73 @@
+from functools import lru_cache
+
+import numpy as np
+from scipy.interpolate import PchipInterpolator
+
+from curvedata import curve_arrays, load_curves, monotonic_segment
+
+# 支援的插值方法
+LOOKUP_METHODS = ('linear', 'pchip')
+
+
+class CurveLookup:
+    # curves: {接面溫度: (電流陣列, 電壓陣列)}
+    # invert=False 時由電流查電壓（IF→VF、IC→VCE），invert=True 時由電壓查電流
+    def __init__(self, curves, method='linear', invert=False):
+        if method not in LOOKUP_METHODS:
+            raise ValueError(f"不支援的插值方法: {method}")
+        self.method = method
+        self.invert = invert
+        self.temperatures = list(curves)
+        self._x = {}
+        self._y = {}
+        self._pchip = {}
+        for tj, (current, voltage) in curves.items():
+            x, y = (voltage, current) if invert else (current, voltage)
+            x, y = monotonic_segment(x, y)
+            if len(x) < 2:
+                raise ValueError(f"Tj={tj} 的有效數據點不足")
+            self._x[tj] = x
+            self._y[tj] = y
+            if method == 'pchip':
+                self._pchip[tj] = PchipInterpolator(x, y, extrapolate=False)
+
+    @classmethod
+    def from_dataframe(cls, df, columns, method='linear', invert=False):
+        return cls(curve_arrays(df, columns), method=method, invert=invert)
+
+    # 單一溫度的線性插值：searchsorted 找區間後一次計算，超出量測範圍回傳 NaN
+    def _linear(self, tj, query):
+        x = self._x[tj]
+        y = self._y[tj]
+        idx = np.clip(np.searchsorted(x, query, side='right'), 1, len(x) - 1)
+        x0 = x[idx - 1]
+        x1 = x[idx]
+        t = (query - x0) / (x1 - x0)
+        result = y[idx - 1] + t * (y[idx] - y[idx - 1])
+        result[(query < x[0]) | (query > x[-1])] = np.nan
+        return result
+
+    # 批次查詢：回傳 (溫度數, 查詢點數) 陣列
+    def __call__(self, query, temperatures=None):
+        query = np.atleast_1d(np.asarray(query, dtype=float))
+        temperatures = self.temperatures if temperatures is None else list(temperatures)
+        result = np.empty((len(temperatures), query.size))
+        for i, tj in enumerate(temperatures):
+            if tj not in self._x:
+                raise ValueError(f"沒有 Tj={tj} 的曲線，可用溫度: {self.temperatures}")
+            if self.method == 'pchip':
+                result[i] = self._pchip[tj](query.ravel())
+            else:
+                result[i] = self._linear(tj, query.ravel())
+        return result.reshape((len(temperatures),) + query.shape)
+
+
+# 依曲線種類建立查詢器（快取，每個 worker 只建立一次）
+@lru_cache(maxsize=16)
+def get_lookup(kind, method='linear', invert=False):
+    return CurveLookup(load_curves(kind), method=method, invert=invert)
+
+
+# 例：lookup('if_vf', np.arange(100, 821, 10), [25, 150, 175]) 取得各溫度下的 VF
+def lookup(kind, query, temperatures=None, method='linear', invert=False):
+    return get_lookup(kind, method, invert)(query, temperatures)
@@ -0,0 +1,121 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from scipy.interpolate import PchipInterpolator
+
+from curvedata import monotonic_segment, read_curve_csv
+
+# VGE 族曲線檔：{接面溫度: 檔名}，欄位為 IC_9V / VCE_9V … IC_19V / VCE_19V
+FAMILY_FILES = {
+    25: '750V820AIC_VCE_family_25C_B.csv',
+    150: '750V820AIC_VCE_family_150C_C.csv',
+}
+
+# 預先計算的表格解析度
+VCE_POINTS = 400
+VGE_STEP = 0.05
+IC_POINTS = 400
+
+
+# 從族曲線 DataFrame 取出 {VGE: (IC 陣列, VCE 陣列)}，VGE 由欄位名稱解析
+def family_curves(df):
+    curves = {}
+    for column in df.columns:
+        match = re.fullmatch(r'IC_(\d+(?:\.\d+)?)V', column)
+        if match and f'VCE_{match.group(1)}V' in df.columns:
+            curves[float(match.group(1))] = (
+                pd.to_numeric(df[column], errors='coerce').to_numpy(),
+                pd.to_numeric(df[f'VCE_{match.group(1)}V'], errors='coerce').to_numpy(),
+            )
+    return curves
+
+
+# 規則網格上的雙線性插值：table 形狀為 (len(grid_a), len(grid_b))，a、b 依 NumPy 規則廣播
+# 超出網格範圍或鄰近格點為 NaN 時回傳 NaN
+def bilinear(grid_a, grid_b, table, a, b):
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=float), np.asarray(b, dtype=float))
+    ia = np.clip(np.searchsorted(grid_a, a, side='right') - 1, 0, len(grid_a) - 2)
+    ib = np.clip(np.searchsorted(grid_b, b, side='right') - 1, 0, len(grid_b) - 2)
+    ta = (a - grid_a[ia]) / (grid_a[ia + 1] - grid_a[ia])
+    tb = (b - grid_b[ib]) / (grid_b[ib + 1] - grid_b[ib])
+    result = ((1 - ta) * (1 - tb) * table[ia, ib] + ta * (1 - tb) * table[ia + 1, ib]
+              + (1 - ta) * tb * table[ia, ib + 1] + ta * tb * table[ia + 1, ib + 1])
+    outside = (a < grid_a[0]) | (a > grid_a[-1]) | (b < grid_b[0]) | (b > grid_b[-1])
+    return np.where(outside, np.nan, result)
+
+
+class OutputCharacteristic:
+    # curves: {VGE: (IC 陣列, VCE 陣列)}，單一接面溫度
+    # 建立時先以 PCHIP 沿 VCE 重新取樣每條曲線，再沿 VGE 以 PCHIP 插值成密集表格 IC[VGE, VCE]；
+    # 反查用的表格 VCE[VGE, IC] 由每一列單調遞增的 IC(VCE) 反轉而得
+    # 量測範圍外（例如 VGE = 9V 的曲線只到 800 A）為 NaN，不做外插
+    def __init__(self, curves, vce_points=VCE_POINTS, vge_step=VGE_STEP, ic_points=IC_POINTS):
+        if len(curves) < 2:
+            raise ValueError("至少需要兩條 VGE 曲線")
+        self.vge_levels = np.array(sorted(curves), dtype=float)
+
+        segments = {}
+        for vge in sorted(curves):
+            ic, vce = curves[vge]
+            vce, ic = monotonic_segment(vce, ic)
+            keep = vce >= 0
+            if np.count_nonzero(keep) < 2:
+                raise ValueError(f"VGE = {vge:g}V 的有效數據點不足")
+            segments[vge] = (vce[keep], np.maximum.accumulate(ic[keep]))
+
+        vce_max = max(vce[-1] for vce, _ in segments.values())
+        self.vce_grid = np.linspace(0.0, vce_max, vce_points)
+        coarse = np.full((len(self.vge_levels), vce_points), np.nan)
+        for i, vge in enumerate(self.vge_levels):
+            vce, ic = segments[vge]
+            coarse[i] = PchipInterpolator(vce, ic, extrapolate=False)(self.vce_grid)
+        # VCE = 0 時 IC = 0（曲線通常從略大於 0 的點開始）
+        coarse[:, 0] = np.where(np.isnan(coarse[:, 0]), 0.0, coarse[:, 0])
+
+        # 沿 VGE 插值：每個 VCE 格點各自一條 PCHIP（只用該格點有值的 VGE 曲線）
+        span = self.vge_levels[-1] - self.vge_levels[0]
+        self.vge_grid = np.linspace(self.vge_levels[0], self.vge_levels[-1], int(round(span / vge_step)) + 1)
+        self.current_table = np.full((len(self.vge_grid), vce_points), np.nan)
+        for j in range(vce_points):
+            valid = np.isfinite(coarse[:, j])
+            if np.count_nonzero(valid) < 2:
+                continue
+            levels = self.vge_levels[valid]
+            column = PchipInterpolator(levels, coarse[valid, j], extrapolate=False)(self.vge_grid)
+            # 只在有數據的 VGE 範圍內（相鄰曲線都有值）保留
+            column[(self.vge_grid < levels[0]) | (self.vge_grid > levels[-1])] = np.nan
+            self.current_table[:, j] = column
+
+        ic_max = np.nanmax(self.current_table)
+        self.ic_grid = np.linspace(0.0, ic_max, ic_points)
+        self.voltage_table = np.full((len(self.vge_grid), ic_points), np.nan)
+        for i in range(len(self.vge_grid)):
+            row = self.current_table[i]
+            valid = np.isfinite(row)
+            ic, vce = monotonic_segment(row[valid], self.vce_grid[valid])
+            if len(ic) < 2:
+                continue
+            inside = (self.ic_grid >= ic[0]) & (self.ic_grid <= ic[-1])
+            self.voltage_table[i, inside] = np.interp(self.ic_grid[inside], ic, vce)
+
+    @classmethod
+    def from_dataframe(cls, df, **options):
+        return cls(family_curves(df), **options)
+
+    # IC(VCE, VGE)，vce 與 vge 依 NumPy 規則廣播
+    def current(self, vce, vge):
+        return bilinear(self.vge_grid, self.vce_grid, self.current_table, vge, vce)
+
+    # 反查 VCE(IC, VGE)，ic 與 vge 依 NumPy 規則廣播
+    def voltage(self, ic, vge):
+        return bilinear(self.vge_grid, self.ic_grid, self.voltage_table, vge, ic)
+
+
+# 各接面溫度的輸出特性模型（快取，擬合只做一次）
+@lru_cache(maxsize=8)
+def get_output_characteristic(tj):
+    if tj not in FAMILY_FILES:
+        raise ValueError(f"沒有 Tj={tj} 的 VGE 族曲線，可用溫度: {sorted(FAMILY_FILES)}")
+    return OutputCharacteristic.from_dataframe(read_curve_csv(FAMILY_FILES[tj]))
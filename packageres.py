@@ -0,0 +1,126 @@
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+from curvedata import DATA_DIR, monotonic_segment
+from curvefit import fit_polynomials, polyval
+
+# Chip / Module 曲線的欄位（與 update_graph_k 相同）
+CHIP_COLUMNS = ('IC_Chip', 'VCE_Chip')
+MODULE_COLUMNS = ('IC_Module', 'VCE_Module')
+# 曲線檔名：<產品>RBSOA_K.csv（產品名稱與主要資料的 Power 欄位相同，例如 750V820A）
+CHIP_MODULE_SUFFIX = 'RBSOA_K.csv'
+
+# 重新取樣的共同 IC 網格點數
+IC_POINTS = 200
+
+# 寫入目錄時使用的符號與說明（端子到晶片的模組引線電阻）
+PACKAGE_RESISTANCE_SYMBOL = "RCC'+EE'"
+PACKAGE_RESISTANCE_PARAMETER = 'Module lead resistance, terminals-chip'
+PACKAGE_RESISTANCE_CONDITIONS = 'Derived from IC_Chip / IC_Module curves'
+
+
+# 從 DataFrame 取出 Chip 與 Module 的 (IC, VCE)，以 IC 遞增的單調段表示
+def chip_module_curves(df):
+    missing = [column for column in CHIP_COLUMNS + MODULE_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"缺少 Chip/Module 欄位: {', '.join(missing)}")
+    curves = []
+    for ic_col, vce_col in (CHIP_COLUMNS, MODULE_COLUMNS):
+        ic, vce = monotonic_segment(pd.to_numeric(df[ic_col], errors='coerce').to_numpy(),
+                                    pd.to_numeric(df[vce_col], errors='coerce').to_numpy())
+        curves.append((ic, vce))
+    return curves
+
+
+# 將 Chip 與 Module 曲線重新取樣到兩者重疊的 IC 範圍，回傳 (IC 網格, ΔVCE = VCE_Module − VCE_Chip)
+def voltage_difference(chip, module, points=IC_POINTS):
+    (ic_chip, vce_chip), (ic_module, vce_module) = chip, module
+    if len(ic_chip) < 2 or len(ic_module) < 2:
+        raise ValueError("Chip 或 Module 曲線的數據點不足")
+    low = max(ic_chip[0], ic_module[0], 0.0)
+    high = min(ic_chip[-1], ic_module[-1])
+    if high <= low:
+        raise ValueError("Chip 與 Module 曲線沒有重疊的電流範圍")
+    ic = np.linspace(low, high, points)
+    return ic, np.interp(ic, ic_module, vce_module) - np.interp(ic, ic_chip, vce_chip)
+
+
+# 一次擬合多個產品的封裝電阻：ΔVCE = R·IC + V0
+# curves: {產品: (chip, module)}，回傳 DataFrame（R (mΩ)、V0 (V)、R²、使用的 IC 範圍）
+def extract_package_resistance(curves, points=IC_POINTS):
+    products, ic_rows, dv_rows = [], [], []
+    for product, (chip, module) in curves.items():
+        ic, dv = voltage_difference(chip, module, points)
+        products.append(product)
+        ic_rows.append(ic)
+        dv_rows.append(dv)
+    if not products:
+        return pd.DataFrame(columns=['product', 'r_package', 'v_offset', 'r_squared', 'ic_min', 'ic_max'])
+
+    ic = np.array(ic_rows)
+    fit = fit_polynomials(ic, np.array(dv_rows), degree=1)
+    return pd.DataFrame({
+        'product': products,
+        'r_package': fit['coefficients'][:, 0] * 1e3,
+        'v_offset': fit['coefficients'][:, 1],
+        'r_squared': fit['r_squared'],
+        'ic_min': ic[:, 0],
+        'ic_max': ic[:, -1],
+    })
+
+
+# 單一 DataFrame（上傳的 K 卡片數據）的擬合，回傳 dict 與擬合線 (IC, VCE_Chip + ΔVCE 擬合)
+def fit_chip_module(df, points=IC_POINTS):
+    chip, module = chip_module_curves(df)
+    result = extract_package_resistance({'uploaded': (chip, module)}, points).iloc[0].to_dict()
+    ic, _ = voltage_difference(chip, module, points)
+    coefficients = [result['r_package'] * 1e-3, result['v_offset']]
+    return result, ic, np.interp(ic, *chip) + polyval(coefficients, ic)
+
+
+# 找出資料夾中所有 Chip/Module 曲線檔並一次擬合，無法解析的檔案略過
+def package_resistance_table(directory=DATA_DIR):
+    curves = {}
+    for path in sorted(glob.glob(os.path.join(directory, f'*{CHIP_MODULE_SUFFIX}'))):
+        product = os.path.basename(path)[:-len(CHIP_MODULE_SUFFIX)]
+        try:
+            df = pd.read_csv(path, encoding='utf-8-sig')
+            df.columns = df.columns.str.strip()
+            chip, module = chip_module_curves(df)
+            voltage_difference(chip, module)
+        except (ValueError, OSError) as e:
+            print(f"❌ 略過 {os.path.basename(path)}: {e}")
+            continue
+        curves[product] = (chip, module)
+    return extract_package_resistance(curves)
+
+
+# 將擬合結果轉成主要資料（Datasheetdata）格式的列：每個 (Module, Power, Type Name) 一列，Typ 為 R (mΩ)
+def derived_catalog_rows(catalog, table):
+    rows = []
+    values = dict(zip(table['product'], table['r_package']))
+    for (module, power, type_name), group in catalog.groupby(['Module', 'Power', 'Type Name'], sort=False):
+        value = values.get(str(power).strip())
+        if value is None:
+            continue
+        first = group.iloc[0]
+        rows.append({
+            'Module': module,
+            'Power': power,
+            'Type Name': type_name,
+            'Item': 'Module',
+            'Parameter': PACKAGE_RESISTANCE_PARAMETER,
+            'Report Year': first.get('Report Year'),
+            'Conditions': PACKAGE_RESISTANCE_CONDITIONS,
+            'Symbol': PACKAGE_RESISTANCE_SYMBOL,
+            'Typ': round(float(value), 3),
+            'Unit': 'mΩ',
+            'User': first.get('User'),
+            'TimeStamp': first.get('TimeStamp'),
+            'Version': first.get('Version'),
+            'Report Link': '',
+        })
+    return pd.DataFrame(rows, columns=catalog.columns)
@@ -0,0 +1,163 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from losses import KV_IGBT, TEST_VOLTAGE
+from rgmodel import RG_ON_REFERENCE, get_switching_model
+from tjmodel import get_tj_model
+
+# Newton 迭代：固定上限，所有案例收斂後提前結束
+NEWTON_ITERATIONS = 20
+NEWTON_TOLERANCE = 1e-9
+# 電熱耦合的外層迭代次數：Tj = T_coolant + P·Rth，再依新的 Tj 重新分配電流
+THERMAL_ITERATIONS = 6
+# 規格書的 Max 視為典型值 + 3σ
+LIMIT_SIGMAS = 3.0
+# 電流下限（避免 √I 項的導數在 0 A 發散）
+MIN_CURRENT = 1e-3
+# 每次研究的並聯元件數與 案例數 × 元件數 上限（中間陣列皆為 案例數 × 元件數）
+MAX_PARALLEL_DEVICES = 64
+MAX_DEVICE_CASES = 2_000_000
+
+
+# 由 Min/Typ/Max 推出相對分布：回傳 (相對標準差, 相對下限, 相對上限)，以 Typ 為 1
+# 只有 Max（或只有 Min）時視為對稱分布
+def spread_from_limits(typ, minimum=None, maximum=None, sigmas=LIMIT_SIGMAS):
+    if typ is None or not np.isfinite(typ) or typ <= 0:
+        raise ValueError("需要正的典型值 Typ")
+    minimum = None if minimum is None or not np.isfinite(minimum) else float(minimum)
+    maximum = None if maximum is None or not np.isfinite(maximum) else float(maximum)
+    if minimum is None and maximum is None:
+        raise ValueError("至少需要 Min 或 Max 其中之一")
+    if maximum is None:
+        maximum = 2 * typ - minimum
+    if minimum is None:
+        minimum = 2 * typ - maximum
+    sigma = max(maximum - typ, typ - minimum) / sigmas
+    return sigma / typ, minimum / typ, maximum / typ
+
+
+# 從主要資料（Datasheetdata）取出某型號 25℃ 的 VCE,sat 限值：{'ic', 'typ', 'min', 'max'}
+def vcesat_limits(catalog, type_name):
+    rows = catalog[(catalog['Type Name'].astype(str).str.strip() == type_name)
+                   & (catalog['Symbol'].astype(str).str.replace(' ', '') == 'VCE,sat')]
+    for _, row in rows.iterrows():
+        conditions = str(row['Conditions'])
+        tj = re.search(r'Tj\s*=\s*(\d+)', conditions)
+        ic = re.search(r'IC\s*=\s*(\d+(?:\.\d+)?)\s*A', conditions)
+        values = {key: pd.to_numeric(row[column], errors='coerce') for key, column in
+                  [('typ', 'Typ'), ('min', 'Min'), ('max', 'Max')]}
+        if tj and int(tj.group(1)) == 25 and np.isfinite(values['typ']) and \
+                (np.isfinite(values['min']) or np.isfinite(values['max'])):
+            return {'ic': float(ic.group(1)) if ic else None,
+                    **{k: float(v) if np.isfinite(v) else None for k, v in values.items()}}
+    raise ValueError(f"{type_name} 沒有 25℃ 且含 Min/Max 的 VCE,sat")
+
+
+# VCE(I) 與 dVCE/dI，coefficients 為導通壓降基底 [1, I, √I, ln(1 + I)] 的係數 (..., 4)
+def _conduction(current, coefficients):
+    current = np.maximum(current, MIN_CURRENT)
+    root = np.sqrt(current)
+    c0, c1, c2, c3 = np.moveaxis(coefficients, -1, 0)
+    voltage = c0 + c1 * current + c2 * root + c3 * np.log1p(current)
+    slope = c1 + c2 / (2 * root) + c3 / (1 + current)
+    return voltage, np.maximum(slope, 1e-9)
+
+
+# 並聯均流求解（向量化，所有案例同時迭代）
+# i_total: 各案例的總電流 (cases,)；scale: 各元件 VCE 相對典型值的倍率 (cases, N)
+# t_coolant: 各元件的冷卻溫度 (cases, N)；rth: 接面到冷卻的熱阻 (K/W)，純量或 (N,)
+# r_ext: 各元件串聯的外部電阻（引線、匯流排，Ω），純量或 (cases, N)
+# duty: 導通時間比例，導通損耗 P = VCE·I·duty
+# fsw > 0 時加上各元件的開關損耗 P = (Eon + Eoff)(I_k, RG, Tj_k)·fsw·(vdc/400V)^Kv（與 losses 相同的電壓換算）
+# 開關能量隨各元件分到的電流與 Tj 而不同，是並聯時溫度差異的主要來源
+# 內層以 Newton 法解 VCE_k(I_k) = V、ΣI_k = I_total（對角 Jacobian 加一條約束，以 Schur 補數直接求解）
+def solve_sharing(i_total, scale, t_coolant, rth, r_ext=0.0, duty=0.5, model=None,
+                  thermal_iterations=THERMAL_ITERATIONS, fsw=0.0, vdc=TEST_VOLTAGE, rg=RG_ON_REFERENCE):
+    model = model or get_tj_model('ic_vce')
+    switching = get_switching_model() if fsw else None
+    i_total = np.asarray(i_total, dtype=float)
+    scale, t_coolant = np.broadcast_arrays(np.asarray(scale, dtype=float), np.asarray(t_coolant, dtype=float))
+    n_devices = scale.shape[-1]
+    i_total = np.broadcast_to(i_total, scale.shape[:-1])
+    current = np.repeat(i_total[..., None] / n_devices, n_devices, axis=-1)
+    tj = t_coolant.copy()
+
+    for _ in range(thermal_iterations):
+        coefficients = model.coefficients_at(tj)
+        for _ in range(NEWTON_ITERATIONS):
+            voltage, slope = _conduction(current, coefficients)
+            vce = scale * voltage + r_ext * current
+            g = scale * slope + r_ext
+            # 共同電壓取目前的平均，殘差 r_k = VCE_k − V
+            common = vce.mean(axis=-1, keepdims=True)
+            residual = vce - common
+            inverse = 1 / g
+            d_common = ((i_total - current.sum(axis=-1))[..., None] + (residual * inverse).sum(axis=-1, keepdims=True)) \
+                / inverse.sum(axis=-1, keepdims=True)
+            step = (d_common - residual) * inverse
+            current = np.maximum(current + step, MIN_CURRENT)
+            if np.max(np.abs(step)) < NEWTON_TOLERANCE * max(float(np.max(i_total)), 1.0):
+                break
+        voltage, _ = _conduction(current, coefficients)
+        vce = scale * voltage + r_ext * current
+        p_conduction = vce * current * duty
+        if switching is not None:
+            # 能量單位 mJ → J
+            p_switching = fsw * (vdc / TEST_VOLTAGE) ** KV_IGBT * 1e-3 \
+                * (switching.eon(current, rg, tj) + switching.eoff(current, rg, tj))
+        else:
+            p_switching = np.zeros_like(current)
+        tj = t_coolant + (p_conduction + p_switching) * rth
+
+    return {'current': current, 'vce': vce, 'tj': tj, 'p_conduction': p_conduction, 'p_switching': p_switching}
+
+
+# 產生容差研究的案例：VCE 倍率依 Min/Typ/Max 取截斷常態分布，冷卻溫度加上常態分布的差異
+def sample_cases(n_devices, cases, typ, minimum=None, maximum=None, t_coolant=65.0, t_spread=0.0, seed=0):
+    sigma, low, high = spread_from_limits(typ, minimum, maximum)
+    rng = np.random.default_rng(seed)
+    scale = np.clip(rng.normal(1.0, sigma, (cases, n_devices)), low, high)
+    temperature = t_coolant + rng.normal(0.0, t_spread, (cases, n_devices)) if t_spread else \
+        np.full((cases, n_devices), float(t_coolant))
+    return scale, temperature
+
+
+# 不均流統計：不均流率 = I_max/I_平均 − 1，降額係數 = I_平均/I_max
+def sharing_statistics(result, percentiles=(50, 95, 99)):
+    current = result['current']
+    imbalance = current.max(axis=-1) / current.mean(axis=-1) - 1
+    tj_max = result['tj'].max(axis=-1)
+    worst = int(np.argmax(tj_max))
+    p_total = result['p_conduction'] + result['p_switching']
+    return {
+        'cases': int(current.shape[0]),
+        'n_devices': int(current.shape[-1]),
+        'imbalance_mean': float(imbalance.mean()),
+        'imbalance_max': float(imbalance.max()),
+        'imbalance_percentiles': {str(p): float(v) for p, v in zip(percentiles, np.percentile(imbalance, percentiles))},
+        'derating': float(1 / (1 + imbalance.max())),
+        'tj_max': float(tj_max[worst]),
+        'tj_percentiles': {str(p): float(v) for p, v in zip(percentiles, np.percentile(tj_max, percentiles))},
+        'worst_case_currents': current[worst].tolist(),
+        'worst_case_tj': result['tj'][worst].tolist(),
+        'worst_case_losses': p_total[worst].tolist(),
+        'p_max': float(p_total.max()),
+        # Tj 是否包含開關損耗（fsw = 0 時只有導通損耗，溫度差異偏低）
+        'includes_switching': bool(np.any(result['p_switching'])),
+    }
+
+
+# 例：simulate_paralleling(4, 100_000, i_total=1600, typ=1.2, maximum=1.5, rth=0.1, t_spread=3, fsw=10e3)
+# fsw = 0 時 Tj 只由導通損耗計算（結果的 includes_switching 為 False）
+def simulate_paralleling(n_devices, cases, i_total, typ, minimum=None, maximum=None, t_coolant=65.0, t_spread=0.0,
+                         rth=0.1, r_ext=0.0, duty=0.5, seed=0, fsw=0.0, vdc=TEST_VOLTAGE, rg=RG_ON_REFERENCE):
+    if not 2 <= n_devices <= MAX_PARALLEL_DEVICES:
+        raise ValueError(f"並聯元件數必須介於 2 與 {MAX_PARALLEL_DEVICES}")
+    if cases * n_devices > MAX_DEVICE_CASES:
+        raise ValueError(f"案例數 × 並聯元件數不可超過 {MAX_DEVICE_CASES}")
+    scale, temperature = sample_cases(n_devices, cases, typ, minimum, maximum, t_coolant, t_spread, seed)
+    result = solve_sharing(np.full(cases, float(i_total)), scale, temperature, rth, r_ext, duty,
+                           fsw=fsw, vdc=vdc, rg=rg)
+    return sharing_statistics(result)
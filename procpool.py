@@ -0,0 +1,18 @@
+import multiprocessing
+
+# 各模組程序池共用的啟動方式：gunicorn worker 以多執行緒執行，fork 可能複製其他執行緒持有的鎖（logging、sqlite、kaleido）
+# 而死結，因此由單執行緒的 forkserver 產生工作程序；工作函數都在模組層級，可以序列化傳遞
+START_METHOD = 'forkserver'
+# forkserver 預先載入的模組（含主程式），之後產生的工作程序不必各自重新匯入
+PRELOAD_MODULES = ['__main__', 'numpy', 'pandas']
+
+
+# 程序池的 mp_context；平台不支援此啟動方式時回傳 None（使用平台預設）
+def pool_context():
+    try:
+        context = multiprocessing.get_context(START_METHOD)
+    except ValueError:
+        return None
+    if START_METHOD == 'forkserver':
+        context.set_forkserver_preload(PRELOAD_MODULES)
+    return context
@@ -0,0 +1,427 @@
+import functools
+import glob
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import stat
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# 快取後端、位置與大小上限（可由環境變數調整，上限設為 0 時停用）
+# 後端：'filesystem'（每個項目一個檔案）、'sqlite'（單一資料庫檔）、或 redis:// 網址（跨主機共用）
+RESULT_CACHE_BACKEND = os.environ.get('RESULT_CACHE_BACKEND', 'filesystem')
+# RESULT_CACHE_DIR：filesystem / sqlite 後端的目錄，預設在應用程式目錄下的 .cache
+# 快取的值以 pickle 讀回，目錄必須只有執行應用程式的使用者可以寫入：不存在時以 0700 建立，
+# 屬於其他使用者或是符號連結時拒絕使用（快取停用並記錄警告），因此不要設在 /tmp 等共用目錄的固定名稱
+RESULT_CACHE_DIR = os.environ.get('RESULT_CACHE_DIR',
+                                  os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache'))
+RESULT_CACHE_MAX_BYTES = int(os.environ.get('RESULT_CACHE_MAX_BYTES', 512 << 20))
+# 每寫入幾次檢查一次總大小；超過上限時刪除最久未使用的項目直到低於上限的比例
+EVICT_EVERY = 32
+EVICT_TARGET = 0.8
+# SQLite 後端的使用時間精確度（秒）：命中時不立即寫入，使用時間比這個舊的項目才記錄下來，
+# 累積 ACCESS_BATCH 筆或經過 ACCESS_FLUSH_INTERVAL 秒後在一個交易中更新，讀取不必排隊等待寫入鎖
+ACCESS_RESOLUTION = 60.0
+ACCESS_BATCH = 256
+ACCESS_FLUSH_INTERVAL = 30.0
+
+_MISSING = object()
+
+
+# 建立（或檢查）只有目前使用者可以存取的目錄，不符合時拋出 ValueError
+def private_directory(directory):
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode):
+        raise ValueError(f"快取目錄不是目錄（可能是符號連結）: {directory}")
+    if hasattr(os, 'getuid') and info.st_uid != os.getuid():
+        raise ValueError(f"快取目錄屬於其他使用者，拒絕使用: {directory}")
+    if info.st_mode & 0o077:
+        os.chmod(directory, 0o700)
+    return directory
+
+
+# 程式版本：應用程式目錄下所有 .py 檔的雜湊（部署時可用 RESULT_CACHE_VERSION 指定，例如 git commit）
+# 任何程式修改都會讓舊的快取項目失效，舊項目之後由容量上限淘汰
+def code_version(directory=os.path.dirname(os.path.abspath(__file__))):
+    version = os.environ.get('RESULT_CACHE_VERSION')
+    if version:
+        return version
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(directory, '*.py'))):
+        with open(path, 'rb') as f:
+            digest.update(os.path.basename(path).encode('utf-8'))
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def _update_hash(digest, value):
+    if value is None or isinstance(value, (bool, int, float)):
+        digest.update(repr(value).encode('utf-8'))
+    elif isinstance(value, str):
+        digest.update(b's')
+        digest.update(value.encode('utf-8'))
+    elif isinstance(value, bytes):
+        digest.update(b'b')
+        digest.update(value)
+    elif isinstance(value, (list, tuple)):
+        digest.update(f'[{len(value)}'.encode('utf-8'))
+        for item in value:
+            _update_hash(digest, item)
+    elif isinstance(value, dict):
+        digest.update(f'{{{len(value)}'.encode('utf-8'))
+        for item_key in sorted(value, key=repr):
+            _update_hash(digest, item_key)
+            _update_hash(digest, value[item_key])
+    elif isinstance(value, np.ndarray):
+        digest.update(f'{value.dtype}{value.shape}'.encode('utf-8'))
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (pd.DataFrame, pd.Series)):
+        digest.update(repr(list(value.columns) if isinstance(value, pd.DataFrame) else value.name).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+    else:
+        digest.update(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+# 輸入內容的雜湊值（字串、位元組、數值、list/dict、numpy 陣列與 DataFrame）
+def content_hash(*parts):
+    digest = hashlib.sha256()
+    _update_hash(digest, parts)
+    return digest.hexdigest()
+
+
+class FileSystemBackend:
+    # 每個項目一個檔案；寫入時先寫暫存檔再 os.replace，多個 gunicorn worker 同時讀寫也只會看到完整的檔案
+    # 讀取命中時更新檔案的修改時間，淘汰時依修改時間刪除最久未使用的項目
+    name = 'filesystem'
+
+    def __init__(self, directory=RESULT_CACHE_DIR):
+        self.directory = directory
+        self._checked = False
+
+    # 第一次使用時檢查目錄的擁有者與權限（建立後端時不檢查，避免匯入模組就失敗）
+    def _path(self, key):
+        if not self._checked:
+            private_directory(self.directory)
+            self._checked = True
+        return os.path.join(self.directory, key[:2], f'{key}.pickle')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def set(self, key, data):
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            self._remove(tmp_path)
+            raise
+
+    def delete(self, key):
+        self._remove(self._path(key))
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _entries(self):
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, '*', '*.pickle')):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    # 總大小超過上限時刪除最久未使用的項目；同一時間只有一個程序執行淘汰（其他程序直接略過）
+    def evict(self, max_bytes):
+        if not os.path.isdir(self.directory):
+            return
+        private_directory(self.directory)
+        with open(os.path.join(self.directory, '.evict.lock'), 'a') as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+            if total <= max_bytes:
+                return
+            for _, size, path in sorted(entries):
+                self._remove(path)
+                total -= size
+                if total <= max_bytes * EVICT_TARGET:
+                    break
+
+    def clear(self):
+        for _, _, path in self._entries():
+            self._remove(path)
+
+
+class SQLiteBackend:
+    # 單一 SQLite 檔案（WAL 模式，多個程序可同時讀取，寫入由 SQLite 的檔案鎖排序）
+    # 每個程序與執行緒各自建立連線（fork 之後不可沿用父程序的連線）
+    # 命中時的使用時間批次寫入（見 ACCESS_RESOLUTION），淘汰只需要大致的使用順序
+    name = 'sqlite'
+
+    def __init__(self, path=os.path.join(RESULT_CACHE_DIR, 'cache.sqlite3')):
+        self.path = path
+        self._local = threading.local()
+        self._accessed = {}
+        self._flushed = time.monotonic()
+        self._access_lock = threading.Lock()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            private_directory(os.path.dirname(os.path.abspath(self.path)))
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS entries '
+                               '(key TEXT PRIMARY KEY, value BLOB, size INTEGER, accessed REAL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key):
+        connection = self._connection()
+        row = connection.execute('SELECT value, accessed FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[1] > ACCESS_RESOLUTION:
+            with self._access_lock:
+                self._accessed[key] = now
+                flush = (len(self._accessed) >= ACCESS_BATCH
+                         or time.monotonic() - self._flushed > ACCESS_FLUSH_INTERVAL)
+            if flush:
+                self.flush()
+        return row[0]
+
+    # 把累積的使用時間在一個交易中寫入（只更新較新的時間，項目已刪除時不影響）
+    def flush(self):
+        with self._access_lock:
+            accessed, self._accessed = self._accessed, {}
+            self._flushed = time.monotonic()
+        if not accessed:
+            return
+        connection = self._connection()
+        with connection:
+            connection.execute('BEGIN')
+            connection.executemany('UPDATE entries SET accessed = MAX(accessed, ?) WHERE key = ?',
+                                   [(when, key) for key, when in accessed.items()])
+
+    def set(self, key, data):
+        self._connection().execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)',
+                                   (key, sqlite3.Binary(data), len(data), time.time()))
+
+    def delete(self, key):
+        self._connection().execute('DELETE FROM entries WHERE key = ?', (key,))
+
+    def size(self):
+        return self._connection().execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+    # 由最近使用的項目往回累計大小，刪除累計超過目標的項目
+    def evict(self, max_bytes):
+        self.flush()
+        if self.size() <= max_bytes:
+            return
+        self._connection().execute(
+            'DELETE FROM entries WHERE key IN (SELECT key FROM (SELECT key, SUM(size) OVER '
+            '(ORDER BY accessed DESC) AS running FROM entries) WHERE running > ?)', (max_bytes * EVICT_TARGET,))
+
+    def clear(self):
+        self._connection().execute('DELETE FROM entries')
+
+
+class RedisBackend:
+    # 網路共用快取（跨主機）：需要安裝 redis 套件；容量由伺服器的 maxmemory-policy（例如 allkeys-lru）控制
+    name = 'redis'
+    prefix = 'datasheetdb:'
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise ValueError("使用 Redis 快取需要安裝 redis 套件")
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, data):
+        self.client.set(self.prefix + key, data)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def size(self):
+        return None
+
+    def evict(self, max_bytes):
+        pass
+
+    def clear(self):
+        for key in self.client.scan_iter(f'{self.prefix}*'):
+            self.client.delete(key)
+
+
+# 依設定建立快取後端：'filesystem'（預設）、'sqlite'、或 redis:// 網址
+def create_backend(spec=RESULT_CACHE_BACKEND, directory=RESULT_CACHE_DIR):
+    if spec == 'filesystem':
+        return FileSystemBackend(directory)
+    if spec == 'sqlite':
+        return SQLiteBackend(os.path.join(directory, 'cache.sqlite3'))
+    if spec.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisBackend(spec)
+    raise ValueError(f"未知的快取後端: {spec}")
+
+
+class ResultCache:
+    # 以 (名稱, 程式版本, 輸入內容雜湊) 為鍵的結果快取，值以 pickle 儲存在共用的後端
+    # 所有 worker（以及使用網路後端時的所有主機）共用同一份快取，後端錯誤只記錄，不影響呼叫端
+    def __init__(self, backend=None, max_bytes=RESULT_CACHE_MAX_BYTES, version=None):
+        self.backend = backend or create_backend()
+        self.max_bytes = max_bytes
+        self.version = version or code_version()
+        self.enabled = max_bytes > 0
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def key(self, name, *parts):
+        return content_hash(name, self.version, *parts)
+
+    # 讀取快取，未命中（或項目損毀、後端無法連線）時回傳 default
+    def get(self, key, default=None):
+        if not self.enabled:
+            return default
+        try:
+            data = self.backend.get(key)
+        except Exception as e:
+            logging.warning(f"快取讀取失敗: {e}")
+            data = None
+        if data is None:
+            self.misses += 1
+            return default
+        try:
+            value = pickle.loads(data)
+        except Exception as e:
+            logging.warning(f"快取項目損毀，已移除: {e}")
+            self.delete(key)
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    # 寫入快取；每 EVICT_EVERY 次寫入檢查一次總大小
+    def set(self, key, value):
+        if not self.enabled:
+            return
+        try:
+            self.backend.set(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception as e:
+            logging.warning(f"快取寫入失敗: {e}")
+            return
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % EVICT_EVERY == 0
+        if evict:
+            self.evict()
+
+    def delete(self, key):
+        try:
+            self.backend.delete(key)
+        except Exception as e:
+            logging.warning(f"快取刪除失敗: {e}")
+
+    def evict(self):
+        if not self.enabled:
+            return
+        try:
+            self.backend.evict(self.max_bytes)
+        except Exception as e:
+            logging.warning(f"快取淘汰失敗: {e}")
+
+    def clear(self):
+        self.backend.clear()
+
+    # 本程序的命中統計與後端的總大小（網路後端為 None）
+    def stats(self):
+        lookups = self.hits + self.misses
+        try:
+            size = self.backend.size()
+        except Exception:
+            size = None
+        return {
+            'backend': self.backend.name,
+            'version': self.version,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else None,
+            'size': size,
+            'max_bytes': self.max_bytes,
+        }
+
+    # 以快取包裝函數：鍵為 (函數名稱, 程式版本, 參數內容)
+    # context 為額外的鍵來源（例如目前的可視範圍），在呼叫時取值
+    # transform 在儲存前轉換回傳值（例如 go.Figure 轉成 dict，讀取時不必重建物件），命中與未命中回傳相同型別
+    def memoize(self, name=None, context=None, transform=None):
+        def decorator(func):
+            cache_name = name or f'{func.__module__}.{func.__qualname__}'
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    value = func(*args, **kwargs)
+                    return value if transform is None else transform(value)
+                key = self.key(cache_name, args, kwargs, context() if context else None)
+                value = self.get(key, _MISSING)
+                if value is _MISSING:
+                    value = func(*args, **kwargs)
+                    if transform is not None:
+                        value = transform(value)
+                    self.set(key, value)
+                return value
+
+            wrapper.uncached = func
+            return wrapper
+        return decorator
+
+
+# 全域共用的結果快取
+result_cache = ResultCache()
@@ -0,0 +1,189 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from curvedata import read_curve_csv
+from curvefit import fit_basis, polynomial_basis, polyval, stack_series
+
+# 開關損耗曲線的檔案與欄位：{接面溫度: (x 欄位, 能量欄位 (mJ))}
+# E、F 檔的 x 欄位名稱重複，pandas 讀取時第二次出現的欄位會加上 .1
+SWITCHING_SPECS = {
+    'eon_ic': {
+        'file': '750V820AEon&Eoff(IC)_E.csv',
+        'columns': {tj: (f'IC(A)_{tj}℃', f'Eon(mJ)_{tj}℃') for tj in (25, 150, 175)},
+    },
+    'eoff_ic': {
+        'file': '750V820AEon&Eoff(IC)_E.csv',
+        'columns': {tj: (f'IC(A)_{tj}℃.1', f'Eoff(mJ)_{tj}℃') for tj in (25, 150, 175)},
+    },
+    'eon_rg': {
+        'file': '750V820AEon&Eoff(Rg)_F.csv',
+        'columns': {tj: (f'RG_{tj}℃', f'Eon(mJ)_{tj}℃') for tj in (25, 150, 175)},
+    },
+    'eoff_rg': {
+        'file': '750V820AEon&Eoff(Rg)_F.csv',
+        'columns': {tj: (f'RG_{tj}℃.1', f'Eoff(mJ)_{tj}℃') for tj in (25, 150, 175)},
+    },
+    'erec_rg': {
+        'file': '750V820AErec(Rg)_J.csv',
+        'columns': {tj: (f'RG_{tj}℃', f'Erec(mJ)_{tj}℃') for tj in (25, 150, 175)},
+    },
+}
+
+# 規格書的量測條件（與 Diagrams1 卡片上的說明相同）
+RG_ON_REFERENCE = 2.5      # Eon(IC) 的 RG,on (Ω)
+RG_OFF_REFERENCE = 5.0     # Eoff(IC) 的 RG,off (Ω)
+RG_CURVE_CURRENT = 300.0   # E(RG)、Erec(RG) 曲線的量測電流 (A)
+
+# 專案中沒有 Erec(IF) 的數據檔，以 Erec(RG) 於 300 A 的數值依 (IF/300A)^Ki 換算
+KI_DIODE = 0.6
+
+# RG 縮放函數：ln E 為 ln RG 的三次多項式（對遞增的 Eon/Eoff 與遞減的 Erec 都平滑且恆正）
+RG_DEGREE = 3
+
+
+# 各量測溫度的線性內插權重（三角形基底），tj 超出範圍時取端點
+def temperature_weights(temperatures, tj):
+    if len(temperatures) == 1:
+        return [np.ones_like(tj)]
+    tj = np.clip(tj, temperatures[0], temperatures[-1])
+    weights = []
+    for i, temperature in enumerate(temperatures):
+        weight = np.zeros_like(tj)
+        if i > 0:
+            below = temperatures[i - 1]
+            rising = (tj >= below) & (tj <= temperature)
+            weight = np.where(rising, (tj - below) / (temperature - below), weight)
+        if i < len(temperatures) - 1:
+            above = temperatures[i + 1]
+            falling = (tj >= temperature) & (tj <= above)
+            weight = np.where(falling, (above - tj) / (above - temperature), weight)
+        weights.append(weight)
+    return weights
+
+
+# 依規格讀取曲線：{接面溫度: (x 陣列, 能量陣列)}
+def read_energy_curves(spec):
+    df = read_curve_csv(spec['file'])
+    curves = {}
+    for tj, (x_col, y_col) in spec['columns'].items():
+        if x_col not in df.columns or y_col not in df.columns:
+            raise ValueError(f"{spec['file']} 缺少欄位 {x_col} 或 {y_col}")
+        curves[tj] = (pd.to_numeric(df[x_col], errors='coerce').to_numpy(),
+                      pd.to_numeric(df[y_col], errors='coerce').to_numpy())
+    return curves
+
+
+class EnergyCurve:
+    # curves: {接面溫度: (x 陣列, 能量陣列)}
+    # 同一溫度內對 x 線性插值（範圍外以端點斜率線性外插），溫度之間再線性插值
+    def __init__(self, curves):
+        self.temperatures = np.array(sorted(curves), dtype=float)
+        self._x = []
+        self._y = []
+        for tj in sorted(curves):
+            x, y = curves[tj]
+            x = np.asarray(x, dtype=float)
+            y = np.asarray(y, dtype=float)
+            valid = np.isfinite(x) & np.isfinite(y)
+            order = np.argsort(x[valid])
+            self._x.append(x[valid][order])
+            self._y.append(y[valid][order])
+
+    @classmethod
+    def from_spec(cls, spec):
+        return cls(read_energy_curves(spec))
+
+    def _at_temperature(self, index, x):
+        xs = self._x[index]
+        ys = self._y[index]
+        idx = np.clip(np.searchsorted(xs, x, side='right'), 1, len(xs) - 1)
+        t = (x - xs[idx - 1]) / (xs[idx] - xs[idx - 1])
+        return ys[idx - 1] + t * (ys[idx] - ys[idx - 1])
+
+    # x 與 tj 依 NumPy 規則廣播
+    def __call__(self, x, tj):
+        x = np.asarray(x, dtype=float)
+        tj = np.asarray(tj, dtype=float)
+        result = 0.0
+        for i, weight in enumerate(temperature_weights(self.temperatures, tj)):
+            if np.any(weight):
+                result = result + weight * self._at_temperature(i, x)
+        return np.maximum(result, 0.0)
+
+
+class RGScaling:
+    # curves: {接面溫度: (RG 陣列, 能量陣列)}
+    # 所有溫度以同一個 log-多項式基底一次批次擬合，溫度之間對 ln E 線性插值
+    # RG 限制在量測範圍內（超出範圍的多項式外插不可靠）
+    def __init__(self, curves, degree=RG_DEGREE):
+        self.temperatures = np.array(sorted(curves), dtype=float)
+        rgs, energies = [], []
+        for tj in sorted(curves):
+            rg, energy = (np.asarray(v, dtype=float) for v in curves[tj])
+            valid = np.isfinite(rg) & np.isfinite(energy) & (rg > 0) & (energy > 0)
+            rgs.append(np.log(rg[valid]))
+            energies.append(np.log(energy[valid]))
+        self.rg_range = (float(np.exp(min(r.min() for r in rgs))), float(np.exp(max(r.max() for r in rgs))))
+
+        fit = fit_basis(stack_series(rgs), stack_series(energies), polynomial_basis(degree))
+        self.coefficients = fit['coefficients']
+        self.r_squared = fit['r_squared']
+
+    @classmethod
+    def from_spec(cls, spec):
+        return cls(read_energy_curves(spec))
+
+    # 擬合的能量 (mJ)，rg 與 tj 依 NumPy 規則廣播
+    def __call__(self, rg, tj):
+        log_rg = np.log(np.clip(np.asarray(rg, dtype=float), *self.rg_range))
+        tj = np.asarray(tj, dtype=float)
+        log_energy = 0.0
+        for i, weight in enumerate(temperature_weights(self.temperatures, tj)):
+            if np.any(weight):
+                log_energy = log_energy + weight * polyval(self.coefficients[i], log_rg)
+        return np.exp(log_energy)
+
+    # 相對於參考電阻的縮放係數 E(RG)/E(RG_ref)
+    def ratio(self, rg, rg_ref, tj):
+        return self(rg, tj) / self(rg_ref, tj)
+
+
+class SwitchingEnergyModel:
+    # E(IC, RG, Tj)：E(IC) 曲線（於規格書的參考 RG）乘上擬合的 RG 縮放函數
+    # Erec(IF, RG, Tj)：擬合的 Erec(RG)（於 300 A）乘上 (IF/300A)^Ki
+    def __init__(self):
+        self.eon_ic = EnergyCurve.from_spec(SWITCHING_SPECS['eon_ic'])
+        self.eoff_ic = EnergyCurve.from_spec(SWITCHING_SPECS['eoff_ic'])
+        self.eon_rg = RGScaling.from_spec(SWITCHING_SPECS['eon_rg'])
+        self.eoff_rg = RGScaling.from_spec(SWITCHING_SPECS['eoff_rg'])
+        self.erec_rg = RGScaling.from_spec(SWITCHING_SPECS['erec_rg'])
+
+    # 以下各函數的參數皆依 NumPy 規則廣播，回傳能量 (mJ)
+    def eon(self, ic, rg, tj):
+        return self.eon_ic(ic, tj) * self.eon_rg.ratio(rg, RG_ON_REFERENCE, tj)
+
+    def eoff(self, ic, rg, tj):
+        return self.eoff_ic(ic, tj) * self.eoff_rg.ratio(rg, RG_OFF_REFERENCE, tj)
+
+    def erec(self, i_f, rg, tj):
+        i_f = np.maximum(np.asarray(i_f, dtype=float), 0.0)
+        return self.erec_rg(rg, tj) * (i_f / RG_CURVE_CURRENT) ** KI_DIODE
+
+    def __call__(self, ic, rg, tj):
+        eon = self.eon(ic, rg, tj)
+        eoff = self.eoff(ic, rg, tj)
+        erec = self.erec(ic, rg, tj)
+        return {'eon': eon, 'eoff': eoff, 'erec': erec, 'ets': eon + eoff}
+
+
+# 開關能量模型（快取）
+@lru_cache(maxsize=1)
+def get_switching_model():
+    return SwitchingEnergyModel()
+
+
+# 例：switching_energy(np.arange(100, 901, 100)[:, None], np.linspace(1, 25, 200), 150)
+def switching_energy(ic, rg, tj):
+    return get_switching_model()(ic, rg, tj)
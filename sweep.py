@@ -0,0 +1,230 @@
+import argparse
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+
+import numpy as np
+
+from curvedata import catalog_values
+from foster import load_networks
+from losses import get_loss_model
+from procpool import pool_context
+
+# 掃描結果的存放位置：每次掃描一個資料夾，內含 cube.npy（記憶體映射）與 meta.json
+SWEEP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sweeps')
+
+# 結果立方體的軸順序（最後一維是輸出量）
+SWEEP_AXES = ['fsw', 'irms', 'vdc', 'rg', 't_coolant']
+SWEEP_QUANTITIES = ['P_igbt', 'P_diode', 'P_total', 'Tj_igbt', 'Tj_diode']
+
+# 預設掃描範圍
+DEFAULT_GRID = {
+    'fsw': np.arange(2e3, 20.01e3, 2e3),
+    'irms': np.arange(50, 601, 25),
+    'vdc': np.array([300.0, 350.0, 400.0, 450.0]),
+    'rg': np.array([1.0, 2.5, 5.0, 10.0]),
+    't_coolant': np.array([25.0, 45.0, 65.0, 85.0]),
+}
+
+# 電熱耦合的迭代次數：Tj = T_coolant + P·Rth，損耗再依新的 Tj 重新計算
+THERMAL_ITERATIONS = 6
+
+
+# 從產品目錄 CSV 讀取 Rth,JF 的典型值，回傳 {'IGBT': ..., 'Diode': ...}
+def catalog_rth(path):
+    rth = {}
+    for section, value in catalog_values(path, 'Rth,JF'):
+        rth.setdefault('Diode' if 'DIODE' in section.upper() else 'IGBT', value)
+    return rth
+
+
+# 產品的熱阻：優先使用 Foster 擬合結果（thermal_models），否則使用目錄 CSV 的典型值
+def product_thermal(product, catalog_file=None):
+    networks = load_networks(product)
+    rth = {device: network['Rth'] for device, network in networks.items() if 'Rth' in network}
+    if catalog_file is not None:
+        for device, value in catalog_rth(catalog_file).items():
+            rth.setdefault(device, value)
+    missing = {'IGBT', 'Diode'} - set(rth)
+    if missing:
+        raise ValueError(f"{product} 缺少 {', '.join(sorted(missing))} 的熱阻")
+    return {'rth_igbt': rth['IGBT'], 'rth_diode': rth['Diode']}
+
+
+def _sweep_paths(name, directory):
+    folder = os.path.join(directory, name)
+    return folder, os.path.join(folder, 'cube.npy'), os.path.join(folder, 'meta.json')
+
+
+def _write_meta(meta_path, meta):
+    tmp_path = f'{meta_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, meta_path)
+
+
+# 計算一個產品、一個 fsw 的切片（irms × vdc × rg × t_coolant），直接寫入記憶體映射檔
+def _compute_slab(cube_path, product_index, fsw_index, fsw, grid, thermal, m, cos_phi):
+    irms, vdc, rg, t_coolant = np.meshgrid(grid['irms'], grid['vdc'], grid['rg'], grid['t_coolant'], indexing='ij')
+    model = get_loss_model()
+
+    tj_igbt = t_coolant.copy()
+    tj_diode = t_coolant.copy()
+    for _ in range(THERMAL_ITERATIONS):
+        result = model(vdc, irms, fsw, m, cos_phi, rg, tj_igbt, tj_diode)
+        tj_igbt = t_coolant + result['igbt'] * thermal['rth_igbt']
+        tj_diode = t_coolant + result['diode'] * thermal['rth_diode']
+
+    cube = np.load(cube_path, mmap_mode='r+')
+    slab = cube[product_index, fsw_index]
+    slab[..., 0] = result['igbt']
+    slab[..., 1] = result['diode']
+    slab[..., 2] = result['total']
+    slab[..., 3] = tj_igbt
+    slab[..., 4] = tj_diode
+    cube.flush()
+    del cube
+    return product_index, fsw_index
+
+
+# 執行掃描：products 為 {產品名稱: {'rth_igbt': ..., 'rth_diode': ...}}
+# 每個 (產品, fsw) 切片是一個工作，由程序池平行計算並各自寫入不重疊的區塊
+# 已完成的切片記錄在 meta.json，中斷後以 resume=True 重新執行只會計算剩下的部分
+# progress(完成比例, 說明) 在每個切片完成後呼叫（背景工作用）
+def run_sweep(name, products, grid=None, m=0.9, cos_phi=0.85, workers=None, directory=SWEEP_DIR, resume=True,
+              progress=None):
+    grid = {axis: np.asarray((grid or DEFAULT_GRID)[axis], dtype=float) for axis in SWEEP_AXES}
+    folder, cube_path, meta_path = _sweep_paths(name, directory)
+    shape = (len(products),) + tuple(len(grid[axis]) for axis in SWEEP_AXES) + (len(SWEEP_QUANTITIES),)
+    meta = {
+        'name': name,
+        'products': list(products),
+        'thermal': products,
+        'axes': {axis: grid[axis].tolist() for axis in SWEEP_AXES},
+        'quantities': SWEEP_QUANTITIES,
+        'm': m,
+        'cos_phi': cos_phi,
+        'shape': list(shape),
+        'dtype': 'float32',
+        'completed': [],
+    }
+
+    if resume and os.path.exists(meta_path) and os.path.exists(cube_path):
+        with open(meta_path, encoding='utf-8') as f:
+            previous = json.load(f)
+        if {key: previous.get(key) for key in meta if key != 'completed'} == \
+                {key: value for key, value in meta.items() if key != 'completed'}:
+            meta['completed'] = previous.get('completed', [])
+    if not meta['completed']:
+        os.makedirs(folder, exist_ok=True)
+        cube = np.lib.format.open_memmap(cube_path, mode='w+', dtype=np.float32, shape=shape)
+        cube[:] = np.nan
+        cube.flush()
+        del cube
+    _write_meta(meta_path, meta)
+
+    done = {tuple(item) for item in meta['completed']}
+    jobs = [(p, f) for p in range(len(products)) for f in range(len(grid['fsw'])) if (p, f) not in done]
+    if not jobs:
+        return meta
+
+    context = pool_context()
+
+    product_names = list(products)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = [
+            executor.submit(_compute_slab, cube_path, p, f, grid['fsw'][f], grid, products[product_names[p]], m, cos_phi)
+            for p, f in jobs
+        ]
+        total = len(done) + len(jobs)
+        try:
+            for future in as_completed(futures):
+                try:
+                    meta['completed'].append(list(future.result()))
+                except Exception as e:
+                    logging.error(f"掃描 {name} 的切片計算失敗: {e}")
+                    continue
+                _write_meta(meta_path, meta)
+                if progress:
+                    progress(len(meta['completed']) / total, f"{len(meta['completed'])}/{total} 個切片")
+        except BaseException:
+            # 取消時不再執行剩下的切片（只等待執行中的切片）；已完成的部分記錄在 meta.json，之後可以接續
+            executor.shutdown(cancel_futures=True)
+            raise
+    return meta
+
+
+# 列出已完成（或部分完成）的掃描名稱
+def list_sweeps(directory=SWEEP_DIR):
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name for name in os.listdir(directory)
+                  if os.path.exists(os.path.join(directory, name, 'meta.json')))
+
+
+class SweepCube:
+    # 以唯讀記憶體映射開啟掃描結果，切片只讀取需要的部分，不重新計算
+    def __init__(self, name, directory=SWEEP_DIR):
+        _, cube_path, meta_path = _sweep_paths(name, directory)
+        with open(meta_path, encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.cube = np.load(cube_path, mmap_mode='r')
+        self.axes = {axis: np.array(values) for axis, values in self.meta['axes'].items()}
+        self.products = self.meta['products']
+        self.quantities = self.meta['quantities']
+
+    # 最接近指定數值的索引
+    def index(self, axis, value):
+        return int(np.abs(self.axes[axis] - float(value)).argmin())
+
+    # 取出 2-D 切片：y_axis × x_axis，其餘軸固定在 fixed 指定的數值（未指定時取第一個）
+    def slice(self, product, quantity, x_axis, y_axis, fixed=None):
+        if x_axis == y_axis:
+            raise ValueError("x 軸與 y 軸不能相同")
+        fixed = fixed or {}
+        index = [self.products.index(product)]
+        for axis in SWEEP_AXES:
+            if axis in (x_axis, y_axis):
+                index.append(slice(None))
+            else:
+                index.append(self.index(axis, fixed.get(axis, self.axes[axis][0])))
+        index.append(self.quantities.index(quantity))
+        values = np.asarray(self.cube[tuple(index)])
+        # 保留下來的兩個軸依 SWEEP_AXES 的順序排列，需要時轉置成 (y, x)
+        if SWEEP_AXES.index(x_axis) < SWEEP_AXES.index(y_axis):
+            values = values.T
+        return values
+
+
+@lru_cache(maxsize=8)
+def _open_sweep(name, directory, modified):
+    return SweepCube(name, directory)
+
+
+# 開啟掃描結果（快取；以 meta.json 的修改時間作為快取鍵的一部分，重新執行掃描後自動重新開啟）
+def open_sweep(name, directory=SWEEP_DIR):
+    _, _, meta_path = _sweep_paths(name, directory)
+    if not os.path.exists(meta_path):
+        raise ValueError(f"找不到掃描結果: {name}")
+    return _open_sweep(name, directory, os.path.getmtime(meta_path))
+
+
+# 命令列：python sweep.py --name 750V820A --catalog HPDIGBT_750V820ALT24.csv
+def main():
+    parser = argparse.ArgumentParser(description="損耗與熱設計空間掃描")
+    parser.add_argument('--name', default='750V820A')
+    parser.add_argument('--product', default='750V820A')
+    parser.add_argument('--catalog', default='HPDIGBT_750V820ALT24.csv')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--no-resume', action='store_true')
+    args = parser.parse_args()
+
+    products = {args.product: product_thermal(args.product, args.catalog)}
+    meta = run_sweep(args.name, products, workers=args.workers, resume=not args.no_resume)
+    print(f"{args.name}: {len(meta['completed'])} 個切片完成，形狀 {meta['shape']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+from functools import lru_cache
+
+import numpy as np
+
+from curvedata import load_curves, monotonic_segment
+from curvefit import fit_basis, polynomial_basis, stack_series
+
+
+# 導通壓降的基底：V = c0 + c1·I + c2·√I + c3·ln(1 + I)
+# （歐姆項、漂移區調變項與 PN 接面的對數項，比三次多項式更貼近 VF/VCE 曲線）
+def conduction_basis(current):
+    current = np.maximum(current, 0.0)
+    return np.stack([np.ones_like(current), current, np.sqrt(current), np.log1p(current)], axis=-1)
+
+
+class TjModel:
+    # curves: {接面溫度: (電流陣列, 電壓陣列)}
+    # invert=False 時建立 V(I, Tj)，invert=True 時建立 I(V, Tj)
+    # 先以同一組基底一次擬合所有溫度，再把每個係數對 Tj 擬合成多項式（係數曲面）
+    def __init__(self, curves, basis=conduction_basis, invert=False, tj_degree=None):
+        self.basis = basis
+        self.invert = invert
+        self.temperatures = np.array(sorted(curves), dtype=float)
+        if len(self.temperatures) < 2:
+            raise ValueError("至少需要兩個接面溫度的曲線")
+
+        xs, ys = [], []
+        self.valid_range = {}
+        for tj in sorted(curves):
+            current, voltage = curves[tj]
+            x, y = (voltage, current) if invert else (current, voltage)
+            x, y = monotonic_segment(x, y)
+            keep = x >= 0
+            xs.append(x[keep])
+            ys.append(y[keep])
+            self.valid_range[tj] = (float(x[keep].min()), float(x[keep].max()))
+
+        fit = fit_basis(stack_series(xs), stack_series(ys), basis)
+        self.coefficients = fit['coefficients']
+        self.r_squared = fit['r_squared']
+        self.mse = fit['mse']
+        self.mae = fit['mae']
+
+        # 係數對 Tj 的多項式（預設：三個溫度點 → 二次，剛好通過每個量測溫度）
+        if tj_degree is None:
+            tj_degree = min(2, len(self.temperatures) - 1)
+        self.tj_surface = np.polyfit(self.temperatures, self.coefficients, tj_degree)
+
+    # 任意 Tj 下的基底係數，tj 可為純量或陣列，回傳 (..., 基底數)
+    def coefficients_at(self, tj):
+        tj = np.asarray(tj, dtype=float)[..., None]
+        coefficients = np.zeros(tj.shape[:-1] + (self.tj_surface.shape[1],))
+        for row in self.tj_surface:
+            coefficients = coefficients * tj + row
+        return coefficients
+
+    # x 是否在擬合範圍內：各量測溫度的 x 範圍對 Tj 線性內插（量測溫度以外取最近的溫度）
+    # 範圍外仍會外插求值，呼叫端以此標示或排除外插的結果
+    def in_range(self, x, tj):
+        x = np.asarray(x, dtype=float)
+        tj = np.asarray(tj, dtype=float)
+        low = np.interp(tj, self.temperatures, [self.valid_range[t][0] for t in sorted(self.valid_range)])
+        high = np.interp(tj, self.temperatures, [self.valid_range[t][1] for t in sorted(self.valid_range)])
+        return (x >= low) & (x <= high)
+
+    # 向量化求值：x 與 tj 依 NumPy 規則廣播
+    def __call__(self, x, tj):
+        x = np.asarray(x, dtype=float)
+        return np.einsum('...k,...k->...', self.basis(x), self.coefficients_at(tj))
+
+
+# 依曲線種類建立溫度連續模型（快取）
+# invert=False：VF(IF, Tj)、VCE(IC, Tj)；invert=True：IF(VF, Tj)，與 IFVF02 相同的三次多項式
+@lru_cache(maxsize=8)
+def get_tj_model(kind, invert=False):
+    basis = polynomial_basis(3) if invert else conduction_basis
+    return TjModel(load_curves(kind), basis=basis, invert=invert)
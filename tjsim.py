@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+from scipy.signal import fftconvolve, lfilter
+
+from foster import foster_zth, load_networks
+
+# 串流模擬時每次讀取的樣本數
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+
+# 將 Foster 網路離散化（功率在每個取樣區間內維持定值）
+# 每一項的溫升狀態：T_i[k] = a_i·T_i[k−1] + b_i·P[k]，a_i = exp(−dt/τ_i)，b_i = R_i·(1 − a_i)
+def foster_coefficients(r, tau, dt):
+    r = np.asarray(r, dtype=float)
+    tau = np.asarray(tau, dtype=float)
+    a = np.exp(-dt / tau)
+    return a, r * -np.expm1(-dt / tau)
+
+
+class TjSimulator:
+    # networks: {元件名稱: {'R': [...], 'tau': [...]}}（fit_foster 的輸出或 thermal_models 中的 JSON）
+    # dt: 取樣間隔 (s)，t_ref: 參考溫度（殼溫或散熱器溫度，℃）
+    # 模擬狀態會保留在物件中，可依序餵入任意長度的功率區塊
+    def __init__(self, networks, dt, t_ref=25.0):
+        if dt <= 0:
+            raise ValueError("取樣間隔 dt 必須大於 0")
+        if not networks:
+            raise ValueError("至少需要一個 Foster 網路")
+        self.dt = dt
+        self.t_ref = t_ref
+        self.devices = list(networks)
+        self._coefficients = {}
+        for device, network in networks.items():
+            if len(network['R']) != len(network['tau']):
+                raise ValueError(f"{device} 的 R 與 tau 項數不一致")
+            self._coefficients[device] = foster_coefficients(network['R'], network['tau'], dt)
+        self.reset()
+
+    @classmethod
+    def from_product(cls, product, dt, t_ref=25.0, devices=None):
+        networks = load_networks(product)
+        if devices is not None:
+            networks = {device: networks[device] for device in devices if device in networks}
+        if not networks:
+            raise ValueError(f"找不到 {product} 的熱網路參數，請先執行 Foster 擬合")
+        return cls(networks, dt, t_ref)
+
+    # 清除各項的溫升狀態（回到熱平衡）
+    def reset(self):
+        self.state = {device: np.zeros(len(a)) for device, (a, _) in self._coefficients.items()}
+        self.samples = 0
+
+    # 處理一個功率區塊，power: {元件名稱: 功率陣列 (W)}，各元件長度需相同
+    # t_ref 可為純量或與區塊等長的陣列（例如隨時間變化的散熱器溫度）
+    # 回傳 {元件名稱: Tj 陣列 (℃)}
+    def step(self, power, t_ref=None):
+        t_ref = self.t_ref if t_ref is None else t_ref
+        lengths = {len(np.atleast_1d(power[device])) for device in self.devices}
+        if len(lengths) != 1:
+            raise ValueError("各元件的功率區塊長度必須相同")
+
+        result = {}
+        for device in self.devices:
+            p = np.asarray(power[device], dtype=float)
+            a, b = self._coefficients[device]
+            state = self.state[device]
+            rise = np.zeros_like(p)
+            # 每一項是一階 IIR 濾波器，lfilter 以 C 迴圈完成遞迴，zi 延續上一個區塊的狀態
+            for i in range(len(a)):
+                term, zi = lfilter([b[i]], [1.0, -a[i]], p, zi=[a[i] * state[i]])
+                rise += term
+                state[i] = term[-1] if len(term) else state[i]
+            result[device] = rise + t_ref
+        self.samples += lengths.pop()
+        return result
+
+    # 串流模擬：chunks 為 {元件名稱: 功率陣列} 的可迭代物件，逐區塊產生 Tj
+    def stream(self, chunks):
+        for chunk in chunks:
+            yield self.step(chunk)
+
+
+# 一次模擬整段功率曲線，power: {元件名稱: 功率陣列}
+def simulate(networks, power, dt, t_ref=25.0, chunk_size=DEFAULT_CHUNK_SIZE):
+    simulator = TjSimulator(networks, dt, t_ref)
+    n = len(np.atleast_1d(next(iter(power.values()))))
+    result = {device: np.empty(n) for device in simulator.devices}
+    for start in range(0, n, chunk_size):
+        chunk = {device: power[device][start:start + chunk_size] for device in simulator.devices}
+        for device, tj in simulator.step(chunk).items():
+            result[device][start:start + chunk_size] = tj
+    return result
+
+
+# 以 FFT 捲積計算（用於驗證遞迴結果，或一次處理整段曲線）
+# 脈衝響應 h[k] = Zth((k+1)·dt) − Zth(k·dt)，與遞迴式的零階保持假設一致
+def simulate_fft(network, power, dt, t_ref=25.0):
+    power = np.asarray(power, dtype=float)
+    t = np.arange(len(power) + 1) * dt
+    h = np.diff(foster_zth(t, network['R'], network['tau']))
+    return fftconvolve(power, h)[:len(power)] + t_ref
+
+
+# 從 CSV 串流讀取任務曲線並模擬
+# columns: {元件名稱: 功率欄位}，t_ref_column 為選用的參考溫度欄位
+def simulate_csv(path, networks, columns, dt, t_ref=25.0, t_ref_column=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    simulator = TjSimulator({device: networks[device] for device in columns}, dt, t_ref)
+    usecols = list(columns.values()) + ([t_ref_column] if t_ref_column else [])
+    for frame in pd.read_csv(path, usecols=usecols, chunksize=chunk_size, encoding='utf-8-sig'):
+        power = {device: frame[column].to_numpy(dtype=float) for device, column in columns.items()}
+        reference = frame[t_ref_column].to_numpy(dtype=float) if t_ref_column else None
+        tj = simulator.step(power, reference)
+        yield pd.DataFrame({f'Tj_{device}': values for device, values in tj.items()}, index=frame.index)
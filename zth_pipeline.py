@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+
+from foster import ZTH_COLUMN, ZTH_TIME_COLUMN
+
+# 原始冷卻曲線的預設欄位（與 Zth 試算表相同）
+RAW_TIME_COLUMN = 't [s]'
+RAW_DELTA_T_COLUMN = 'ΔTj (t)'
+
+# 對數時間分箱的範圍與密度：固定的絕對網格，不需事先知道量測長度
+TIME_RANGE = (1e-9, 1e5)
+POINTS_PER_DECADE = 20
+
+# √t 外插的時間窗（s）：窗口之前的點受電氣暫態影響，以外插值取代
+SQRT_T_WINDOW = (1e-5, 1e-4)
+
+# 每次讀取的樣本數
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+
+class CoolingCurveAccumulator:
+    # 單次掃描累積冷卻曲線的統計量，記憶體只與分箱數有關，與樣本數無關
+    # 1) 對數時間分箱的 Σt、ΣΔT、樣本數（之後取平均完成重新取樣）
+    # 2) √t 時間窗內的線性迴歸累加量（ΔT = ΔT0 − k·√t，用於外插 t=0 的溫升）
+    def __init__(self, points_per_decade=POINTS_PER_DECADE, time_range=TIME_RANGE, sqrt_t_window=SQRT_T_WINDOW):
+        self.points_per_decade = points_per_decade
+        self.log_t_min = np.log10(time_range[0])
+        self.n_bins = int(np.ceil((np.log10(time_range[1]) - self.log_t_min) * points_per_decade))
+        self.sqrt_t_window = sqrt_t_window
+        self.sum_t = np.zeros(self.n_bins)
+        self.sum_delta_t = np.zeros(self.n_bins)
+        self.count = np.zeros(self.n_bins)
+        # √t 迴歸：n、Σx、Σy、Σx²、Σxy（x = √t）
+        self.regression = np.zeros(5)
+        self.samples = 0
+
+    def add(self, t, delta_t):
+        t = np.asarray(t, dtype=float)
+        delta_t = np.asarray(delta_t, dtype=float)
+        valid = np.isfinite(t) & np.isfinite(delta_t) & (t > 0)
+        t = t[valid]
+        delta_t = delta_t[valid]
+        self.samples += len(t)
+
+        index = np.floor((np.log10(t) - self.log_t_min) * self.points_per_decade).astype(int)
+        inside = (index >= 0) & (index < self.n_bins)
+        self.sum_t += np.bincount(index[inside], weights=t[inside], minlength=self.n_bins)
+        self.sum_delta_t += np.bincount(index[inside], weights=delta_t[inside], minlength=self.n_bins)
+        self.count += np.bincount(index[inside], minlength=self.n_bins)
+
+        window = (t >= self.sqrt_t_window[0]) & (t <= self.sqrt_t_window[1])
+        x = np.sqrt(t[window])
+        y = delta_t[window]
+        self.regression += [len(x), x.sum(), y.sum(), (x * x).sum(), (x * y).sum()]
+
+    # 分箱平均後的冷卻曲線 (t, ΔT)
+    def binned(self):
+        filled = self.count > 0
+        return self.sum_t[filled] / self.count[filled], self.sum_delta_t[filled] / self.count[filled]
+
+    # √t 外插：回傳 (ΔT0, k)
+    def sqrt_t_fit(self):
+        n, sx, sy, sxx, sxy = self.regression
+        denominator = n * sxx - sx * sx
+        if n < 2 or denominator <= 0:
+            raise ValueError(f"√t 時間窗 {self.sqrt_t_window} 內的數據點不足，無法外插初始溫升")
+        slope = (n * sxy - sx * sy) / denominator
+        intercept = (sy - slope * sx) / n
+        return intercept, -slope
+
+
+# 由累積量產生 Zth(t)
+# 偏移修正：時間窗之前受電氣暫態影響的點以 √t 外插值取代，並外插出 t=0 的溫升 ΔT0
+# 鏡像：加熱曲線 ΔT_heat(t) = ΔT0 − ΔT_cool(t)（量測基準的常數偏移在相減時抵消）
+def finish(accumulator, power):
+    if power <= 0:
+        raise ValueError("加熱功率必須大於 0")
+    t, cooling = accumulator.binned()
+    if len(t) < 2:
+        raise ValueError("有效數據點不足")
+
+    delta_t0, k = accumulator.sqrt_t_fit()
+    early = t < accumulator.sqrt_t_window[0]
+    cooling = np.where(early, delta_t0 - k * np.sqrt(t), cooling)
+
+    heating = delta_t0 - cooling
+    keep = heating > 0
+    return pd.DataFrame({
+        ZTH_TIME_COLUMN: t[keep],
+        RAW_DELTA_T_COLUMN: heating[keep],
+        ZTH_COLUMN: heating[keep] / power,
+    })
+
+
+# 處理記憶體中的陣列（t 與 ΔT 可為任意長度，分區塊累積）
+def process_arrays(t, delta_t, power, chunk_size=DEFAULT_CHUNK_SIZE, **options):
+    accumulator = CoolingCurveAccumulator(**options)
+    for start in range(0, len(t), chunk_size):
+        accumulator.add(t[start:start + chunk_size], delta_t[start:start + chunk_size])
+    return finish(accumulator, power)
+
+
+# 串流處理原始量測 CSV
+# 若記錄的是 TSEP 電壓（例如量測電流下的 VCE），給定 voltage_column 與 K 係數 (V/℃)：
+# ΔT = (V − V_ref) / K，V_ref 為冷卻結束時的電壓（鏡像時常數偏移會抵消，只影響輸出的 ΔTj 數值）
+def process_csv(path, power, time_column=RAW_TIME_COLUMN, delta_t_column=RAW_DELTA_T_COLUMN,
+                voltage_column=None, k_factor=None, v_ref=0.0, chunk_size=DEFAULT_CHUNK_SIZE, **options):
+    if voltage_column is not None and not k_factor:
+        raise ValueError("以電壓欄位計算溫升時需要 K 係數")
+    value_column = voltage_column or delta_t_column
+
+    accumulator = CoolingCurveAccumulator(**options)
+    for frame in pd.read_csv(path, usecols=[time_column, value_column], chunksize=chunk_size, encoding='utf-8-sig'):
+        frame.columns = frame.columns.str.strip()
+        values = pd.to_numeric(frame[value_column], errors='coerce').to_numpy()
+        if voltage_column is not None:
+            values = (values - v_ref) / k_factor
+        accumulator.add(pd.to_numeric(frame[time_column], errors='coerce').to_numpy(), values)
+    return finish(accumulator, power)
+
+
+# 寫出 update_graph_m 可直接上傳的 CSV（UTF-8 無 BOM，與 parse_contents 的解碼方式一致）
+def write_zth_csv(zth, path):
+    zth.to_csv(path, index=False, encoding='utf-8')